@@ -4,7 +4,7 @@ from typing import List, Optional
 
 from database import get_db
 from models import UserDB
-from schemas.task import TaskResponse, TaskCreate, TaskUpdate, TaskStatusUpdate  # Используем TaskResponse вместо Task
+from schemas.task import TaskResponse, TaskCreate, TaskUpdate, TaskStatusUpdate, AssignmentMode  # Используем TaskResponse вместо Task
 from schemas.response import StandardResponse, PaginatedResponse
 import crud.task as task_crud
 import crud.user as user_crud
@@ -64,7 +64,7 @@ def read_tasks(
         db: Session = Depends(get_db)
 ):
     """Получить список задач с фильтрацией"""
-    tasks = task_crud.get_tasks(
+    tasks, total = task_crud.get_tasks_with_total(
         db,
         skip=skip,
         limit=limit,
@@ -72,7 +72,6 @@ def read_tasks(
         status=status,
         search=search
     )
-    total = task_crud.get_tasks_count(db, user_id=user_id, status=status, search=search)
 
     # Преобразуем задачи в словари
     tasks_dict = [task_crud.task_to_dict(task) for task in tasks]
@@ -200,28 +199,20 @@ def delete_task(
 def assign_users_to_task(
         task_id: int,
         user_ids: List[int],
+        mode: AssignmentMode = Query(AssignmentMode.REPLACE, description="replace, add or remove"),
         db: Session = Depends(get_db)
 ):
-    """Назначить пользователей на задачу"""
-    task = task_crud.get_task(db, task_id)
-    if not task:
+    """Назначить пользователей на задачу: заменить список, добавить (mode=add) или снять (mode=remove)"""
+    result = task_crud.apply_task_assignments(db, task_id, user_ids, mode)
+    if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found"
         )
-
-    for user_id in user_ids:
-        if not user_crud.get_user(db, user_id):
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"User with id {user_id} not found"
-            )
-
-    success = task_crud.assign_users_to_task(db, task_id, user_ids)
-    if not success:
+    if result["missing"]:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Failed to assign users to task"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {result['missing'][0]} not found"
         )
 
     updated_task = task_crud.get_task(db, task_id)
@@ -246,8 +237,7 @@ def get_user_tasks(
             detail="User not found"
         )
 
-    tasks = task_crud.get_tasks(db, skip=skip, limit=limit, user_id=user_id)
-    total = task_crud.get_tasks_count(db, user_id=user_id)
+    tasks, total = task_crud.get_tasks_with_total(db, skip=skip, limit=limit, user_id=user_id)
 
     return PaginatedResponse(
         message=f"Tasks for user {user_id} retrieved successfully",
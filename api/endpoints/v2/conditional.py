@@ -0,0 +1,98 @@
+"""Условные GET (RFC 9110): ETag, Last-Modified и ответ 304 для v2-эндпоинтов.
+
+Валидатор проверяется дешёвым запросом до чтения и сериализации ответа:
+
+* задача — сильный ETag по (id, version) и, если в ответе есть пользователи,
+  по самому позднему updated_at среди них; Last-Modified — максимум из updated_at
+  задачи и этих пользователей (см. models/task_versions.py, crud.task.TaskValidators);
+* список — слабый ETag по запросу (путь и параметры) и общим валидаторам
+  списков: max(updated_at) задач и пользователей и число задач
+  (crud.task.TaskListValidators). Совпавший отвечает 304 без чтения страницы.
+  Сразу после записи валидаторы не выдаются (медленная транзакция ещё может
+  закоммитить более старый updated_at), и ETag считается по содержимому
+  страницы (content_etag). Last-Modified спискам не ставится: удаление задачи
+  не меняет max(updated_at), и If-Modified-Since отдал бы устаревший список.
+
+If-None-Match сильнее If-Modified-Since: при обоих заголовках второй не смотрится.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response, status
+
+
+def is_conditional(request: Request) -> bool:
+    """Есть ли в запросе If-None-Match или If-Modified-Since"""
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:20]
+
+
+def task_etag(task_id: int, version: int, variant: str = "", users_updated_at: Optional[datetime] = None) -> str:
+    """Сильный ETag задачи"""
+    tag = f"{task_id}.{version}"
+    if variant or users_updated_at is not None:
+        return f'"{tag}.{_digest(variant, users_updated_at)[:8]}"'
+    return f'"{tag}"'
+
+
+def list_etag(request: Request, *validators) -> str:
+    """Слабый ETag списка: тот же путь и параметры при тех же валидаторах — то же представление"""
+    variant = (request.url.path, sorted(request.query_params.multi_items()))
+    return f'W/"l.{_digest(variant, *validators)}"'
+
+
+def content_etag(content: bytes) -> str:
+    """Слабый ETag по байтам представления"""
+    return f'W/"{hashlib.sha1(content).hexdigest()[:20]}"'
+
+
+def http_date(value: datetime) -> str:
+    """updated_at (наивное UTC) в формате HTTP-date"""
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Для If-None-Match сравнение слабое: W/ не учитывается
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP-date с точностью до секунды
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Совпадает ли представление у клиента с текущим"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and last_modified is not None:
+        return _not_modified_since(if_modified_since, last_modified)
+    return False
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified_response(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    """304 без тела, с теми же валидаторами"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, last_modified))
@@ -0,0 +1,31 @@
+"""Параметры fields= и expand= (sparse fieldsets) для v2-эндпоинтов"""
+from fastapi import HTTPException, status
+from typing import List, Optional, Sequence, Tuple
+
+
+def parse_field_list(value: Optional[str], allowed: Sequence[str], parameter: str = "fields") -> Optional[List[str]]:
+    """Имена из параметра вида "a,b,c" (None, если параметра нет); 400 на неизвестные"""
+    if value is None:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = sorted(set(names) - set(allowed))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown {parameter}: {', '.join(unknown)}"
+        )
+    return names
+
+
+def parse_fieldset(
+        fields: Optional[str], expand: Optional[str], allowed_fields: Sequence[str], allowed_expand: Sequence[str]
+) -> Optional[Tuple[List[str], List[str]]]:
+    """(поля, связи) для урезанного ответа; None — ни fields, ни expand не заданы, нужен полный ответ.
+
+    Без fields отдаются все поля, без expand — ни одной связи.
+    """
+    if fields is None and expand is None:
+        return None
+    field_list = parse_field_list(fields, allowed_fields)
+    expand_list = parse_field_list(expand, allowed_expand, "expand") or []
+    return (list(allowed_fields) if field_list is None else field_list), expand_list
@@ -0,0 +1,70 @@
+"""Общие части курсорной пагинации для v2-эндпоинтов"""
+from fastapi import HTTPException, status
+from typing import Any, Callable, List, Optional, Tuple
+
+from crud.pagination import InvalidCursor
+from schemas.response import TotalMode
+
+
+def parse_cursor(cursor: Optional[str], decode: Callable[[str], Any], skip: int = 0) -> Any:
+    """Ключ сортировки из параметра cursor; 400 на чужой/битый курсор или cursor вместе со skip"""
+    if cursor is None:
+        return None
+    if skip:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either cursor or skip, not both"
+        )
+    try:
+        return decode(cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+
+
+def cursor_page(items: List[Any], limit: int, make_cursor: Callable[[Any], str]) -> Tuple[List[Any], dict]:
+    """Обрезать выборку из limit + 1 строк до страницы и собрать pagination.
+
+    Лишняя строка говорит, что следующая страница есть, без отдельного COUNT.
+    """
+    has_next = len(items) > limit
+    items = items[:limit]
+    return items, {
+        "size": limit,
+        "has_next": has_next,
+        "next_cursor": make_cursor(items[-1]) if has_next else None
+    }
+
+
+def resolve_total_mode(include_total: Optional[TotalMode], after: Any) -> TotalMode:
+    """По умолчанию offset-страницы считают total точно (как раньше), курсорные — не считают"""
+    if include_total is not None:
+        return include_total
+    return TotalMode.OFF if after is not None else TotalMode.EXACT
+
+
+def offset_pagination(
+        items: List[Any], skip: int, limit: int, total: int, make_cursor: Callable[[Any], str]
+) -> dict:
+    """pagination для offset-страницы с точным total"""
+    has_next = skip + len(items) < total
+    return {
+        "total": total,
+        "page": page_number(skip, limit),
+        "size": limit,
+        "pages": (total + limit - 1) // limit,
+        "has_next": has_next,
+        "next_cursor": make_cursor(items[-1]) if has_next and items else None
+    }
+
+
+def with_total(pagination: dict, total: int, limit: int, is_estimate: bool = False) -> dict:
+    """Дополнить pagination общим числом строк (точным или оценкой)"""
+    pagination["total"] = total
+    pagination["pages"] = (total + limit - 1) // limit
+    if is_estimate:
+        pagination["total_is_estimate"] = True
+    return pagination
+
+
+def page_number(skip: int, limit: int) -> int:
+    return (skip // limit) + 1
@@ -0,0 +1,16 @@
+"""Заголовок Prefer (RFC 7240) для v2-эндпоинтов"""
+from fastapi import Header, Response
+from typing import Optional
+
+RETURN_MINIMAL = "return=minimal"
+
+
+def return_minimal(response: Response, prefer: Optional[str] = Header(None)) -> bool:
+    """Просит ли клиент Prefer: return=minimal; если да, отмечает это в Preference-Applied"""
+    if not prefer:
+        return False
+    preferences = {item.split(";")[0].replace(" ", "").lower() for item in prefer.split(",")}
+    if RETURN_MINIMAL not in preferences:
+        return False
+    response.headers["Preference-Applied"] = RETURN_MINIMAL
+    return True
@@ -0,0 +1,81 @@
+"""Быстрая сериализация списков задач для v2-эндпоинтов.
+
+Обычный путь для PaginatedResponse[TaskResponse]: словари из task_to_dict
+валидируются в модели при создании ответа, FastAPI ещё раз проверяет их по
+response_model, прогоняет через jsonable_encoder и кодирует stdlib json.
+Данные уже собраны сервером и корректны, поэтому здесь они сразу пишутся
+в JSON заранее собранным сериализатором pydantic-core (TypeAdapter) — без
+валидации и без промежуточных словарей.
+
+Схемы ниже повторяют TaskResponse/UserResponse; что ответы совпадают,
+проверяет tests/unit/test_serialization.py. response_model у эндпоинтов
+остаётся — он описывает ответ в OpenAPI. TaskPayload неполный (total=False):
+с fields=/expand= в данных только запрошенные ключи.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+
+
+class UserPayload(TypedDict):
+    username: str
+    full_name: Optional[str]
+    role: str
+    id: int
+    created_at: datetime
+
+
+class TaskPayload(TypedDict, total=False):
+    title: str
+    description: Optional[str]
+    due_date: Optional[datetime]
+    assigned_user_ids: List[int]
+    id: int
+    status: str
+    creator_id: int
+    created_at: datetime
+    updated_at: datetime
+    version: int
+    creator: Optional[UserPayload]
+    assigned_users: List[UserPayload]
+
+
+class TaskPage(TypedDict):
+    success: bool
+    message: str
+    data: List[TaskPayload]
+    pagination: Dict[str, Any]
+    timestamp: datetime
+
+
+TASK_PAGE_ADAPTER = TypeAdapter(TaskPage)
+
+
+def task_page_body(message: str, tasks: List[dict], pagination: dict) -> bytes:
+    """JSON PaginatedResponse[TaskResponse] из словарей task_to_dict, без валидации"""
+    return TASK_PAGE_ADAPTER.dump_json({
+        "success": True,
+        "message": message,
+        "data": tasks,
+        "pagination": pagination,
+        "timestamp": datetime.now()
+    })
+
+
+def page_content(body: bytes) -> bytes:
+    """Тело страницы без timestamp (он последний в TaskPage и свой у каждого ответа) — для ETag"""
+    return body[:body.rindex(b',"timestamp":')]
+
+
+def task_page_response(
+        message: str, tasks: List[dict], pagination: dict, headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Ответ PaginatedResponse[TaskResponse] из словарей task_to_dict, готовый JSON без валидации"""
+    return json_response(task_page_body(message, tasks, pagination), headers)
+
+
+def json_response(body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=body, media_type="application/json", headers=headers)
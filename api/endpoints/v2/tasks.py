@@ -1,17 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional, Tuple
 import logging
 logger = logging.getLogger(__name__)
 # from auth import current_user_auth
 
-from database import get_db
+from database import get_async_db
 from models import UserDB, TaskDB
 from models.task import TaskStatus, TaskHierarchyDB, TaskAssignmentDB
-from schemas.task import TaskResponse, TaskCreate, TaskUpdate, TaskStatusUpdate  # Используем TaskResponse вместо Task
-from schemas.response import StandardResponse, PaginatedResponse
-import crud.task as task_crud
-import crud.user as user_crud
+from schemas.task import (
+    TaskResponse, TaskCreate, TaskUpdate, TaskStatusUpdate, TaskSearchResult, TaskTreeDirection, TaskTreeFormat,
+    BulkTaskCreate, TaskStatusBulkUpdate, AssignmentMode
+)  # Используем TaskResponse вместо Task
+from schemas.response import StandardResponse, PaginatedResponse, TotalMode
+import crud.task_async as task_crud
+from crud.task import would_create_cycle, TaskValidators, TASK_TREE_FIELDS, TASK_FIELDS, TASK_EXPANSIONS
+import crud.user_async as user_crud
+from monitoring.query_budget import query_budget
+from api.endpoints.v2.pagination import (
+    parse_cursor, cursor_page, resolve_total_mode, offset_pagination, with_total, page_number
+)
+from api.endpoints.v2.preferences import return_minimal
+from api.endpoints.v2.serialization import task_page_body, page_content, json_response
+from api.endpoints.v2.fieldsets import parse_field_list, parse_fieldset
+from api.endpoints.v2.conditional import (
+    is_conditional, task_etag, list_etag, content_etag, not_modified, not_modified_response, validator_headers
+)
 
 router = APIRouter(prefix="/v2/tasks", tags=["tasks-v2"])
 
@@ -22,13 +38,17 @@ def get_current_user():
 
 
 @router.post("/", response_model=StandardResponse, status_code=status.HTTP_201_CREATED)
-def create_task(
+# Каждый flush с изменениями задач добавляет до 3 запросов: снимки до/после и upsert task_counters
+@query_budget(8)
+async def create_task(
         task: TaskCreate,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db),
+        minimal: bool = Depends(return_minimal)
 ):
-    """Создать новую задачу"""
-    # Проверяем существование пользователя-создателя
-    creator = user_crud.get_user(db, task.creator_id)
+    """Создать новую задачу; с Prefer: return=minimal в ответе только id и version"""
+    # Создатель и назначенные пользователи загружаются одним запросом
+    assigned_user_ids = task.assigned_user_ids or []
+    creator, *assignees = await user_crud.load_users(db, [task.creator_id, *assigned_user_ids])
     if not creator:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -41,20 +61,42 @@ def create_task(
         )
 
     # Проверяем существование назначенных пользователей
-    if task.assigned_user_ids:
-        for user_id in task.assigned_user_ids:
-            if not user_crud.get_user(db, user_id):
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"User with id {user_id} not found"
-                )
+    for user_id, assignee in zip(assigned_user_ids, assignees):
+        if not assignee:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"User with id {user_id} not found"
+            )
 
-    task_created = task_crud.create_task(db=db, task=task)
-    created_task = task_crud.get_task(db, task_created.id)
+    task_created = await task_crud.create_task(db=db, task=task, return_minimal=minimal)
 
     return StandardResponse(
         message="Task created successfully",
-        data=task_crud.task_to_dict(created_task) if created_task else None
+        data=task_created
+    )
+
+
+@router.post("/bulk", response_model=StandardResponse, status_code=status.HTTP_201_CREATED)
+# Число запросов не зависит от размера пачки, пока insertmanyvalues укладывает её в одну страницу (1000 строк)
+@query_budget(12)
+async def create_tasks_bulk(
+        payload: BulkTaskCreate,
+        response: Response,
+        db: AsyncSession = Depends(get_async_db)
+):
+    """Создать пачку задач (с назначениями и иерархией) одной транзакцией.
+
+    Ошибочные элементы не создаются и перечислены в results; если такие есть,
+    ответ — 207 Multi-Status.
+    """
+    results = await task_crud.create_tasks_bulk(db, payload.tasks)
+    failed = sum(1 for result in results if result["error"] is not None)
+    if failed:
+        response.status_code = status.HTTP_207_MULTI_STATUS
+
+    return StandardResponse(
+        message=f"Created {len(results) - failed} tasks, {failed} failed",
+        data={"created": len(results) - failed, "failed": failed, "results": results}
     )
 
 
@@ -109,13 +151,18 @@ def create_task(
     # )
 
 @router.post("/{parent_id}/subtasks", response_model=StandardResponse, status_code=status.HTTP_201_CREATED)
-def create_subtask(
+@query_budget(10)
+async def create_subtask(
         parent_id: int,
         subtask: TaskCreate,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db),
+        minimal: bool = Depends(return_minimal)
 ):
-    """Создать подзадачу для указанной родительской задачи"""
-    creator = user_crud.get_user(db, subtask.creator_id)
+    """Создать подзадачу для указанной родительской задачи; назначения наследуются от родителя.
+
+    С Prefer: return=minimal в ответе только id и version.
+    """
+    creator = await user_crud.load_user(db, subtask.creator_id)
     if not creator:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -127,163 +174,246 @@ def create_subtask(
             detail=f"User with role '{creator.role.value}' cannot create tasks"
         )
 
-    parent_task = task_crud.get_task(db, parent_id)
-    if not parent_task:
+    created_task = await task_crud.create_subtask(db, parent_id, subtask, return_minimal=minimal)
+    if created_task is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Parent task with id {parent_id} not found"
         )
 
-    parent_assigned_users = task_crud.get_assigned_users(db, parent_id)
-    parent_user_ids = [user.id for user in parent_assigned_users]
-    for user_id in parent_user_ids:
-        if not user_crud.get_user(db, user_id):
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"User with id {user_id} from parent task not found"
-            )
-    subtask_data = subtask.model_dump()
-    subtask_data["parent_id"] = parent_id
-    subtask_data["assigned_user_ids"] = parent_user_ids
-    db_task = TaskDB(
-        title=subtask_data["title"],
-        description=subtask_data.get("description"),
-        due_date=subtask_data.get("due_date"),
-        creator_id=subtask_data["creator_id"],
-        status=TaskStatus.OPEN
-    )
-    db.add(db_task)
-    db.flush()
-    if subtask_data.get("assigned_user_ids"):
-        for user_id in subtask_data["assigned_user_ids"]:
-            assignment = TaskAssignmentDB(task_id=db_task.id, user_id=user_id)
-            db.add(assignment)
-    hierarchy = TaskHierarchyDB(parent_id=parent_id, child_id=db_task.id)
-    db.add(hierarchy)
-
-    try:
-        if not validate_hierarchy(db, parent_id, db_task.id):
-            db.rollback()
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Cannot create task hierarchy - would create cycle or invalid relationship"
-            )
-        db.commit()
-        db.refresh(db_task)
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to create subtask: {str(e)}"
-        ) from e
-    created_task = task_crud.get_task(db, db_task.id)
-
     return StandardResponse(
-        data=task_crud.task_to_dict(created_task) if created_task else None,
+        data=created_task,
         message="Subtask created successfully"
     )
 
 
 def validate_hierarchy(db: Session, parent_id: int, child_id: int) -> bool:
-    """Валидация иерархии задач (проверка на циклы)."""
-    if parent_id == child_id:
-        return False
-    visited: set[int] = set()
-    queue: list[int] = [parent_id]
-
-    while queue:
-        current = queue.pop(0)
-        if current in visited:
-            continue
-        visited.add(current)
-        parent_relations = db.query(TaskHierarchyDB).filter(
-            TaskHierarchyDB.child_id == current
-        ).all()
-        for relation in parent_relations:
-            ancestor_id = relation.parent_id
-            if ancestor_id == child_id:
-                return False
-            if ancestor_id not in visited:
-                queue.append(ancestor_id)
-
-    return True
+    """Валидация иерархии задач (проверка на циклы) одним запросом к task_closure."""
+    return not would_create_cycle(db, parent_id, child_id)
+
+
+FIELDS_DESCRIPTION = f"Comma-separated task fields: {', '.join(TASK_FIELDS)}; id is always returned"
+EXPAND_DESCRIPTION = f"Related objects to embed: {', '.join(TASK_EXPANSIONS)}"
+
+
+async def _task_list_page(
+        db: AsyncSession,
+        skip: int,
+        limit: int,
+        after,
+        mode: TotalMode,
+        fieldset: Optional[Tuple[List[str], List[str]]],
+        **filters
+) -> Tuple[List[dict], dict]:
+    """Данные и pagination страницы задач: полные (task_to_dict) или только запрошенные поля"""
+    if mode is TotalMode.EXACT and after is None:
+        if fieldset:
+            tasks, total = await task_crud.get_task_projections(
+                db, *fieldset, skip=skip, limit=limit, with_total=True, **filters
+            )
+        else:
+            tasks, total = await task_crud.get_tasks_with_total(db, skip=skip, limit=limit, **filters)
+        pagination = offset_pagination(tasks, skip, limit, total, task_crud.task_cursor)
+    else:
+        if fieldset:
+            tasks, _ = await task_crud.get_task_projections(
+                db, *fieldset, skip=skip, limit=limit + 1, after=after, **filters
+            )
+        else:
+            tasks = await task_crud.get_tasks(db, skip=skip, limit=limit + 1, after=after, **filters)
+        tasks, pagination = cursor_page(tasks, limit, task_crud.task_cursor)
+        if mode is TotalMode.EXACT:
+            with_total(pagination, await task_crud.get_tasks_count(db, **filters), limit)
+        elif mode is TotalMode.ESTIMATE:
+            total, is_estimate = await task_crud.estimate_tasks_count(db, **filters)
+            with_total(pagination, total, limit, is_estimate)
+        if after is None:
+            pagination["page"] = page_number(skip, limit)
+
+    if fieldset:
+        return [task.data for task in tasks], pagination
+    return [task_crud.task_to_dict(task) for task in tasks], pagination
+
 
 @router.get("/", response_model=PaginatedResponse[TaskResponse])
-def read_tasks(
+# Валидатор списка — один запрос (неизменённый список на нём и заканчивается);
+# страница с total — ещё три (задачи, назначения, пользователи) при любом числе исполнителей;
+# estimate добавляет EXPLAIN и, для малых выборок, точный COUNT
+@query_budget(6)
+async def read_tasks(
+        request: Request,
         skip: int = Query(0, ge=0, description="Number of records to skip"),
         limit: int = Query(100, ge=1, le=1000, description="Number of records to return"),
+        cursor: Optional[str] = Query(None, description="Opaque cursor from pagination.next_cursor"),
+        include_total: Optional[TotalMode] = Query(
+            None, description="false | exact | estimate; default exact for skip pages, false for cursor pages"
+        ),
         user_id: Optional[int] = Query(None, description="Filter by user ID"),
         status: Optional[str] = Query(None, description="Filter by status"),
         search: Optional[str] = Query(None, description="Search in title and description"),
-        db: Session = Depends(get_db)
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        expand: Optional[str] = Query(None, description=EXPAND_DESCRIPTION),
+        db: AsyncSession = Depends(get_async_db)
 ):
-    """Получить список задач с фильтрацией"""
-    tasks = task_crud.get_tasks(
+    """Получить список задач с фильтрацией (по skip или по курсору).
+
+    С fields/expand в ответе только запрошенные поля и связи, остальное не читается из БД.
+    Ответ несёт слабый ETag; при совпадении If-None-Match — 304 без тела и без чтения страницы.
+    """
+    after = parse_cursor(cursor, task_crud.decode_task_cursor, skip)
+    mode = resolve_total_mode(include_total, after)
+    fieldset = parse_fieldset(fields, expand, TASK_FIELDS, TASK_EXPANSIONS)
+    etag = await _task_list_etag(db, request)
+    if etag is not None and not_modified(request, etag):
+        return not_modified_response(etag)
+    data, pagination = await _task_list_page(
+        db, skip, limit, after, mode, fieldset, user_id=user_id, status=status, search=search
+    )
+    return _task_page_with_etag(request, task_page_body("Tasks retrieved successfully", data, pagination), etag)
+
+
+async def _task_list_etag(db: AsyncSession, request: Request) -> Optional[str]:
+    """ETag списка по валидаторам, до чтения страницы; None сразу после записи"""
+    validators = await task_crud.get_task_list_validators(db)
+    return list_etag(request, *validators) if validators is not None else None
+
+
+def _task_page_with_etag(request: Request, body: bytes, etag: Optional[str] = None) -> Response:
+    """Готовая страница с ETag по валидаторам; без них — по содержимому и 304, если он совпал"""
+    if etag is None:
+        etag = content_etag(page_content(body))
+        if not_modified(request, etag):
+            return not_modified_response(etag)
+    return json_response(body, headers={"ETag": etag})
+
+
+@router.get("/search", response_model=PaginatedResponse[TaskSearchResult])
+@query_budget(2)
+async def search_tasks(
+        q: str = Query(..., min_length=1, max_length=200, description="Words to search; each matches as a prefix"),
+        skip: int = Query(0, ge=0, description="Number of records to skip"),
+        limit: int = Query(20, ge=1, le=100, description="Number of records to return"),
+        user_id: Optional[int] = Query(None, description="Filter by user ID"),
+        status: Optional[str] = Query(None, description="Filter by status"),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """Полнотекстовый поиск задач: сначала самые релевантные, с подсветкой"""
+    results, has_next = await task_crud.search_tasks(
         db,
+        q,
         skip=skip,
         limit=limit,
         user_id=user_id,
-        status=status,
-        search=search
+        status=status
     )
-    total = task_crud.get_tasks_count(db, user_id=user_id, status=status, search=search)
-
-    # Преобразуем задачи в словари
-    tasks_dict = [task_crud.task_to_dict(task) for task in tasks]
 
     return PaginatedResponse(
-        message="Tasks retrieved successfully",
-        data=tasks_dict,
+        message="Tasks found successfully",
+        data=[
+            {"task": task_crud.task_to_dict(task), "rank": rank, "snippet": snippet}
+            for task, rank, snippet in results
+        ],
         pagination={
-            "total": total,
-            "page": (skip // limit) + 1 if limit > 0 else 1,
+            "page": (skip // limit) + 1,
             "size": limit,
-            "pages": (total + limit - 1) // limit if limit > 0 else 1
+            "has_next": has_next,
+            "has_prev": skip > 0
         }
     )
 
 
+def _select_task_fields(task_dict: dict, fields: List[str], expand: List[str]) -> dict:
+    """Оставить в полном словаре задачи только запрошенные поля и связи"""
+    keys = {"id", *fields}
+    if "creator" in expand:
+        keys.add("creator")
+    if "assignees" in expand:
+        keys.add("assigned_users")
+    return {key: value for key, value in task_dict.items() if key in keys}
+
+
+def _task_validators(
+        task_id: int, variant: str, validators: TaskValidators, with_users: bool
+) -> Tuple[str, datetime]:
+    """ETag и Last-Modified задачи; пользователи учитываются, только если они есть в ответе"""
+    if not with_users:
+        validators = validators._replace(users_updated_at=None)
+    return task_etag(task_id, validators.version, variant, validators.users_updated_at), validators.last_modified
+
+
 @router.get("/{task_id}", response_model=StandardResponse)
-def read_task(task_id: int, db: Session = Depends(get_db)):
-    """Получить задачу по ID"""
-    db_task = task_crud.get_task(db, task_id=task_id)
-    if db_task is None:
+# Один запрос; условный запрос с устаревшим валидатором — ещё проверка version
+@query_budget(2)
+async def read_task(
+        task_id: int,
+        request: Request,
+        response: Response,
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        expand: Optional[str] = Query(None, description=EXPAND_DESCRIPTION),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """Получить задачу по ID (fields/expand — как в списке задач).
+
+    Ответ несёт ETag и Last-Modified; If-None-Match/If-Modified-Since проверяются
+    запросом по первичному ключу, и неизменённая задача отдаётся как 304.
+    """
+    fieldset = parse_fieldset(fields, expand, TASK_FIELDS, TASK_EXPANSIONS)
+    variant = ";".join(",".join(names) for names in fieldset) if fieldset else ""
+    # Без связей — один запрос только по нужным колонкам, и пользователи в ETag не входят
+    projected = bool(fieldset) and not fieldset[1] and "assigned_user_ids" not in fieldset[0]
+
+    if is_conditional(request):
+        current = await task_crud.get_task_version(db, task_id)
+        if current is not None:
+            etag, last_modified = _task_validators(task_id, variant, current, with_users=not projected)
+            if not_modified(request, etag, last_modified):
+                return not_modified_response(etag, last_modified)
+
+    if projected:
+        projection = await task_crud.get_task_projection(db, task_id, fieldset[0])
+        task_dict = projection.data if projection else None
+        validators = TaskValidators(projection.version, projection.updated_at) if projection else None
+    else:
+        # Полный ответ — из общего кэша, если он включён
+        cached = await task_crud.get_task_payload(db, task_id)
+        task_dict, validators = cached if cached else (None, None)
+        if task_dict and fieldset:
+            task_dict = _select_task_fields(task_dict, *fieldset)
+    if task_dict is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found"
         )
 
-    # Преобразуем в словарь для сериализации
-    task_dict = task_crud.task_to_dict(db_task)
-
+    etag, last_modified = _task_validators(task_id, variant, validators, with_users=not projected)
+    response.headers.update(validator_headers(etag, last_modified))
     return StandardResponse(
         message="Task retrieved successfully",
         data=task_dict
     )
 
 @router.put("/{task_id}", response_model=StandardResponse)
-def update_task(
+@query_budget(13)
+async def update_task(
         task_id: int,
         task: TaskUpdate,
-        db: Session = Depends(get_db),
-        current_user_id: int = Depends(get_current_user)
+        db: AsyncSession = Depends(get_async_db),
+        current_user_id: int = Depends(get_current_user),
+        minimal: bool = Depends(return_minimal)
 ):
-    """Обновить задачу"""
-    db_task = task_crud.update_task(db, task_id=task_id, task_update=task, current_user_id=current_user_id)
+    """Обновить задачу; с Prefer: return=minimal в ответе только id и version"""
+    db_task = await task_crud.update_task(
+        db, task_id=task_id, task_update=task, current_user_id=current_user_id, return_minimal=minimal
+    )
     if db_task is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found"
         )
 
-    updated_task = task_crud.get_task(db, task_id)
-
     return StandardResponse(
         message="Task updated successfully",
-        data=task_crud.task_to_dict(updated_task) if updated_task else None
+        data=db_task
     )
 
 
@@ -332,19 +462,45 @@ def update_task(
 #         data=db_task
 #     )
 
+@router.patch("/status", response_model=StandardResponse)
+@query_budget(13)
+async def bulk_update_task_status(
+        bulk_update: TaskStatusBulkUpdate,
+        db: AsyncSession = Depends(get_async_db),
+        current_user_id: int = Depends(get_current_user)
+):
+    """Перевести пачку задач в новый статус; результат по каждому id"""
+    result = await task_crud.bulk_update_task_status(
+        db,
+        bulk_update.task_ids,
+        bulk_update.status,
+        current_user_id,
+        expected_status=bulk_update.expected_status
+    )
+
+    return StandardResponse(
+        message=f"Updated {result['updated']} tasks",
+        data=result
+    )
+
+
 @router.patch("/{task_id}/status", response_model=StandardResponse)
-def update_task_status(
+# Смена статуса и её распространение: оба UPDATE обновляют счётчики (снимок до/после и upsert)
+@query_budget(13)
+async def update_task_status(
         task_id: int,
         status_update: TaskStatusUpdate,
-        db: Session = Depends(get_db),
-        current_user_id: int = Depends(get_current_user)
+        db: AsyncSession = Depends(get_async_db),
+        current_user_id: int = Depends(get_current_user),
+        minimal: bool = Depends(return_minimal)
 ):
-    """Обновить статус задачи с автоматическим обновлением родительской задачи"""
-    db_task = task_crud.update_task_status(
+    """Обновить статус задачи; выполнение и переоткрытие протягиваются по всем предкам"""
+    db_task = await task_crud.update_task_status_with_cascade(
         db,
         task_id=task_id,
         new_status=status_update.status,
-        current_user_id=current_user_id
+        current_user_id=current_user_id,
+        return_minimal=minimal
     )
 
     if db_task is None:
@@ -352,50 +508,29 @@ def update_task_status(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found or not enough permissions"
         )
-    if status_update.status == TaskStatus.COMPLETED:
-        full_task = task_crud.get_task(db, task_id)
-        if full_task and full_task.parent_relations:
-            parent_id = full_task.parent_relations[0].parent_id
-            all_children_completed = task_crud.are_all_children_completed(db, parent_id)
-
-            if all_children_completed:
-                parent_updated = task_crud.update_task_status(
-                    db,
-                    task_id=parent_id,
-                    new_status=TaskStatus.COMPLETED,
-                    current_user_id=current_user_id
-                )
-
-                if not parent_updated:
-                    logger.warning(
-                        f"Parent task {parent_id} could not be updated to COMPLETED "
-                        f"by user {current_user_id} - insufficient permissions or task not found"
-                    )
-        else:
-            logger.debug(f"Task {task_id} has no parent relations, skipping cascade update")
-    updated_task = task_crud.get_task(db, task_id)
 
     return StandardResponse(
         message="Task status updated successfully",
-        data=task_crud.task_to_dict(updated_task) if updated_task else None
+        data=db_task
     )
 @router.delete("/{task_id}", response_model=StandardResponse)
-def delete_task(
+@query_budget(10)
+async def delete_task(
         task_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user_id: int = Depends(get_current_user)
 ):
     """Удалить задачу"""
-    db_task = task_crud.get_task(db, task_id)
+    db_task = await task_crud.get_task(db, task_id)
     if not db_task:
         raise HTTPException(status_code=404, detail="Task not found")
 
     if db_task.creator_id != current_user_id:
-        user = user_crud.get_user(db, current_user_id)
+        user = await user_crud.load_user(db, current_user_id)
         if not user or not user.can_delete_tasks():
             raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    success = task_crud.delete_task(db, task_id=task_id)
+    success = await task_crud.delete_task(db, task_id=task_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -408,34 +543,27 @@ def delete_task(
 
 
 @router.post("/{task_id}/assign", response_model=StandardResponse)
-def assign_users_to_task(
+@query_budget(9)
+async def assign_users_to_task(
         task_id: int,
         user_ids: List[int],
-        db: Session = Depends(get_db)
+        mode: AssignmentMode = Query(AssignmentMode.REPLACE, description="replace, add or remove"),
+        db: AsyncSession = Depends(get_async_db)
 ):
-    """Назначить пользователей на задачу"""
-    task = task_crud.get_task(db, task_id)
-    if not task:
+    """Назначить пользователей на задачу: заменить список, добавить (mode=add) или снять (mode=remove)"""
+    result = await task_crud.apply_task_assignments(db, task_id, user_ids, mode)
+    if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found"
         )
-
-    for user_id in user_ids:
-        if not user_crud.get_user(db, user_id):
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"User with id {user_id} not found"
-            )
-
-    success = task_crud.assign_users_to_task(db, task_id, user_ids)
-    if not success:
+    if result["missing"]:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Failed to assign users to task"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {result['missing'][0]} not found"
         )
 
-    updated_task = task_crud.get_task(db, task_id)
+    updated_task = await task_crud.get_task(db, task_id)
     return StandardResponse(
         message="Users assigned to task successfully",
         data=task_crud.task_to_dict(updated_task)
@@ -444,41 +572,47 @@ def assign_users_to_task(
 
 @router.get("/user/{user_id}/tasks",
             response_model=PaginatedResponse[TaskResponse])  # Исправлено: TaskResponse вместо Task
-def get_user_tasks(
+@query_budget(7)
+async def get_user_tasks(
         user_id: int,
+        request: Request,
         skip: int = Query(0, ge=0),
         limit: int = Query(100, ge=1, le=1000),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="Opaque cursor from pagination.next_cursor"),
+        include_total: Optional[TotalMode] = Query(
+            None, description="false | exact | estimate; default exact for skip pages, false for cursor pages"
+        ),
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        expand: Optional[str] = Query(None, description=EXPAND_DESCRIPTION),
+        db: AsyncSession = Depends(get_async_db)
 ):
-    """Получить все задачи пользователя"""
-    if not user_crud.get_user(db, user_id):
+    """Получить все задачи пользователя (fields/expand и ETag — как в списке задач)"""
+    after = parse_cursor(cursor, task_crud.decode_task_cursor, skip)
+    mode = resolve_total_mode(include_total, after)
+    fieldset = parse_fieldset(fields, expand, TASK_FIELDS, TASK_EXPANSIONS)
+    if not await user_crud.load_user(db, user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
 
-    tasks = task_crud.get_tasks(db, skip=skip, limit=limit, user_id=user_id)
-    total = task_crud.get_tasks_count(db, user_id=user_id)
-
-    return PaginatedResponse(
-        message=f"Tasks for user {user_id} retrieved successfully",
-        data=tasks,
-        pagination={
-            "total": total,
-            "page": (skip // limit) + 1 if limit > 0 else 1,
-            "size": limit,
-            "pages": (total + limit - 1) // limit if limit > 0 else 1
-        }
+    etag = await _task_list_etag(db, request)
+    if etag is not None and not_modified(request, etag):
+        return not_modified_response(etag)
+    data, pagination = await _task_list_page(db, skip, limit, after, mode, fieldset, user_id=user_id)
+    return _task_page_with_etag(
+        request, task_page_body(f"Tasks for user {user_id} retrieved successfully", data, pagination), etag
     )
 
 
 @router.get("/stats/overview", response_model=StandardResponse)
-def get_tasks_stats(
+@query_budget(2)
+async def get_tasks_stats(
         user_id: Optional[int] = Query(None, description="User ID for personal stats"),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     """Получить статистику по задачам"""
-    stats = task_crud.get_task_stats(db, user_id=user_id)
+    stats = await task_crud.get_task_stats(db, user_id=user_id)
     return StandardResponse(
         message="Task statistics retrieved successfully",
         data=stats
@@ -504,38 +638,35 @@ def get_tasks_stats(
 #         data=hierarchy
 #     )
 @router.post("/hierarchy/{parent_id}/{child_id}", response_model=StandardResponse)
-def create_task_hierarchy(
+@query_budget(10)
+async def create_task_hierarchy(
         parent_id: int,
         child_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user_id: int = Depends(get_current_user)
 ):
     """Создать связь родитель-потомок между задачами"""
-    # Проверяем существование обеих задач
-    parent_task = task_crud.get_task(db, parent_id)
-    if not parent_task:
+    # Существование обеих задач и их создатели — один лёгкий запрос
+    creator_ids = await task_crud.get_task_creator_ids(db, [parent_id, child_id])
+    if parent_id not in creator_ids:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Parent task with id {parent_id} not found"
         )
 
-    child_task = task_crud.get_task(db, child_id)
-    if not child_task:
+    if child_id not in creator_ids:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Child task with id {child_id} not found"
         )
-    user = user_crud.get_user(db, current_user_id)
+    user = await user_crud.load_user(db, current_user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User not found"
         )
 
-    is_creator = (
-        parent_task.creator_id == current_user_id
-        or child_task.creator_id == current_user_id
-    )
+    is_creator = current_user_id in (creator_ids[parent_id], creator_ids[child_id])
     if not is_creator and not user.can_delete_tasks():
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -543,13 +674,13 @@ def create_task_hierarchy(
         )
 
     # Валидация на циклы — та же функция, что используется в create_subtask
-    if not validate_hierarchy(db, parent_id, child_id):
+    if not await db.run_sync(validate_hierarchy, parent_id, child_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot create task hierarchy - would create cycle"
         )
 
-    hierarchy = task_crud.create_task_hierarchy(db, parent_id, child_id)
+    hierarchy = await task_crud.create_task_hierarchy(db, parent_id, child_id)
     if not hierarchy:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -563,9 +694,10 @@ def create_task_hierarchy(
 
 
 @router.get("/{task_id}/hierarchy", response_model=StandardResponse)
-def get_task_hierarchy(task_id: int, db: Session = Depends(get_db)):
+@query_budget(2)
+async def get_task_hierarchy(task_id: int, db: AsyncSession = Depends(get_async_db)):
     """Получить иерархию задачи"""
-    hierarchy = task_crud.get_task_hierarchy(db, task_id)
+    hierarchy = await task_crud.get_task_hierarchy(db, task_id)
     if not hierarchy:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -575,4 +707,41 @@ def get_task_hierarchy(task_id: int, db: Session = Depends(get_db)):
     return StandardResponse(
         message="Task hierarchy retrieved successfully",
         data=hierarchy
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/{task_id}/tree", response_model=StandardResponse)
+@query_budget(1)
+async def get_task_tree(
+        task_id: int,
+        direction: TaskTreeDirection = Query(TaskTreeDirection.DESCENDANTS, description="Subtasks or parent tasks"),
+        max_depth: int = Query(10, ge=1, le=100, description="How many levels to expand"),
+        children_limit: Optional[int] = Query(None, ge=1, le=1000, description="Max children returned per node"),
+        children_offset: int = Query(0, ge=0, description="Children of the root node to skip"),
+        fields: Optional[str] = Query(None, description=f"Comma-separated task fields: {', '.join(TASK_TREE_FIELDS)}"),
+        tree_format: TaskTreeFormat = Query(TaskTreeFormat.NESTED, alias="format", description="nested or flat"),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """Всё поддерево (или всех предков) задачи одним запросом"""
+    field_list = parse_field_list(fields, TASK_TREE_FIELDS)
+
+    tree = await task_crud.get_task_tree(
+        db,
+        task_id,
+        direction=direction,
+        max_depth=max_depth,
+        children_limit=children_limit,
+        children_offset=children_offset,
+        fields=field_list,
+        tree_format=tree_format
+    )
+    if tree is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+
+    return StandardResponse(
+        message="Task tree retrieved successfully",
+        data=tree
+    )
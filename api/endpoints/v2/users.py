@@ -1,39 +1,62 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from database import get_db
+from database import get_db, get_async_db
 from schemas.user import User, UserCreate, UserUpdate
-from schemas.response import StandardResponse, PaginatedResponse
+from schemas.response import StandardResponse, PaginatedResponse, TotalMode
 import crud.user as crud
+import crud.user_async as crud_async
+from monitoring.query_budget import query_budget
+from api.endpoints.v2.pagination import (
+    parse_cursor, cursor_page, resolve_total_mode, offset_pagination, with_total, page_number
+)
 
 router = APIRouter(prefix="/v2/users", tags=["users-v2"])
 
 
 @router.get("/", response_model=PaginatedResponse[User])
-def read_users(
+@query_budget(3)
+async def read_users(
         skip: int = Query(0, ge=0, description="Number of records to skip"),
         limit: int = Query(100, ge=1, le=1000, description="Number of records to return"),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="Opaque cursor from pagination.next_cursor"),
+        include_total: Optional[TotalMode] = Query(
+            None, description="false | exact | estimate; default exact for skip pages, false for cursor pages"
+        ),
+        db: AsyncSession = Depends(get_async_db)
 ):
-    """Получить список пользователей"""
-    users = crud.get_users(db, skip=skip, limit=limit)
+    """Получить список пользователей (по username, через skip или курсор)"""
+    after = parse_cursor(cursor, crud_async.decode_user_cursor, skip)
+    mode = resolve_total_mode(include_total, after)
+
+    if mode is TotalMode.EXACT and after is None:
+        users, total = await crud_async.get_users_with_total(db, skip=skip, limit=limit)
+        pagination = offset_pagination(users, skip, limit, total, crud_async.user_cursor)
+    else:
+        users = await crud_async.get_users(db, skip=skip, limit=limit + 1, after=after)
+        users, pagination = cursor_page(users, limit, crud_async.user_cursor)
+        if mode is TotalMode.EXACT:
+            with_total(pagination, await crud_async.get_users_count(db), limit)
+        elif mode is TotalMode.ESTIMATE:
+            total, is_estimate = await crud_async.estimate_users_count(db)
+            with_total(pagination, total, limit, is_estimate)
+        if after is None:
+            pagination["page"] = page_number(skip, limit)
+
     return PaginatedResponse(
         message="Users retrieved successfully",
         data=users,
-        pagination={
-            "total": len(users),
-            "page": (skip // limit) + 1 if limit > 0 else 1,
-            "size": limit,
-            "pages": (len(users) + limit - 1) // limit if limit > 0 else 1
-        }
+        pagination=pagination
     )
 
 
 @router.get("/{user_id}", response_model=StandardResponse)
-def read_user(user_id: int, db: Session = Depends(get_db)):
+@query_budget(1)
+async def read_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """Получить пользователя по ID"""
-    db_user = crud.get_user(db, user_id=user_id)
+    db_user = await crud_async.get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
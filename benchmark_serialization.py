@@ -0,0 +1,93 @@
+"""Стоимость сериализации страницы задач на один элемент: путь через response_model против быстрого.
+
+    python benchmark_serialization.py --items 1000 --repeat 20
+
+БД не нужна: задачи собираются в памяти, с создателем и двумя исполнителями.
+"""
+import argparse
+import asyncio
+import datetime
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from api.endpoints.v2.serialization import task_page_response
+from crud.task import task_to_dict
+from models.task import TaskDB, TaskAssignmentDB, TaskStatus
+from models.user import UserDB, UserRole
+from schemas.response import PaginatedResponse
+from schemas.task import TaskResponse
+
+
+def make_tasks(count: int) -> list:
+    now = datetime.datetime(2026, 10, 17, 12, 0, 0)
+    users = [
+        UserDB(id=i, username=f"user_{i}", full_name=f"User {i}", role=UserRole.USER, created_at=now)
+        for i in range(1, 11)
+    ]
+    tasks = []
+    for i in range(count):
+        task = TaskDB(
+            id=i + 1, title=f"Task {i}", description="Описание задачи " * 4, status=TaskStatus.IN_PROGRESS,
+            creator_id=users[0].id, creator=users[0], created_at=now, updated_at=now, version=1,
+            due_date=now if i % 2 else None
+        )
+        task.assignments = [
+            TaskAssignmentDB(user_id=user.id, user=user) for user in (users[i % 10], users[(i + 1) % 10])
+        ]
+        tasks.append(task)
+    return tasks
+
+
+def response_model_path(field, tasks: list, pagination: dict) -> bytes:
+    """То, что делал эндпоинт: модель ответа, проверка по response_model, jsonable-словарь, stdlib json"""
+    content = PaginatedResponse[TaskResponse](
+        message="Tasks retrieved successfully",
+        data=[task_to_dict(task) for task in tasks],
+        pagination=pagination
+    )
+    encoded = asyncio.run(serialize_response(field=field, response_content=content))
+    return JSONResponse(encoded).body
+
+
+def fast_path(tasks: list, pagination: dict) -> bytes:
+    return task_page_response(
+        "Tasks retrieved successfully", [task_to_dict(task) for task in tasks], pagination
+    ).body
+
+
+def measure(label: str, run, items: int, repeat: int) -> float:
+    run()  # прогрев
+    started = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    per_item = (time.perf_counter() - started) / repeat / items * 1e6
+    print(f"{label:<16} {per_item:8.2f} мкс/задача")
+    return per_item
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение сериализации списка задач')
+    parser.add_argument('--items', type=int, default=1000, help='Задач на странице')
+    parser.add_argument('--repeat', type=int, default=20, help='Сколько раз сериализовать страницу')
+    args = parser.parse_args()
+
+    tasks = make_tasks(args.items)
+    pagination = {"total": args.items, "page": 1, "size": args.items, "has_next": False}
+    field = create_model_field(name="Response", type_=PaginatedResponse[TaskResponse], mode="serialization")
+
+    # Общая часть обоих путей — сборка словарей из ORM-объектов
+    measure("task_to_dict", lambda: [task_to_dict(task) for task in tasks], args.items, args.repeat)
+    before = measure("response_model", lambda: response_model_path(field, tasks, pagination), args.items, args.repeat)
+    after = measure("TypeAdapter", lambda: fast_path(tasks, pagination), args.items, args.repeat)
+    print(f"ускорение: x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Общий кэш ответов: get/set/delete и сброс по тегам.
+
+Бэкенд выбирается CACHE_BACKEND:
+
+* none (по умолчанию) — кэша нет;
+* memory — в памяти процесса; годится для одного экземпляра и для тестов,
+  реплики друг другу записи не сбрасывают;
+* redis — общий для всех реплик, CACHE_REDIS_URL (см. cache/redis_backend.py).
+"""
+import os
+import threading
+from typing import Optional
+
+from .base import CacheBackend
+from .memory import MemoryCache
+from .redis_backend import RedisCache
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "none").lower()
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "tasktracker:")
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+
+_cache: Optional[CacheBackend] = None
+_cache_lock = threading.Lock()
+
+
+def create_cache(backend: str = CACHE_BACKEND) -> Optional[CacheBackend]:
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return MemoryCache(max_size=CACHE_MAX_SIZE)
+    if backend == "redis":
+        return RedisCache.from_url(CACHE_REDIS_URL, prefix=CACHE_KEY_PREFIX)
+    raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+
+
+def get_cache() -> Optional[CacheBackend]:
+    """Кэш процесса по CACHE_BACKEND; None, если он выключен"""
+    global _cache
+    if _cache is None and CACHE_BACKEND != "none":
+        with _cache_lock:
+            if _cache is None:
+                _cache = create_cache()
+    return _cache
+
+
+def set_cache(cache: Optional[CacheBackend]) -> None:
+    """Подменить кэш процесса (None — создать заново по CACHE_BACKEND при следующем обращении)"""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+__all__ = [
+    "CacheBackend", "MemoryCache", "RedisCache",
+    "CACHE_TTL_SECONDS", "create_cache", "get_cache", "set_cache",
+]
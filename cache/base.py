@@ -0,0 +1,43 @@
+"""Общий интерфейс кэш-бэкендов"""
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional
+
+
+class CacheBackend(ABC):
+    """Ключ → байты с временем жизни; ключи помечаются тегами и сбрасываются по тегу.
+
+    Кэш — ускорение, а не хранилище: бэкенд не бросает исключения из-за
+    недоступности, а ведёт себя как пустой кэш.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float, tags: Iterable[str] = ()) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        ...
+
+    @abstractmethod
+    def invalidate_tags(self, *tags: str) -> None:
+        """Удалить все ключи, помеченные любым из тегов"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    # Варианты для кода под AsyncSession (crud/task_cache.py вызывает их из run_sync
+    # через await_only). Бэкенд с сетевым вводом-выводом переопределяет их, чтобы
+    # не блокировать event loop; бэкенду в памяти процесса хватает синхронных
+    async def aget(self, key: str) -> Optional[bytes]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: bytes, ttl: float, tags: Iterable[str] = ()) -> None:
+        self.set(key, value, ttl, tags)
+
+    async def ainvalidate_tags(self, *tags: str) -> None:
+        self.invalidate_tags(*tags)
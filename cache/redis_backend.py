@@ -0,0 +1,155 @@
+"""Кэш в Redis (или любом сервере с тем же протоколом): общий для всех реплик сервиса.
+
+Значение лежит в {prefix}{key} с PX = ttl, теги — множества ключей
+{prefix}tag:{tag}, а теги самой записи — в {prefix}tags:{key}: перезапись
+снимает ключ с прежних тегов. invalidate_tags() под WATCH множеств тегов
+читает их SUNION и удаляет ключи вместе с самими множествами в MULTI/EXEC:
+если set() успел пометить тегом новый ключ между чтением и удалением, EXEC
+отменяется и сброс повторяется, так что поздняя запись не остаётся в кэше
+без тега. Множество тега живёт tag_ttl, поэтому ttl записи ограничен им же:
+ключ не переживает свой тег.
+
+Нужен пакет redis (redis-py) для from_url(); без него модуль импортируется,
+а клиент можно передать в RedisCache напрямую.
+
+Клиент синхронный: под AsyncSession aget/aset/ainvalidate_tags выполняют те же
+операции в пуле потоков (asyncio.to_thread), и медленный Redis задерживает только
+свой запрос, а не весь event loop.
+Ошибки сервера не ломают запрос: чтение считается промахом, запись пропускается,
+и всё это видно в cache_errors_total.
+"""
+import asyncio
+import logging
+from typing import Iterable, Optional
+
+from cache.base import CacheBackend
+from monitoring.metrics import REGISTRY
+
+try:
+    from redis import RedisError, WatchError
+    REDIS_ERRORS = (RedisError, OSError)
+except ImportError:
+    class WatchError(Exception):
+        """Замена redis.WatchError, когда пакета нет: EXEC отменён из-за WATCH"""
+
+    REDIS_ERRORS = (OSError,)
+
+logger = logging.getLogger(__name__)
+
+CACHE_ERRORS = REGISTRY.counter("cache_errors_total", "Failed shared cache operations", ("operation",))
+
+
+class RedisCache(CacheBackend):
+    # Попыток сброса по тегам, если множества меняются параллельными set()
+    INVALIDATE_ATTEMPTS = 5
+
+    def __init__(self, client, prefix: str = "tasktracker:", tag_ttl: float = 3600):
+        self._client = client
+        self.prefix = prefix
+        self.tag_ttl = tag_ttl
+        self._errors = REDIS_ERRORS
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float = 0.25, **kwargs) -> "RedisCache":
+        """Клиент с короткими таймаутами: недоступный кэш не должен задерживать запросы"""
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+        client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        return cls(client, **kwargs)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _tag(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    def _key_tags(self, key) -> str:
+        # Члены множеств тегов приходят от сервера байтами
+        if isinstance(key, bytes):
+            key = key.decode()
+        return f"{self.prefix}tags:{key[len(self.prefix):]}"
+
+    def _failed(self, operation: str, error: Exception) -> None:
+        CACHE_ERRORS.inc(operation=operation)
+        logger.warning("Cache %s failed: %s", operation, error)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._client.get(self._key(key))
+        except self._errors as e:
+            self._failed("get", e)
+            return None
+
+    def set(self, key: str, value: bytes, ttl: float, tags: Iterable[str] = ()) -> None:
+        key = self._key(key)
+        key_tags = self._key_tags(key)
+        tags = list(tags)
+        px = int(min(ttl, self.tag_ttl) * 1000)
+        try:
+            # Гонка двух перезаписей оставит ключ в лишнем теге: это лишний промах, не устаревшие данные
+            previous = self._client.smembers(key_tags)
+            pipeline = self._client.pipeline(transaction=True)
+            for tag in previous:
+                pipeline.srem(tag, key)
+            pipeline.set(key, value, px=px)
+            pipeline.delete(key_tags)
+            if tags:
+                pipeline.sadd(key_tags, *(self._tag(tag) for tag in tags))
+                pipeline.pexpire(key_tags, px)
+            for tag in tags:
+                pipeline.sadd(self._tag(tag), key)
+                pipeline.pexpire(self._tag(tag), int(self.tag_ttl * 1000))
+            pipeline.execute()
+        except self._errors as e:
+            self._failed("set", e)
+
+    def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        try:
+            keys = [self._key(key) for key in keys]
+            self._client.delete(*keys, *(self._key_tags(key) for key in keys))
+        except self._errors as e:
+            self._failed("delete", e)
+
+    def invalidate_tags(self, *tags: str) -> None:
+        if not tags:
+            return
+        tag_keys = [self._tag(tag) for tag in tags]
+        try:
+            with self._client.pipeline(transaction=True) as pipeline:
+                for _ in range(self.INVALIDATE_ATTEMPTS):
+                    try:
+                        pipeline.watch(*tag_keys)
+                        keys = pipeline.sunion(tag_keys)
+                        pipeline.multi()
+                        key_tags = [self._key_tags(key) for key in keys]
+                        pipeline.delete(*keys, *key_tags, *tag_keys)
+                        pipeline.execute()
+                        return
+                    except WatchError:
+                        continue
+            raise WatchError(f"tags changed {self.INVALIDATE_ATTEMPTS} times during invalidation")
+        except (WatchError, *self._errors) as e:
+            # Не сброшенные записи доживут до ttl
+            self._failed("invalidate", e)
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: bytes, ttl: float, tags: Iterable[str] = ()) -> None:
+        await asyncio.to_thread(self.set, key, value, ttl, list(tags))
+
+    async def ainvalidate_tags(self, *tags: str) -> None:
+        await asyncio.to_thread(self.invalidate_tags, *tags)
+
+    def clear(self) -> None:
+        """Удалить все ключи с этим префиксом (SCAN, без блокировки сервера)"""
+        try:
+            keys = list(self._client.scan_iter(match=f"{self.prefix}*"))
+            if keys:
+                self._client.delete(*keys)
+        except self._errors as e:
+            self._failed("clear", e)
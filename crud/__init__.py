@@ -13,16 +13,33 @@ from .user import (
 
 from .task import (
     get_task,
+    get_task_payload,
     get_tasks,
     get_tasks_count,
+    get_task_projections,
+    get_task_projection,
+    get_task_version,
+    get_task_list_validators,
     create_task,
+    create_subtask,
+    create_tasks_bulk,
     update_task,
     task_to_dict,
     update_task_status,
+    update_task_status_with_cascade,
+    bulk_update_task_status,
+    are_all_children_completed,
+    propagate_task_status,
     delete_task,
     assign_users_to_task,
+    apply_task_assignments,
     get_user_tasks,
     get_task_stats,
+    get_task_creator_ids,
     create_task_hierarchy,
     get_task_hierarchy,
+    get_task_tree,
+    get_ancestor_ids,
+    get_descendant_ids,
+    would_create_cycle,
 )
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""Курсорная (keyset) пагинация.
+
+Курсор — непрозрачная для клиента строка: base64url от JSON с ключом сортировки
+последней строки страницы. Следующая страница начинается с WHERE (ключ) < (курсор),
+поэтому не замедляется с глубиной, как OFFSET, и строки не "переезжают" между
+страницами, когда задачи обновляются во время листания.
+"""
+import base64
+import binascii
+import datetime
+import json
+import os
+from typing import Any, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable, Select
+
+# Оценке планировщика ниже этого порога не доверяем: посчитать точно уже дёшево
+COUNT_ESTIMATE_EXACT_THRESHOLD = int(os.getenv("COUNT_ESTIMATE_EXACT_THRESHOLD", "10000"))
+
+
+class InvalidCursor(ValueError):
+    """Курсор повреждён или выдан для другой сортировки"""
+
+
+def encode_cursor(*values: Any) -> str:
+    """Упаковать ключ сортировки в курсор"""
+    payload = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> Tuple[Any, ...]:
+    """Распаковать курсор, проверив число и типы значений ключа"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if not isinstance(payload, list) or len(payload) != len(types):
+        raise InvalidCursor("Cursor does not match this listing")
+
+    values = []
+    for value, expected in zip(payload, types):
+        try:
+            if expected is datetime.datetime:
+                value = datetime.datetime.fromisoformat(value)
+            elif not isinstance(value, expected) or isinstance(value, bool):
+                raise TypeError(value)
+        except (TypeError, ValueError) as e:
+            raise InvalidCursor("Cursor does not match this listing") from e
+        values.append(value)
+    return tuple(values)
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) для произвольного SELECT — план без выполнения запроса"""
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def exact_count(db: Session, statement: Select) -> int:
+    """COUNT(*) по выборке"""
+    return db.execute(select(func.count()).select_from(statement.subquery())).scalar()
+
+
+def estimate_count(db: Session, statement: Select, table_name: str) -> Tuple[int, bool]:
+    """Примерное число строк выборки по статистике планировщика PostgreSQL.
+
+    Без фильтров берётся pg_class.reltuples таблицы, с фильтрами — оценка строк
+    из EXPLAIN. Маленькие оценки и другие СУБД считаются точно.
+    Возвращает (число, это_оценка).
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return exact_count(db, statement), False
+
+    if statement.whereclause is None:
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)"),
+            {"table_name": table_name}
+        ).scalar()
+    else:
+        plan = db.execute(_Explain(statement)).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = plan[0]["Plan"]["Plan Rows"]
+
+    # reltuples = -1, пока таблицу ни разу не анализировали
+    if estimate is None or estimate < COUNT_ESTIMATE_EXACT_THRESHOLD:
+        return exact_count(db, statement), False
+    return int(estimate), True
@@ -1,14 +1,30 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, desc, asc, func
-from typing import List, Optional
+from sqlalchemy.orm import Session, joinedload, aliased, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy import and_, or_, desc, asc, func, case, literal, select, tuple_, cast, null, update, Integer, event, inspect
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
 import datetime
 import logging
+import os
+import re
 logger = logging.getLogger(__name__)
-from models.task import TaskDB, TaskHierarchyDB, TaskAssignmentDB, TaskStatus
+from models.task import (
+    TaskDB, TaskHierarchyDB, TaskAssignmentDB, TaskStatus, ACTIVE_TASK_CONDITION, TASK_SEARCH_CONFIG,
+    task_search_document
+)
+from models.task_counters import TaskCounterDB, SCOPE_ALL, SCOPE_USER, track_task_counters
+from models.task_closure import TaskClosureDB, creates_cycle, detach_task_from_closure, add_edges_for_new_tasks
+from models.task_versions import touch_tasks
+from crud.task_graph import get_task_graph, forget_task, remember_edges
+from crud.user_loader import user_loader, user_to_dict
+from crud.task_cache import cached_payload, invalidate_tasks, payload_tags, task_key, hierarchy_key
 from models.user import UserDB, UserRole
-from schemas.task import TaskCreate, TaskUpdate
+from schemas.task import TaskCreate, TaskUpdate, TaskTreeDirection, TaskTreeFormat, BulkTaskItem, AssignmentMode
+from monitoring.sql import track_sql
+from crud.pagination import encode_cursor, decode_cursor, estimate_count
 
 
+@track_sql
 def get_task(db: Session, task_id: int) -> Optional[TaskDB]:
     """Получить задачу по ID со всеми связями"""
     task = db.query(TaskDB).options(
@@ -26,25 +42,24 @@ def get_task(db: Session, task_id: int) -> Optional[TaskDB]:
 
 def task_to_dict(task: TaskDB) -> dict:
     """Преобразовать объект TaskDB в словарь для сериализации"""
-    creator_dict = None
-    if task.creator:
-        creator_dict = {
-            "id": task.creator.id,
-            "username": task.creator.username,
-            "full_name": task.creator.full_name,
-            "role": task.creator.role.value,
-            "created_at": task.creator.created_at
-        }
-    assigned_users = []
-    for assignment in task.assignments:
-        if assignment.user:
-            assigned_users.append({
-                "id": assignment.user.id,
-                "username": assignment.user.username,
-                "full_name": assignment.user.full_name,
-                "role": assignment.user.role.value,
-                "created_at": assignment.user.created_at
-            })
+    session = object_session(task)
+    if session is not None:
+        # Один словарь на пользователя на весь запрос, а не на каждую задачу
+        serialize_user = user_loader(session).serialize
+    else:
+        serialize_user = user_to_dict
+    creator_dict = serialize_user(task.creator) if task.creator else None
+    listed_user_ids = _listed_assignee_ids(task)
+    if listed_user_ids is not None:
+        # Задача из списка: исполнители — id из проекции и пользователи, уже лежащие в загрузчике
+        users = user_loader(session).get_many(session, listed_user_ids)
+        assigned_user_ids = listed_user_ids
+        assigned_users = [serialize_user(users[user_id]) for user_id in listed_user_ids if users[user_id]]
+    else:
+        assigned_user_ids = [assignment.user_id for assignment in task.assignments]
+        assigned_users = [
+            serialize_user(assignment.user) for assignment in task.assignments if assignment.user
+        ]
 
     return {
         "id": task.id,
@@ -55,56 +70,445 @@ def task_to_dict(task: TaskDB) -> dict:
         "creator_id": task.creator_id,
         "created_at": task.created_at,
         "updated_at": task.updated_at,
+        "version": task.version,
         "creator": creator_dict,
         "assigned_users": assigned_users,
-        "assigned_user_ids": [assignment.user_id for assignment in task.assignments]
+        "assigned_user_ids": assigned_user_ids
     }
 
 
-def get_tasks(
+# Слов в поисковом запросе учитываем не больше: каждое становится префиксом в tsquery
+SEARCH_MAX_TERMS = 8
+SEARCH_HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10, MaxFragments=2"
+SEARCH_SNIPPET_LENGTH = 160
+
+
+class TaskValidators(NamedTuple):
+    """Из чего строятся ETag и Last-Modified задачи.
+
+    users_updated_at — самый поздний updated_at создателя и исполнителей: правка
+    вложенного пользователя меняет ответ, но не version задачи. Для ответов
+    без пользователей (fields= без связей) он не нужен.
+    """
+    version: int
+    updated_at: datetime.datetime
+    users_updated_at: Optional[datetime.datetime] = None
+
+    @property
+    def last_modified(self) -> datetime.datetime:
+        if self.users_updated_at is None or self.users_updated_at < self.updated_at:
+            return self.updated_at
+        return self.users_updated_at
+
+
+# updated_at выставляется до commit: более медленная транзакция может закоммитить
+# значение старше уже видимого максимума. Пока последняя правка моложе этого окна,
+# валидатор списков не выдаётся
+TASK_LIST_SETTLE_SECONDS = float(os.getenv("TASK_LIST_SETTLE_SECONDS", "5"))
+
+
+class TaskListValidators(NamedTuple):
+    """Из чего строится ETag списков задач — без чтения самой страницы.
+
+    Правка или создание задачи сдвигает tasks_updated_at (в том числе назначения —
+    через touch_tasks), правка пользователя — users_updated_at, удаление задачи
+    меняет task_count. Валидатор общий для всех фильтров: любая запись сбрасывает
+    все списки, зато проверка — три чтения по индексам.
+    """
+    tasks_updated_at: Optional[datetime.datetime]
+    users_updated_at: Optional[datetime.datetime]
+    task_count: int
+
+
+@track_sql
+def get_task_list_validators(db: Session) -> Optional[TaskListValidators]:
+    """Валидаторы списков одним запросом; None, если последняя правка моложе TASK_LIST_SETTLE_SECONDS"""
+    row = db.execute(select(
+        select(func.max(TaskDB.updated_at)).scalar_subquery(),
+        select(func.max(UserDB.updated_at)).scalar_subquery(),
+        select(func.coalesce(func.sum(TaskCounterDB.count), 0)).where(
+            TaskCounterDB.scope == SCOPE_ALL, TaskCounterDB.user_id == 0
+        ).scalar_subquery()
+    )).one()
+    validators = TaskListValidators(*row)
+    latest = max((value for value in validators[:2] if value is not None), default=None)
+    if latest is not None and datetime.datetime.utcnow() - latest < datetime.timedelta(seconds=TASK_LIST_SETTLE_SECONDS):
+        return None
+    return validators
+
+
+def _users_updated_at(task: TaskDB) -> Optional[datetime.datetime]:
+    users = [task.creator, *(assignment.user for assignment in task.assignments)]
+    return max((user.updated_at for user in users if user is not None and user.updated_at), default=None)
+
+
+@track_sql
+def get_task_payload(db: Session, task_id: int) -> Optional[Tuple[dict, TaskValidators]]:
+    """task_to_dict задачи и её валидаторы через общий кэш (crud/task_cache.py); None, если задачи нет"""
+    def build():
+        task = get_task(db, task_id)
+        if task is None:
+            return None
+        payload = task_to_dict(task)
+        return {"task": payload, "users_updated_at": _users_updated_at(task)}, payload_tags(payload)
+
+    entry = cached_payload(db, "task", task_key(task_id), build)
+    if entry is None:
+        return None
+    payload = entry["task"]
+    return payload, TaskValidators(payload["version"], payload["updated_at"], entry["users_updated_at"])
+
+
+def search_terms(search: str) -> List[str]:
+    """Разбить поисковую строку на слова; спецсимволы tsquery (&, |, :, !) отбрасываются"""
+    return re.findall(r"[^\W_]+", search.lower())[:SEARCH_MAX_TERMS]
+
+
+def _use_full_text_search(db: Session) -> bool:
+    """Полнотекстовый индекс есть только в PostgreSQL"""
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _prefix_tsquery(terms: List[str]):
+    """tsquery "слово1:* & слово2:*" — все слова, каждое как префикс"""
+    return func.to_tsquery(TASK_SEARCH_CONFIG, " & ".join(f"{term}:*" for term in terms))
+
+
+def _search_condition(db: Session, search: str):
+    """Условие поиска: GIN-индекс в PostgreSQL, LIKE по каждому слову в остальных БД"""
+    terms = search_terms(search)
+    if terms and _use_full_text_search(db):
+        return task_search_document().op("@@")(_prefix_tsquery(terms))
+    patterns = [f"%{term}%" for term in terms] or [f"%{search}%"]
+    return and_(*(
+        or_(TaskDB.title.ilike(pattern), TaskDB.description.ilike(pattern))
+        for pattern in patterns
+    ))
+
+
+def _task_filters(
         db: Session,
-        skip: int = 0,
-        limit: int = 100,
         user_id: Optional[int] = None,
         status: Optional[str] = None,
-        search: Optional[str] = None,
-        include_assignments: bool = True
-) -> List[TaskDB]:
-    """Получить список задач с фильтрацией"""
-    query = db.query(TaskDB).distinct()  # Добавить distinct
-    if include_assignments:
-        query = query.options(
-            joinedload(TaskDB.creator),
-            joinedload(TaskDB.assignments).joinedload(TaskAssignmentDB.user)
-        )
+        search: Optional[str] = None
+) -> list:
+    """Общие условия фильтрации списков задач"""
+    conditions = []
     if user_id:
-        from sqlalchemy import exists
-        assignment_exists = exists().where(
+        assignment_exists = select(TaskAssignmentDB.task_id).where(
             and_(
                 TaskAssignmentDB.task_id == TaskDB.id,
                 TaskAssignmentDB.user_id == user_id
             )
-        )
-        query = query.filter(
-            or_(
-                TaskDB.creator_id == user_id,
-                assignment_exists
-            )
-        )
+        ).exists()
+        conditions.append(or_(TaskDB.creator_id == user_id, assignment_exists))
     if status:
-        query = query.filter(TaskDB.status == TaskStatus(status))
+        conditions.append(TaskDB.status == TaskStatus(status))
     if search:
-        search_filter = f"%{search}%"
-        query = query.filter(
-            or_(
-                TaskDB.title.ilike(search_filter),
-                TaskDB.description.ilike(search_filter)
-            )
-        )
+        conditions.append(_search_condition(db, search))
+    return conditions
+
+
+def _highlight(text: str, terms: List[str], length: int = SEARCH_SNIPPET_LENGTH) -> str:
+    """Фрагмент текста вокруг первого совпадения; найденные слова целиком обёрнуты в <mark>"""
+    pattern = re.compile(
+        r"[^\W_]*(?:" + "|".join(re.escape(term) for term in terms) + r")[^\W_]*", re.IGNORECASE
+    )
+    match = pattern.search(text)
+    start = max(0, match.start() - length // 3) if match else 0
+    fragment = pattern.sub(lambda m: f"<mark>{m.group(0)}</mark>", text[start:start + length])
+    return ("…" if start > 0 else "") + fragment + ("…" if start + length < len(text) else "")
+
+
+def _task_page(
+        db: Session,
+        skip: int,
+        limit: int,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None,
+        after: Optional[Tuple[datetime.datetime, int]] = None,
+        with_total: bool = False
+):
+    """Подзапрос id страницы задач (и total — count(*) OVER () до LIMIT, если with_total)"""
+    page = select(TaskDB.id, func.count().over().label("total")) if with_total else select(TaskDB.id)
+    for condition in _task_filters(db, user_id=user_id, status=status, search=search):
+        page = page.where(condition)
+    if after is not None:
+        # Сравнение строк целиком идёт по индексу ix_tasks_updated_at_id
+        page = page.where(tuple_(TaskDB.updated_at, TaskDB.id) < tuple_(*after))
+    # id — второй ключ: при равных updated_at порядок страниц не должен меняться
+    return page.order_by(desc(TaskDB.updated_at), desc(TaskDB.id)).offset(skip).limit(limit).subquery()
+
+
+@track_sql
+def get_tasks(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None,
+        include_assignments: bool = True,
+        after: Optional[Tuple[datetime.datetime, int]] = None
+) -> List[TaskDB]:
+    """Получить список задач с фильтрацией.
+
+    after — ключ (updated_at, id) последней задачи предыдущей страницы
+    (см. decode_task_cursor); с ним skip не нужен.
+
+    Страница выбирается по голым id (без JOIN, без DISTINCT), строки задач
+    подтягиваются к ней в том же запросе; назначения и пользователи — отдельными
+    IN-запросами, так что их число на задачу не раздувает выборку.
+    """
+    page = _task_page(db, skip, limit, user_id=user_id, status=status, search=search, after=after)
+
+    tasks = db.query(TaskDB).join(page, page.c.id == TaskDB.id).order_by(
+        desc(TaskDB.updated_at), desc(TaskDB.id)
+    ).all()
+    if include_assignments:
+        _load_task_users(db, tasks)
+    return tasks
+
+
+_LISTED_ASSIGNEES_KEY = "task_listed_assignee_ids"
+
+
+def _load_task_users(db: Session, tasks: List[TaskDB]) -> None:
+    """Исполнители страницы задач — списками id (_assignee_ids), пользователи — одним IN-запросом.
 
-    return query.order_by(desc(TaskDB.updated_at)).offset(skip).limit(limit).all()
+    ORM-объекты назначений не создаются: на задачу приходится одна строка
+    со списком id исполнителей. Списки запоминаются в сессии до конца транзакции,
+    task_to_dict берёт их, пока task.assignments не загружен. Создатель
+    проставляется как загруженная связь (set_committed_value).
+    """
+    assigned: Dict[int, List[int]] = {task.id: [] for task in tasks}
+    if tasks:
+        assigned.update(_assignee_ids(db, list(assigned)))
+    user_ids = {task.creator_id for task in tasks}
+    for task_user_ids in assigned.values():
+        user_ids.update(task_user_ids)
+    users = user_loader(db).get_many(db, user_ids)
+    for task in tasks:
+        set_committed_value(task, "creator", users[task.creator_id])
+    db.info.setdefault(_LISTED_ASSIGNEES_KEY, {}).update(assigned)
 
 
+def _assignee_ids(db: Session, task_ids: List[int]) -> Dict[int, List[int]]:
+    """id исполнителей задач, по возрастанию: одна строка на задачу, а не на назначение"""
+    dialect = db.get_bind().dialect.name
+    statement = select(TaskAssignmentDB.task_id).where(
+        TaskAssignmentDB.task_id.in_(task_ids)
+    ).group_by(TaskAssignmentDB.task_id)
+    if dialect == "postgresql":
+        rows = db.execute(statement.add_columns(
+            func.array_agg(postgresql.aggregate_order_by(TaskAssignmentDB.user_id, TaskAssignmentDB.user_id))
+        ))
+        return {task_id: list(user_ids) for task_id, user_ids in rows}
+    if dialect == "sqlite":
+        rows = db.execute(statement.add_columns(func.group_concat(TaskAssignmentDB.user_id)))
+        return {task_id: sorted(map(int, user_ids.split(","))) for task_id, user_ids in rows}
+
+    assigned: Dict[int, List[int]] = {}
+    for task_id, user_id in db.execute(
+        select(TaskAssignmentDB.task_id, TaskAssignmentDB.user_id)
+        .where(TaskAssignmentDB.task_id.in_(task_ids))
+        .order_by(TaskAssignmentDB.task_id, TaskAssignmentDB.user_id)
+    ):
+        assigned.setdefault(task_id, []).append(user_id)
+    return assigned
+
+
+def _listed_assignee_ids(task: TaskDB) -> Optional[List[int]]:
+    """id исполнителей из _load_task_users, если коллекция назначений задачи не загружалась"""
+    session = object_session(task)
+    if session is None or "assignments" not in inspect(task).unloaded:
+        return None
+    return session.info.get(_LISTED_ASSIGNEES_KEY, {}).get(task.id)
+
+
+@event.listens_for(Session, "after_flush")
+def _forget_listed_assignees(session: Session, flush_context) -> None:
+    # Назначения могли измениться: дальше — только из самой коллекции
+    session.info.pop(_LISTED_ASSIGNEES_KEY, None)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _reset_listed_assignees(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_LISTED_ASSIGNEES_KEY, None)
+
+
+@track_sql
+def get_tasks_with_total(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None
+) -> Tuple[List[TaskDB], int]:
+    """Страница задач и общее число совпадений.
+
+    count(*) OVER () считается по всем отфильтрованным id до LIMIT, поэтому
+    второй проход по тем же условиям (get_tasks_count) не нужен.
+    """
+    page = _task_page(db, skip, limit, user_id=user_id, status=status, search=search, with_total=True)
+    rows = db.query(TaskDB, page.c.total).join(page, page.c.id == TaskDB.id).order_by(
+        desc(TaskDB.updated_at), desc(TaskDB.id)
+    ).all()
+
+    if not rows:
+        # За последней страницей оконной функции не из чего взять total
+        return [], get_tasks_count(db, user_id=user_id, status=status, search=search) if skip else 0
+    tasks = [task for task, _ in rows]
+    _load_task_users(db, tasks)
+    return tasks, rows[0].total
+
+
+# Поля задачи для fields= и связи для expand= (в ответе: creator и assigned_users)
+TASK_FIELDS = (
+    "id", "title", "description", "due_date", "status", "creator_id", "created_at", "updated_at", "version",
+    "assigned_user_ids"
+)
+TASK_EXPANSIONS = ("creator", "assignees")
+
+
+class TaskProjection(NamedTuple):
+    """Задача в урезанном виде: data для ответа плюс ключ сортировки для task_cursor и version для ETag"""
+    id: int
+    updated_at: datetime.datetime
+    version: int
+    data: dict
+
+
+def _task_projections(
+        db: Session, page, fields: Sequence[str], expand: Sequence[str], with_total: bool = False
+) -> Tuple[List[TaskProjection], Optional[int]]:
+    """Запрошенные поля задач страницы: в SELECT только их колонки, связи — только из expand"""
+    columns = [name for name in TASK_FIELDS if name in fields and name not in ("id", "assigned_user_ids")]
+    selected = dict.fromkeys(
+        ["id", "updated_at", "version", *columns, *(["creator_id"] if "creator" in expand else [])]
+    )
+    statement = select(*(getattr(TaskDB, name) for name in selected))
+    if with_total:
+        statement = statement.add_columns(page.c.total)
+    rows = db.execute(
+        statement.join(page, page.c.id == TaskDB.id).order_by(desc(TaskDB.updated_at), desc(TaskDB.id))
+    ).all()
+    total = rows[0].total if with_total and rows else None
+
+    assigned: Dict[int, List[int]] = {}
+    if rows and ("assigned_user_ids" in fields or "assignees" in expand):
+        for task_id, user_id in db.execute(
+            select(TaskAssignmentDB.task_id, TaskAssignmentDB.user_id)
+            .where(TaskAssignmentDB.task_id.in_([row.id for row in rows]))
+            .order_by(TaskAssignmentDB.task_id, TaskAssignmentDB.user_id)
+        ):
+            assigned.setdefault(task_id, []).append(user_id)
+    loader = user_loader(db)
+    users: Dict[int, Optional[UserDB]] = {}
+    if rows and expand:
+        user_ids = {row.creator_id for row in rows} if "creator" in expand else set()
+        if "assignees" in expand:
+            user_ids.update(user_id for task_user_ids in assigned.values() for user_id in task_user_ids)
+        users = loader.get_many(db, user_ids)
+
+    projections = []
+    for row in rows:
+        data = {"id": row.id}
+        for name in columns:
+            value = getattr(row, name)
+            data[name] = value.value if name == "status" else value
+        if "assigned_user_ids" in fields:
+            data["assigned_user_ids"] = assigned.get(row.id, [])
+        if "creator" in expand:
+            creator = users.get(row.creator_id)
+            data["creator"] = loader.serialize(creator) if creator else None
+        if "assignees" in expand:
+            data["assigned_users"] = [
+                loader.serialize(users[user_id]) for user_id in assigned.get(row.id, []) if users.get(user_id)
+            ]
+        projections.append(TaskProjection(row.id, row.updated_at, row.version, data))
+    return projections, total
+
+
+@track_sql
+def get_task_projections(
+        db: Session,
+        fields: Sequence[str] = TASK_FIELDS,
+        expand: Sequence[str] = (),
+        skip: int = 0,
+        limit: int = 100,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None,
+        after: Optional[Tuple[datetime.datetime, int]] = None,
+        with_total: bool = False
+) -> Tuple[List[TaskProjection], Optional[int]]:
+    """Страница задач только с полями fields и связями expand (sparse fieldsets).
+
+    Без assigned_user_ids и expand — один запрос по нужным колонкам; назначения
+    и пользователи читаются, только если их попросили. total — как в
+    get_tasks_with_total, если with_total, иначе None.
+    """
+    page = _task_page(
+        db, skip, limit, user_id=user_id, status=status, search=search, after=after, with_total=with_total
+    )
+    projections, total = _task_projections(db, page, fields, expand, with_total)
+    if with_total and total is None:
+        total = get_tasks_count(db, user_id=user_id, status=status, search=search) if skip else 0
+    return projections, total
+
+
+@track_sql
+def get_task_projection(
+        db: Session, task_id: int, fields: Sequence[str] = TASK_FIELDS
+) -> Optional[TaskProjection]:
+    """Поля fields одной задачи без связей (для expand нужен get_task); None, если задачи нет"""
+    page = select(TaskDB.id).where(TaskDB.id == task_id).subquery()
+    projections, _ = _task_projections(db, page, fields, ())
+    return projections[0] if projections else None
+
+
+@track_sql
+def get_task_version(db: Session, task_id: int) -> Optional[TaskValidators]:
+    """Валидаторы задачи одним запросом по первичному ключу — для проверки If-None-Match"""
+    task_user_ids = select(TaskAssignmentDB.user_id).where(TaskAssignmentDB.task_id == task_id)
+    users_updated_at = select(func.max(UserDB.updated_at)).where(
+        or_(UserDB.id == TaskDB.creator_id, UserDB.id.in_(task_user_ids))
+    ).scalar_subquery()
+    row = db.execute(
+        select(TaskDB.version, TaskDB.updated_at, users_updated_at).where(TaskDB.id == task_id)
+    ).first()
+    return TaskValidators(*row) if row else None
+
+
+@track_sql
+def estimate_tasks_count(
+        db: Session,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None
+) -> Tuple[int, bool]:
+    """Примерное число задач по статистике планировщика: (число, это_оценка)"""
+    statement = select(TaskDB.id)
+    for condition in _task_filters(db, user_id=user_id, status=status, search=search):
+        statement = statement.where(condition)
+    return estimate_count(db, statement, TaskDB.__tablename__)
+
+
+def task_cursor(task: TaskDB) -> str:
+    """Курсор, с которого начинается страница после этой задачи"""
+    return encode_cursor(task.updated_at, task.id)
+
+
+def decode_task_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    """Ключ (updated_at, id) из курсора; InvalidCursor, если курсор не от списка задач"""
+    return decode_cursor(cursor, datetime.datetime, int)
+
+
+@track_sql
 def get_tasks_count(
         db: Session,
         user_id: Optional[int] = None,
@@ -112,62 +516,264 @@ def get_tasks_count(
         search: Optional[str] = None
 ) -> int:
     """Получить общее количество задач для пагинации"""
-    if user_id:
-        from sqlalchemy import exists
-        assignment_exists = exists().where(
-            and_(
-                TaskAssignmentDB.task_id == TaskDB.id,
-                TaskAssignmentDB.user_id == user_id
-            )
-        )
-        query = db.query(TaskDB).filter(
-            or_(
-                TaskDB.creator_id == user_id,
-                assignment_exists
-            )
-        )
+    query = db.query(TaskDB)
+    for condition in _task_filters(db, user_id=user_id, status=status, search=search):
+        query = query.filter(condition)
+    return query.count()
+
+
+@track_sql
+def search_tasks(
+        db: Session,
+        search: str,
+        skip: int = 0,
+        limit: int = 20,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None
+) -> Tuple[List[Tuple[TaskDB, float, str]], bool]:
+    """Поиск задач по релевантности с подсвеченными фрагментами.
+
+    Возвращает ([(задача, ранг, фрагмент)], есть_следующая_страница). Общее число
+    совпадений не считается: на миллионах задач count дороже самого поиска.
+    """
+    terms = search_terms(search)
+    if not terms:
+        return [], False
+
+    full_text = _use_full_text_search(db)
+    if full_text:
+        tsquery = _prefix_tsquery(terms)
+        rank = func.ts_rank_cd(task_search_document(), tsquery)
     else:
-        query = db.query(TaskDB)
-    if status:
-        query = query.filter(TaskDB.status == TaskStatus(status))
-    if search:
-        search_filter = f"%{search}%"
-        query = query.filter(
-            or_(
-                TaskDB.title.ilike(search_filter),
-                TaskDB.description.ilike(search_filter)
-            )
+        # Без tsvector: совпадение в заголовке весит больше, чем в описании
+        rank = literal(0.0)
+        for term in terms:
+            pattern = f"%{term}%"
+            rank = rank + case((TaskDB.title.ilike(pattern), 1.0), else_=0.0) \
+                + case((TaskDB.description.ilike(pattern), 0.4), else_=0.0)
+
+    page = select(TaskDB.id, TaskDB.updated_at, rank.label("rank"))
+    for condition in _task_filters(db, user_id=user_id, status=status, search=search):
+        page = page.where(condition)
+    page = page.order_by(desc("rank"), desc(TaskDB.updated_at), desc(TaskDB.id)) \
+        .offset(skip).limit(limit + 1).subquery()
+
+    # Фрагменты строим только для страницы: ts_headline перечитывает весь текст задачи
+    if full_text:
+        snippet = func.ts_headline(
+            TASK_SEARCH_CONFIG,
+            func.concat_ws(" — ", TaskDB.title, TaskDB.description),
+            tsquery,
+            SEARCH_HEADLINE_OPTIONS
         )
-    return query.count()
+        columns = [page.c.id, page.c.rank, snippet]
+    else:
+        columns = [page.c.id, page.c.rank, TaskDB.title, TaskDB.description]
+    rows = db.execute(
+        select(*columns).join(TaskDB, TaskDB.id == page.c.id)
+        .order_by(desc(page.c.rank), desc(page.c.updated_at), desc(page.c.id))
+    ).all()
+
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], has_next
+
+    tasks = db.query(TaskDB).options(
+        joinedload(TaskDB.creator),
+        joinedload(TaskDB.assignments).joinedload(TaskAssignmentDB.user)
+    ).filter(TaskDB.id.in_([row[0] for row in rows])).all()
+    tasks_by_id = {task.id: task for task in tasks}
 
+    results = []
+    for row in rows:
+        if full_text:
+            snippet_text = row[2]
+        else:
+            snippet_text = _highlight(" — ".join(filter(None, (row[2], row[3]))), terms)
+        results.append((tasks_by_id[row[0]], float(row[1]), snippet_text))
+    return results, has_next
 
-def create_task(db: Session, task: TaskCreate) -> TaskDB:
-    """Создать новую задачу"""
+
+def _commit_task_write(db: Session, db_task: TaskDB, return_minimal: bool = False) -> dict:
+    """Закоммитить изменения задачи и вернуть её: целиком — одним запросом, или только id и version.
+
+    id и version читаются после flush, до commit: commit истекает атрибуты,
+    и для минимального ответа больше не нужно ни одного запроса.
+    """
+    db.flush()
+    task_id, version = db_task.id, db_task.version
+    invalidate_tasks(db, [task_id])
+    db.commit()
+    if return_minimal:
+        return {"id": task_id, "version": version}
+    return task_to_dict(get_task(db, task_id))
+
+
+@track_sql
+def create_task(db: Session, task: TaskCreate, return_minimal: bool = False) -> dict:
+    """Создать новую задачу вместе с назначениями одной транзакцией (несуществующие пользователи пропускаются)"""
+    assigned_user_ids = list(dict.fromkeys(task.assigned_user_ids or []))
+    users = user_loader(db).get_many(db, assigned_user_ids)
     db_task = TaskDB(
         title=task.title,
         description=task.description,
         due_date=task.due_date,
         creator_id=task.creator_id,
-        status=TaskStatus.OPEN
+        status=TaskStatus.OPEN,
+        assignments=[TaskAssignmentDB(user_id=user_id) for user_id in assigned_user_ids if users[user_id]]
     )
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
-    if task.assigned_user_ids:
-        assign_users_to_task(db, db_task.id, task.assigned_user_ids)
-    created_task = get_task(db, db_task.id)
-    if created_task:
-        return task_to_dict(created_task)
-    return None
+    return _commit_task_write(db, db_task, return_minimal)
 
 
-def update_task(db: Session, task_id: int, task_update: TaskUpdate, current_user_id: int) -> Optional[dict]:
+@track_sql
+def create_subtask(db: Session, parent_id: int, subtask: TaskCreate, return_minimal: bool = False) -> Optional[dict]:
+    """Создать подзадачу с назначениями родителя и связью с ним одной транзакцией; None, если родителя нет"""
+    if db.query(TaskDB.id).filter(TaskDB.id == parent_id).first() is None:
+        return None
+    parent_user_ids = [
+        user_id for user_id, in db.query(TaskAssignmentDB.user_id).filter(TaskAssignmentDB.task_id == parent_id)
+    ]
+    db_task = TaskDB(
+        title=subtask.title,
+        description=subtask.description,
+        due_date=subtask.due_date,
+        creator_id=subtask.creator_id,
+        status=TaskStatus.OPEN,
+        assignments=[TaskAssignmentDB(user_id=user_id) for user_id in parent_user_ids],
+        # Подзадача только что создана и не имеет потомков, цикл здесь невозможен;
+        # task_closure дополняется при flush связи
+        parent_relations=[TaskHierarchyDB(parent_id=parent_id)]
+    )
+    db.add(db_task)
+    invalidate_tasks(db, [parent_id])
+    return _commit_task_write(db, db_task, return_minimal)
+
+
+def _bulk_item_errors(db: Session, items: List[BulkTaskItem]) -> List[Optional[str]]:
+    """Ошибка для каждого элемента или None; пользователи и родители проверяются парой IN-запросов"""
+    user_ids = {item.creator_id for item in items}
+    for item in items:
+        user_ids.update(item.assigned_user_ids)
+    users = {user_id: user for user_id, user in user_loader(db).get_many(db, user_ids).items() if user}
+    parent_ids = {item.parent_id for item in items if item.parent_id is not None}
+    existing_parents = {
+        task_id for task_id, in db.query(TaskDB.id).filter(TaskDB.id.in_(parent_ids))
+    } if parent_ids else set()
+
+    refs: dict = {}
+    errors: List[Optional[str]] = []
+    for index, item in enumerate(items):
+        creator = users.get(item.creator_id)
+        missing = [user_id for user_id in item.assigned_user_ids if user_id not in users]
+        error = None
+        if creator is None:
+            error = f"Creator user with id {item.creator_id} not found"
+        elif not creator.can_create_task():
+            error = f"User with role '{creator.role.value}' cannot create tasks"
+        elif missing:
+            error = f"User with id {missing[0]} not found"
+        elif item.ref is not None and item.ref in refs:
+            error = f"Duplicate ref '{item.ref}'"
+        elif item.parent_id is not None and item.parent_ref is not None:
+            error = "Use either parent_id or parent_ref, not both"
+        elif item.parent_id is not None and item.parent_id not in existing_parents:
+            error = f"Parent task with id {item.parent_id} not found"
+        if item.ref is not None and item.ref not in refs:
+            refs[item.ref] = index
+        errors.append(error)
+
+    # Ссылки внутри пачки: неизвестный ref, цикл или упавший родитель делают элемент ошибочным
+    state: dict = {}
+    for index in range(len(items)):
+        chain = []
+        current = index
+        while current is not None and current not in state:
+            if current in chain:
+                for looped in chain[chain.index(current):]:
+                    state[looped] = "Cycle in parent_ref"
+                break
+            chain.append(current)
+            parent_ref = items[current].parent_ref
+            if errors[current] is not None or parent_ref is None:
+                state[current] = errors[current]
+                break
+            if parent_ref not in refs:
+                state[current] = f"Unknown parent_ref '{parent_ref}'"
+                break
+            current = refs[parent_ref]
+        for child in reversed(chain):
+            if child in state:
+                continue
+            parent_error = state[refs[items[child].parent_ref]]
+            state[child] = f"Parent item failed: {parent_error}" if parent_error else None
+    return [state[index] for index in range(len(items))]
+
+
+@track_sql
+def create_tasks_bulk(db: Session, items: List[BulkTaskItem]) -> List[dict]:
+    """Создать пачку задач одной транзакцией; результат по каждому элементу в исходном порядке.
+
+    Задачи и назначения уходят одним flush — SQLAlchemy собирает их в многострочные
+    INSERT ... RETURNING; связи с родителями — одним executemany в task_hierarchy,
+    closure для них выводится без обхода (add_edges_for_new_tasks). Элементы с
+    ошибкой (и подзадачи, ссылающиеся на них через parent_ref) не создаются,
+    остальные создаются.
+    """
+    errors = _bulk_item_errors(db, items)
+    created = {}
+    ids = {}
+    for index, (item, error) in enumerate(zip(items, errors)):
+        if error is None:
+            created[index] = TaskDB(
+                title=item.title,
+                description=item.description,
+                due_date=item.due_date,
+                creator_id=item.creator_id,
+                status=TaskStatus.OPEN,
+                assignments=[TaskAssignmentDB(user_id=user_id) for user_id in dict.fromkeys(item.assigned_user_ids)]
+            )
+    if created:
+        db.add_all(created.values())
+        db.flush()
+        # После commit атрибуты истекают: id читаются сейчас, без запроса на каждую задачу
+        ids = {index: task.id for index, task in created.items()}
+
+        refs = {item.ref: index for index, item in enumerate(items) if item.ref is not None and index in created}
+        edges = []
+        for index in created:
+            item = items[index]
+            if item.parent_id is not None:
+                edges.append((item.parent_id, ids[index]))
+            elif item.parent_ref is not None:
+                edges.append((ids[refs[item.parent_ref]], ids[index]))
+        # Иерархия родителей теперь включает новые задачи
+        invalidate_tasks(db, [*ids.values(), *(parent_id for parent_id, _ in edges)])
+        if edges:
+            db.execute(TaskHierarchyDB.__table__.insert(), [
+                {"parent_id": parent_id, "child_id": child_id} for parent_id, child_id in edges
+            ])
+            add_edges_for_new_tasks(db.connection(), edges)
+            remember_edges(db, edges)
+        db.commit()
+
+    return [
+        {"index": index, "ref": item.ref, "id": ids.get(index), "error": error}
+        for index, (item, error) in enumerate(zip(items, errors))
+    ]
+
+
+@track_sql
+def update_task(
+        db: Session, task_id: int, task_update: TaskUpdate, current_user_id: int, return_minimal: bool = False
+) -> Optional[dict]:
     """Обновить задачу с проверкой прав"""
     db_task = get_task(db, task_id)
     if not db_task:
         return None
     if db_task.creator_id != current_user_id:
-        user = db.query(UserDB).filter(UserDB.id == current_user_id).first()
+        user = user_loader(db).get(db, current_user_id)
         if not user or user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
             return None
     update_data = task_update.dict(exclude_unset=True)
@@ -176,75 +782,207 @@ def update_task(db: Session, task_id: int, task_update: TaskUpdate, current_user
             setattr(db_task, field, value)
     if 'status' in update_data and update_data['status'] is not None:
         db_task.status = TaskStatus(update_data['status'])
-    if 'assigned_user_ids' in update_data:
-        assign_users_to_task(db, task_id, task_update.assigned_user_ids)
     db_task.updated_at = datetime.datetime.utcnow()
-    db.commit()
-    db.refresh(db_task)
-    return task_to_dict(db_task)
+    # Пустой список снимает все назначения; поле не передано — назначения не трогаем
+    if task_update.assigned_user_ids is not None:
+        _apply_task_assignments(
+            db, task_id, task_update.assigned_user_ids, AssignmentMode.REPLACE, skip_missing=True, touch_task=False
+        )
+    return _commit_task_write(db, db_task, return_minimal)
 
 
-def update_task_status(db: Session, task_id: int, new_status: TaskStatus, current_user_id: int) -> Optional[dict]:
-    """Обновить статус задачи (могут создатель или назначенные)"""
+def _set_task_status(
+        db: Session, task_id: int, new_status: TaskStatus, current_user_id: int
+) -> Optional[Tuple[TaskDB, TaskStatus]]:
+    """Сменить статус без commit; (задача, прежний статус) или None, если задачи нет или нет прав"""
     db_task = get_task(db, task_id)
     if not db_task:
         return None
     is_assigned = any(assignment.user_id == current_user_id for assignment in db_task.assignments)
     if db_task.creator_id != current_user_id and not is_assigned:
-        user = db.query(UserDB).filter(UserDB.id == current_user_id).first()
+        user = user_loader(db).get(db, current_user_id)
         if not user or user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
             return None
+    previous_status = db_task.status
     db_task.status = new_status
     db_task.updated_at = datetime.datetime.utcnow()
-    db.commit()
-    db.refresh(db_task)
-    return task_to_dict(db_task)
+    return db_task, previous_status
 
 
+@track_sql
+def update_task_status(
+        db: Session, task_id: int, new_status: TaskStatus, current_user_id: int, return_minimal: bool = False
+) -> Optional[dict]:
+    """Обновить статус задачи (могут создатель или назначенные)"""
+    changed = _set_task_status(db, task_id, new_status, current_user_id)
+    if not changed:
+        return None
+    db_task, _ = changed
+    return _commit_task_write(db, db_task, return_minimal)
+
+
+@track_sql
 def are_all_children_completed(db: Session, parent_id: int) -> bool:
     """Проверить, все ли дочерние задачи родителя выполнены"""
-    child_relations = db.query(TaskHierarchyDB).filter(
+    total, pending = db.query(
+        func.count(TaskDB.id),
+        func.sum(case((TaskDB.status != TaskStatus.COMPLETED, 1), else_=0))
+    ).join(TaskHierarchyDB, TaskHierarchyDB.child_id == TaskDB.id).filter(
         TaskHierarchyDB.parent_id == parent_id
-    ).all()
+    ).one()
+    return total > 0 and not pending
 
-    if not child_relations:
-        return False
-    child_ids = [relation.child_id for relation in child_relations]
-    child_tasks = db.query(TaskDB).filter(TaskDB.id.in_(child_ids)).all()
-    return all(task.status == TaskStatus.COMPLETED for task in child_tasks)
+
+# Статус, в который возвращаются выполненные предки, когда подзадачу переоткрыли
+REOPENED_ANCESTOR_STATUS = TaskStatus.IN_PROGRESS
+
+
+@track_sql
+def propagate_task_status(db: Session, task_ids: List[int], new_status: TaskStatus) -> int:
+    """Протянуть новый статус задач вверх по всем их предкам; возвращает число изменённых предков.
+
+    COMPLETED: выполненными становятся все предки (по всем родителям, на любой
+    глубине), у которых теперь выполнены все потомки. Другой статус: выполненные
+    предки возвращаются в REOPENED_ANCESTOR_STATUS — у них снова есть незавершённый
+    потомок. В обоих случаях это один UPDATE по task_closure на всю пачку задач;
+    commit делает вызывающий. Права на предков не проверяются: это следствие
+    изменения самих задач.
+    """
+    if not task_ids:
+        return 0
+    ancestor_ids = [
+        ancestor_id for ancestor_id, in db.query(TaskClosureDB.ancestor_id).filter(
+            TaskClosureDB.descendant_id.in_(task_ids)
+        ).distinct().order_by(TaskClosureDB.ancestor_id)
+    ]
+    if not ancestor_ids:
+        return 0
+
+    if new_status == TaskStatus.COMPLETED:
+        # UPDATE видит статусы до себя, поэтому другие предки задач не считаются
+        # помехой: их потомки — подмножество потомков проверяемого, и если он готов,
+        # то и они закрываются этим же запросом
+        descendant = aliased(TaskDB)
+        pending_descendants = select(TaskClosureDB.descendant_id).join(
+            descendant, descendant.id == TaskClosureDB.descendant_id
+        ).where(
+            TaskClosureDB.ancestor_id == TaskDB.id,
+            descendant.status != TaskStatus.COMPLETED,
+            descendant.id.not_in(ancestor_ids)
+        )
+        statement = update(TaskDB).where(
+            TaskDB.id.in_(ancestor_ids),
+            TaskDB.status != TaskStatus.COMPLETED,
+            ~pending_descendants.exists()
+        ).values(status=TaskStatus.COMPLETED, updated_at=datetime.datetime.utcnow(), version=TaskDB.version + 1)
+    else:
+        statement = update(TaskDB).where(
+            TaskDB.id.in_(ancestor_ids),
+            TaskDB.status == TaskStatus.COMPLETED
+        ).values(status=REOPENED_ANCESTOR_STATUS, updated_at=datetime.datetime.utcnow(), version=TaskDB.version + 1)
+
+    with track_task_counters(db, ancestor_ids):
+        result = db.execute(statement.execution_options(synchronize_session=False))
+    if result.rowcount:
+        invalidate_tasks(db, ancestor_ids)
+    return result.rowcount
+
+
+# Итог для каждого id в bulk_update_task_status
+BULK_STATUS_UPDATED = "updated"
+BULK_STATUS_UNCHANGED = "unchanged"        # статус уже такой
+BULK_STATUS_NOT_FOUND = "not_found"
+BULK_STATUS_FORBIDDEN = "forbidden"
+BULK_STATUS_CONFLICT = "status_mismatch"   # текущий статус не равен expected_status
 
 
+@track_sql
+def bulk_update_task_status(
+        db: Session,
+        task_ids: List[int],
+        new_status: TaskStatus,
+        current_user_id: int,
+        expected_status: Optional[TaskStatus] = None
+) -> dict:
+    """Перевести пачку задач в new_status одним UPDATE и один раз протянуть статус по предкам.
+
+    Права проверяются для всей пачки одним запросом: создатель или исполнитель
+    задачи, либо ADMIN/MANAGER. Строки блокируются (FOR UPDATE) до конца
+    транзакции, чтобы проверка expected_status не разошлась с UPDATE.
+    """
+    user = user_loader(db).get(db, current_user_id)
+    privileged = user is not None and user.role in (UserRole.ADMIN, UserRole.MANAGER)
+    is_assigned = select(TaskAssignmentDB.task_id).where(
+        TaskAssignmentDB.task_id == TaskDB.id,
+        TaskAssignmentDB.user_id == current_user_id
+    ).exists()
+    rows = db.query(TaskDB.id, TaskDB.status, TaskDB.creator_id, is_assigned).filter(
+        TaskDB.id.in_(task_ids)
+    ).order_by(TaskDB.id).with_for_update(of=TaskDB).all()
+    found = {task_id: (status, creator_id == current_user_id or assigned)
+             for task_id, status, creator_id, assigned in rows}
+
+    results = {}
+    to_update = []
+    reopened = []
+    for task_id in dict.fromkeys(task_ids):
+        if task_id not in found:
+            results[task_id] = BULK_STATUS_NOT_FOUND
+            continue
+        status, involved = found[task_id]
+        if not involved and not privileged:
+            results[task_id] = BULK_STATUS_FORBIDDEN
+        elif expected_status is not None and status != expected_status:
+            results[task_id] = BULK_STATUS_CONFLICT
+        elif status == new_status:
+            results[task_id] = BULK_STATUS_UNCHANGED
+        else:
+            results[task_id] = BULK_STATUS_UPDATED
+            to_update.append(task_id)
+            if status == TaskStatus.COMPLETED:
+                reopened.append(task_id)
+
+    propagated = 0
+    if to_update:
+        with track_task_counters(db, to_update):
+            db.execute(
+                update(TaskDB).where(TaskDB.id.in_(to_update))
+                .values(status=new_status, updated_at=datetime.datetime.utcnow(), version=TaskDB.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+        invalidate_tasks(db, to_update)
+        propagated = propagate_task_status(
+            db, to_update if new_status == TaskStatus.COMPLETED else reopened, new_status
+        )
+        db.commit()
+
+    return {
+        "results": [{"id": task_id, "result": result} for task_id, result in results.items()],
+        "updated": len(to_update),
+        "propagated": propagated
+    }
+
+
+@track_sql
 def update_task_status_with_cascade(
         db: Session,
         task_id: int,
         new_status: TaskStatus,
-        current_user_id: int
+        current_user_id: int,
+        return_minimal: bool = False
 ) -> Optional[dict]:
-    """Обновить статус задачи с каскадным обновлением родительской задачи"""
-    # Обновляем статус текущей задачи
-    updated_task = update_task_status(db, task_id, new_status, current_user_id)
-
-    if not updated_task:
+    """Обновить статус задачи и её предков одной транзакцией (см. propagate_task_status)"""
+    changed = _set_task_status(db, task_id, new_status, current_user_id)
+    if not changed:
         return None
-    if new_status == TaskStatus.COMPLETED:
-        full_task = get_task(db, task_id)
+    db_task, previous_status = changed
 
-        if full_task and hasattr(full_task, 'parent_id') and full_task.parent_id:
-            if are_all_children_completed(db, full_task.parent_id):
-                parent_updated = update_task_status(
-                    db,
-                    task_id=full_task.parent_id,
-                    new_status=TaskStatus.COMPLETED,
-                    current_user_id=current_user_id
-                )
+    if new_status == TaskStatus.COMPLETED or previous_status == TaskStatus.COMPLETED:
+        updated = propagate_task_status(db, [task_id], new_status)
+        if updated:
+            logger.debug(f"Status {new_status.value} of task {task_id} propagated to {updated} ancestors")
 
-                if not parent_updated:
-                    logger.warning(
-                        f"Parent task {full_task.parent_id} could not be auto-updated "
-                        f"by user {current_user_id}"
-                    )
-
-    return updated_task
+    return _commit_task_write(db, db_task, return_minimal)
 
 # def delete_task(db: Session, task_id: int) -> bool:
 #     """Удалить задачу"""
@@ -264,78 +1002,169 @@ def update_task_status_with_cascade(
 #     return True
 
 
+@track_sql
 def delete_task(db: Session, task_id: int) -> bool:
     """Удалить задачу"""
     exists = db.query(TaskDB.id).filter(TaskDB.id == task_id).first()
     if not exists:
         return False
-    db.query(TaskAssignmentDB).filter(TaskAssignmentDB.task_id == task_id).delete(
-        synchronize_session=False
-    )
-    db.query(TaskHierarchyDB).filter(
-        (TaskHierarchyDB.parent_id == task_id) | (TaskHierarchyDB.child_id == task_id)
-    ).delete(synchronize_session=False)
-    db.query(TaskDB).filter(TaskDB.id == task_id).delete(synchronize_session=False)
+    with track_task_counters(db, [task_id]):
+        db.query(TaskAssignmentDB).filter(TaskAssignmentDB.task_id == task_id).delete(
+            synchronize_session=False
+        )
+        # Пути через задачу вычитаются до удаления её связей, пока они ещё видны в closure
+        detach_task_from_closure(db, task_id)
+        forget_task(db, task_id)
+        db.query(TaskHierarchyDB).filter(
+            (TaskHierarchyDB.parent_id == task_id) | (TaskHierarchyDB.child_id == task_id)
+        ).delete(synchronize_session=False)
+        db.query(TaskDB).filter(TaskDB.id == task_id).delete(synchronize_session=False)
+    # Иерархии соседей помечены тегом этой задачи, их тоже сбросит
+    invalidate_tasks(db, [task_id])
     db.commit()
     return True
 
 
+def _insert_assignments(db: Session, task_id: int, user_ids: List[int]) -> None:
+    """Вставить назначения одним запросом; уже существующие пропускаются (ON CONFLICT DO NOTHING)"""
+    table = TaskAssignmentDB.__table__
+    rows = [{"task_id": task_id, "user_id": user_id, "assigned_at": datetime.datetime.utcnow()} for user_id in user_ids]
+    dialect = db.connection().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        db.execute(insert(table).values(rows).on_conflict_do_nothing(index_elements=[table.c.task_id, table.c.user_id]))
+        return
+    db.execute(table.insert(), rows)
+
+
+@track_sql
+def apply_task_assignments(
+        db: Session,
+        task_id: int,
+        user_ids: List[int],
+        mode: AssignmentMode = AssignmentMode.REPLACE,
+        skip_missing: bool = False
+) -> Optional[dict]:
+    """Изменить назначения задачи по разнице с текущими; None, если задачи нет.
+
+    Трогаются только строки, которые действительно меняются, поэтому assigned_at
+    у оставшихся исполнителей сохраняется. Пользователи проверяются одним IN-запросом;
+    если кого-то нет, ничего не меняется и они возвращаются в missing (со skip_missing
+    они просто пропускаются). Результат: {"added": [...], "removed": [...], "missing": [...]}.
+    """
+    result = _apply_task_assignments(db, task_id, user_ids, mode, skip_missing)
+    if result and (result["added"] or result["removed"]):
+        db.commit()
+    return result
+
+
+def _apply_task_assignments(
+        db: Session, task_id: int, user_ids: List[int], mode: AssignmentMode, skip_missing: bool,
+        touch_task: bool = True
+) -> Optional[dict]:
+    """apply_task_assignments без commit — для записи в составе большей транзакции.
+
+    touch_task=False — если вызывающий сам меняет строку задачи (и её version) через ORM.
+    """
+    # Блокировка строки задачи сериализует параллельные изменения её назначений
+    if db.query(TaskDB.id).filter(TaskDB.id == task_id).with_for_update().first() is None:
+        return None
+    requested = list(dict.fromkeys(user_ids))
+    existing = {
+        user_id for user_id, in db.query(TaskAssignmentDB.user_id).filter(TaskAssignmentDB.task_id == task_id)
+    }
+
+    missing = []
+    if mode != AssignmentMode.REMOVE and requested:
+        known = {user_id for user_id, user in user_loader(db).get_many(db, requested).items() if user}
+        missing = [user_id for user_id in requested if user_id not in known]
+        if missing and not skip_missing:
+            return {"added": [], "removed": [], "missing": missing}
+        requested = [user_id for user_id in requested if user_id in known]
+
+    if mode == AssignmentMode.REMOVE:
+        to_add, to_remove = [], [user_id for user_id in requested if user_id in existing]
+    else:
+        to_add = [user_id for user_id in requested if user_id not in existing]
+        to_remove = sorted(existing - set(requested)) if mode == AssignmentMode.REPLACE else []
+
+    if to_add or to_remove:
+        with track_task_counters(db, [task_id]):
+            if to_remove:
+                db.query(TaskAssignmentDB).filter(
+                    TaskAssignmentDB.task_id == task_id,
+                    TaskAssignmentDB.user_id.in_(to_remove)
+                ).delete(synchronize_session=False)
+            if to_add:
+                _insert_assignments(db, task_id, to_add)
+        if touch_task:
+            touch_tasks(db, [task_id], updated_at=datetime.datetime.utcnow())
+        invalidate_tasks(db, [task_id])
+    return {"added": to_add, "removed": to_remove, "missing": missing}
+
+
+@track_sql
 def assign_users_to_task(db: Session, task_id: int, user_ids: List[int]) -> bool:
-    """Назначить пользователей на задачу"""
+    """Назначить пользователей на задачу (заменить список; несуществующие пропускаются)"""
     if not user_ids:
         return True
-    db.query(TaskAssignmentDB).filter(TaskAssignmentDB.task_id == task_id).delete()
-    for user_id in user_ids:
-        user = db.query(UserDB).filter(UserDB.id == user_id).first()
-        if user:
-            assignment = TaskAssignmentDB(task_id=task_id, user_id=user_id)
-            db.add(assignment)
-
-    db.commit()
+    apply_task_assignments(db, task_id, user_ids, AssignmentMode.REPLACE, skip_missing=True)
     return True
 
 
+@track_sql
 def get_user_tasks(db: Session, user_id: int) -> List[TaskDB]:
     """Получить все задачи пользователя (созданные и назначенные)"""
     return get_tasks(db, user_id=user_id, limit=1000)
 
 
+@track_sql
 def get_task_stats(db: Session, user_id: Optional[int] = None) -> dict:
-    """Получить статистику по задачам"""
-    query = db.query(TaskDB.status, func.count(TaskDB.id))
+    """Получить статистику по задачам.
 
-    if user_id:
-        query = query.join(TaskDB.assignments).filter(
-            or_(
-                TaskDB.creator_id == user_id,
-                TaskAssignmentDB.user_id == user_id
-            )
-        )
-
-    stats = query.group_by(TaskDB.status).all()
+    Числа по статусам читаются из task_counters по первичному ключу; с user_id —
+    задачи, где пользователь создатель или исполнитель. overdue зависит от текущего
+    времени, поэтому считается запросом по частичному индексу ix_tasks_active_due_date.
+    """
+    counters = db.query(TaskCounterDB.status, TaskCounterDB.count).filter(
+        TaskCounterDB.scope == (SCOPE_USER if user_id else SCOPE_ALL),
+        TaskCounterDB.user_id == (user_id or 0)
+    ).all()
 
     result = {
         'total': 0,
         'open': 0,
         'in_progress': 0,
         'review': 0,
-        'completed': 0
+        'completed': 0,
+        'overdue': 0
     }
 
-    for status, count in stats:
+    for status, count in counters:
         result[status.value] = count
         result['total'] += count
 
+    overdue = db.query(func.count(TaskDB.id)).filter(
+        TaskDB.due_date < datetime.datetime.utcnow(),
+        ACTIVE_TASK_CONDITION,
+        *_task_filters(db, user_id=user_id)
+    )
+    result['overdue'] = overdue.scalar()
+
     return result
 
 
+@track_sql
+def get_task_creator_ids(db: Session, task_ids: Sequence[int]) -> Dict[int, int]:
+    """id задачи → id создателя для существующих из task_ids (один запрос, без связей)"""
+    return dict(db.query(TaskDB.id, TaskDB.creator_id).filter(TaskDB.id.in_(set(task_ids))).all())
+
+
+@track_sql
 def create_task_hierarchy(db: Session, parent_id: int, child_id: int) -> Optional[dict]:
     """Создать связь родитель-потомок между задачами"""
-    # Проверяем что задачи существуют
-    parent = get_task(db, parent_id)
-    child = get_task(db, child_id)
-
-    if not parent or not child:
+    # Существование обеих задач — один запрос по первичному ключу
+    if len(get_task_creator_ids(db, [parent_id, child_id])) < len({parent_id, child_id}):
         return None
     existing_hierarchy = db.query(TaskHierarchyDB).filter(
         TaskHierarchyDB.parent_id == parent_id,
@@ -348,9 +1177,13 @@ def create_task_hierarchy(db: Session, parent_id: int, child_id: int) -> Optiona
             "child_id": existing_hierarchy.child_id,
             "created_at": existing_hierarchy.created_at
         }
+    # Окончательная проверка на цикл — по task_closure в транзакции записи
+    if creates_cycle(db.connection(), parent_id, child_id):
+        return None
 
     hierarchy = TaskHierarchyDB(parent_id=parent_id, child_id=child_id)
     db.add(hierarchy)
+    invalidate_tasks(db, [parent_id, child_id])
     db.commit()
     db.refresh(hierarchy)
 
@@ -361,11 +1194,181 @@ def create_task_hierarchy(db: Session, parent_id: int, child_id: int) -> Optiona
     }
 
 
+@track_sql
+def get_ancestor_ids(db: Session, task_id: int) -> List[int]:
+    """ID всех предков задачи, от ближайших к дальним (один запрос по task_closure)"""
+    depth = func.min(TaskClosureDB.depth)
+    rows = db.query(TaskClosureDB.ancestor_id).filter(
+        TaskClosureDB.descendant_id == task_id
+    ).group_by(TaskClosureDB.ancestor_id).order_by(depth, TaskClosureDB.ancestor_id).all()
+    return [ancestor_id for ancestor_id, in rows]
+
+
+@track_sql
+def get_descendant_ids(db: Session, task_id: int) -> List[int]:
+    """ID всех потомков задачи, от ближайших к дальним (один запрос по task_closure)"""
+    depth = func.min(TaskClosureDB.depth)
+    rows = db.query(TaskClosureDB.descendant_id).filter(
+        TaskClosureDB.ancestor_id == task_id
+    ).group_by(TaskClosureDB.descendant_id).order_by(depth, TaskClosureDB.descendant_id).all()
+    return [descendant_id for descendant_id, in rows]
+
+
+@track_sql
+def would_create_cycle(db: Session, parent_id: int, child_id: int) -> bool:
+    """Создаст ли связь parent→child цикл в иерархии.
+
+    Снимок в памяти (если включён) только отказывает быстрее: связь, которой он
+    ещё не видит, могла появиться в другом процессе, поэтому «цикла нет»
+    подтверждается по task_closure.
+    """
+    graph = get_task_graph(db)
+    if graph is not None and graph.creates_cycle(parent_id, child_id):
+        return True
+    return creates_cycle(db.connection(), parent_id, child_id)
+
+
+# Поля задачи, которые можно запросить в дереве (id, depth и child_count есть всегда)
+TASK_TREE_FIELDS = ("title", "description", "status", "due_date", "creator_id", "created_at", "updated_at")
+
+
+def _task_tree_query(
+        task_id: int,
+        direction: TaskTreeDirection,
+        max_depth: int,
+        children_limit: Optional[int],
+        children_offset: int,
+        fields: Tuple[str, ...]
+):
+    """Рекурсивный CTE по task_hierarchy: строка на каждое ребро дерева плюс корень.
+
+    Дети каждого узла нумеруются оконной функцией заранее, в нерекурсивном CTE —
+    SQLite не допускает окна в рекурсивной части. Нумеруются только связи узлов,
+    которые по task_closure лежат ближе max_depth к корню, а не вся таблица.
+    children_offset сдвигает окно только у детей корня: следующую страницу детей
+    любого узла можно получить запросом /tree от этого узла.
+    """
+    hierarchy = TaskHierarchyDB.__table__
+    if direction == TaskTreeDirection.DESCENDANTS:
+        source, target = hierarchy.c.parent_id, hierarchy.c.child_id
+        near = select(TaskClosureDB.descendant_id).where(
+            TaskClosureDB.ancestor_id == task_id, TaskClosureDB.depth < max_depth
+        )
+    else:
+        source, target = hierarchy.c.child_id, hierarchy.c.parent_id
+        near = select(TaskClosureDB.ancestor_id).where(
+            TaskClosureDB.descendant_id == task_id, TaskClosureDB.depth < max_depth
+        )
+
+    edges = select(
+        source.label("source_id"),
+        target.label("target_id"),
+        func.row_number().over(partition_by=source, order_by=target).label("position")
+    ).where(or_(source == task_id, source.in_(near))).cte("tree_edges")
+
+    root_window = and_(edges.c.source_id == task_id, edges.c.position > children_offset)
+    other_window = edges.c.source_id != task_id
+    if children_limit is not None:
+        root_window = and_(root_window, edges.c.position <= children_offset + children_limit)
+        other_window = and_(other_window, edges.c.position <= children_limit)
+    window = or_(root_window, other_window)
+
+    tree = select(
+        TaskDB.id.label("task_id"), cast(null(), Integer).label("parent_id"), literal(0).label("depth")
+    ).where(TaskDB.id == task_id).cte("task_tree", recursive=True)
+    # UNION, а не UNION ALL: в DAG к узлу ведёт несколько путей, одинаковые строки схлопываются
+    tree = tree.union(
+        select(edges.c.target_id, edges.c.source_id, tree.c.depth + 1)
+        .join(edges, edges.c.source_id == tree.c.task_id)
+        .where(tree.c.depth < max_depth, window)
+    )
+
+    child_count = select(func.count()).select_from(hierarchy).where(
+        source == tree.c.task_id
+    ).scalar_subquery()
+    return select(
+        tree.c.task_id,
+        tree.c.parent_id,
+        tree.c.depth,
+        child_count.label("child_count"),
+        *(getattr(TaskDB, name) for name in fields)
+    ).join(TaskDB, TaskDB.id == tree.c.task_id).order_by(tree.c.depth, tree.c.parent_id, tree.c.task_id)
+
+
+@track_sql
+def get_task_tree(
+        db: Session,
+        task_id: int,
+        direction: TaskTreeDirection = TaskTreeDirection.DESCENDANTS,
+        max_depth: int = 10,
+        children_limit: Optional[int] = None,
+        children_offset: int = 0,
+        fields: Optional[List[str]] = None,
+        tree_format: TaskTreeFormat = TaskTreeFormat.NESTED
+) -> Optional[dict]:
+    """Поддерево (или предки) задачи одним запросом; None, если задачи нет.
+
+    nested: {"root": узел с вложенными "children"/"parents"}; flat: {"nodes": [...],
+    "edges": [{"parent_id", "child_id"}]}. В узле — id, depth (кратчайшее расстояние
+    от корня), child_count (сколько всего соседей в эту сторону, без учёта пагинации)
+    и запрошенные поля.
+    """
+    fields = tuple(name for name in TASK_TREE_FIELDS if fields is None or name in fields)
+    rows = db.execute(_task_tree_query(
+        task_id, direction, max_depth, children_limit, children_offset, fields
+    )).all()
+    if not rows:
+        return None
+
+    nodes: Dict[int, dict] = {}
+    adjacency: Dict[int, List[int]] = {}
+    for row in rows:
+        if row.task_id not in nodes:
+            node = {"id": row.task_id, "depth": row.depth, "child_count": row.child_count}
+            for name in fields:
+                value = getattr(row, name)
+                node[name] = value.value if name == "status" else value
+            nodes[row.task_id] = node
+        if row.parent_id is not None:
+            targets = adjacency.setdefault(row.parent_id, [])
+            if row.task_id not in targets:
+                targets.append(row.task_id)
+
+    for targets in adjacency.values():
+        targets.sort()
+
+    if tree_format == TaskTreeFormat.FLAT:
+        if direction == TaskTreeDirection.DESCENDANTS:
+            pairs = [(source, target) for source, targets in adjacency.items() for target in targets]
+        else:
+            pairs = [(target, source) for source, targets in adjacency.items() for target in targets]
+        return {
+            "root_id": task_id,
+            "direction": direction.value,
+            "nodes": sorted(nodes.values(), key=lambda node: (node["depth"], node["id"])),
+            "edges": [{"parent_id": parent_id, "child_id": child_id} for parent_id, child_id in sorted(pairs)]
+        }
+
+    key = "children" if direction == TaskTreeDirection.DESCENDANTS else "parents"
+
+    def build(node_id: int, depth: int) -> dict:
+        node = dict(nodes[node_id])
+        node[key] = [build(target, depth + 1) for target in adjacency.get(node_id, ())] if depth < max_depth else []
+        return node
+
+    return {"root_id": task_id, "direction": direction.value, "root": build(task_id, 0)}
+
+
+@track_sql
 def get_task_hierarchy(db: Session, task_id: int) -> dict:
-    """Получить иерархию задачи"""
+    """Получить иерархию задачи (через общий кэш, с тегами всех задач и пользователей ответа)"""
+    return cached_payload(db, "hierarchy", hierarchy_key(task_id), lambda: _build_task_hierarchy(db, task_id)) or {}
+
+
+def _build_task_hierarchy(db: Session, task_id: int) -> Optional[Tuple[dict, List[str]]]:
     task = get_task(db, task_id)
     if not task:
-        return {}
+        return None
 
     # Уникальные родители (используем set для удаления дубликатов)
     parent_relations = list(set(task.parent_relations))
@@ -376,8 +1379,10 @@ def get_task_hierarchy(db: Session, task_id: int) -> dict:
     parents = [task_to_dict(rel.parent_task) for rel in parent_relations if rel.parent_task]
     children = [task_to_dict(rel.child_task) for rel in child_relations if rel.child_task]
 
-    return {
+    hierarchy = {
         'task': task_to_dict(task),
         'parents': parents,
         'children': children
     }
+    tags = {tag for item in [hierarchy['task'], *parents, *children] for tag in payload_tags(item)}
+    return hierarchy, sorted(tags)
@@ -0,0 +1,268 @@
+"""Асинхронные варианты CRUD-операций над задачами.
+
+Логика запросов живёт в crud/task.py; здесь она выполняется через
+AsyncSession.run_sync, поэтому с драйвером asyncpg ожидание БД не блокирует
+поток, а запросы не дублируются в двух местах.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from models.task import TaskDB, TaskStatus
+from schemas.task import TaskCreate, TaskUpdate, TaskTreeDirection, TaskTreeFormat, BulkTaskItem, AssignmentMode
+import crud.task as task_crud
+from crud.task import (
+    task_to_dict, task_cursor, decode_task_cursor, TaskProjection, TaskValidators, TaskListValidators, TASK_FIELDS
+)
+
+
+async def get_task(db: AsyncSession, task_id: int) -> Optional[TaskDB]:
+    """Получить задачу по ID со всеми связями"""
+    return await db.run_sync(task_crud.get_task, task_id)
+
+
+async def get_task_payload(db: AsyncSession, task_id: int) -> Optional[Tuple[dict, TaskValidators]]:
+    """Словарь задачи для ответа и его валидаторы (через общий кэш)"""
+    return await db.run_sync(task_crud.get_task_payload, task_id)
+
+
+async def get_tasks(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None,
+        include_assignments: bool = True,
+        after: Optional[Tuple[datetime.datetime, int]] = None
+) -> List[TaskDB]:
+    """Получить список задач с фильтрацией"""
+    return await db.run_sync(
+        task_crud.get_tasks,
+        skip=skip,
+        limit=limit,
+        user_id=user_id,
+        status=status,
+        search=search,
+        include_assignments=include_assignments,
+        after=after
+    )
+
+
+async def get_tasks_count(
+        db: AsyncSession,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None
+) -> int:
+    """Получить общее количество задач для пагинации"""
+    return await db.run_sync(task_crud.get_tasks_count, user_id=user_id, status=status, search=search)
+
+
+async def search_tasks(
+        db: AsyncSession,
+        search: str,
+        skip: int = 0,
+        limit: int = 20,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None
+) -> Tuple[List[Tuple[TaskDB, float, str]], bool]:
+    """Поиск задач по релевантности с подсвеченными фрагментами"""
+    return await db.run_sync(
+        task_crud.search_tasks,
+        search,
+        skip=skip,
+        limit=limit,
+        user_id=user_id,
+        status=status
+    )
+
+
+async def get_tasks_with_total(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None
+) -> Tuple[List[TaskDB], int]:
+    """Страница задач и общее число совпадений одним запросом"""
+    return await db.run_sync(
+        task_crud.get_tasks_with_total,
+        skip=skip,
+        limit=limit,
+        user_id=user_id,
+        status=status,
+        search=search
+    )
+
+
+async def estimate_tasks_count(
+        db: AsyncSession,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None
+) -> Tuple[int, bool]:
+    """Примерное число задач по статистике планировщика"""
+    return await db.run_sync(task_crud.estimate_tasks_count, user_id=user_id, status=status, search=search)
+
+
+async def get_task_projections(
+        db: AsyncSession,
+        fields: Sequence[str] = TASK_FIELDS,
+        expand: Sequence[str] = (),
+        skip: int = 0,
+        limit: int = 100,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None,
+        after: Optional[Tuple[datetime.datetime, int]] = None,
+        with_total: bool = False
+) -> Tuple[List[TaskProjection], Optional[int]]:
+    """Страница задач только с запрошенными полями и связями"""
+    return await db.run_sync(
+        task_crud.get_task_projections,
+        fields=fields,
+        expand=expand,
+        skip=skip,
+        limit=limit,
+        user_id=user_id,
+        status=status,
+        search=search,
+        after=after,
+        with_total=with_total
+    )
+
+
+async def get_task_projection(
+        db: AsyncSession, task_id: int, fields: Sequence[str] = TASK_FIELDS
+) -> Optional[TaskProjection]:
+    """Запрошенные поля одной задачи без связей"""
+    return await db.run_sync(task_crud.get_task_projection, task_id, fields)
+
+
+async def get_task_version(db: AsyncSession, task_id: int) -> Optional[TaskValidators]:
+    """Валидаторы задачи для проверки условного запроса"""
+    return await db.run_sync(task_crud.get_task_version, task_id)
+
+
+async def get_task_list_validators(db: AsyncSession) -> Optional[TaskListValidators]:
+    """Валидаторы списков задач для проверки условного запроса до чтения страницы"""
+    return await db.run_sync(task_crud.get_task_list_validators)
+
+
+async def create_task(db: AsyncSession, task: TaskCreate, return_minimal: bool = False) -> Optional[dict]:
+    """Создать новую задачу"""
+    return await db.run_sync(task_crud.create_task, task, return_minimal)
+
+
+async def create_subtask(db: AsyncSession, parent_id: int, subtask: TaskCreate,
+                         return_minimal: bool = False) -> Optional[dict]:
+    """Создать подзадачу с назначениями родителя"""
+    return await db.run_sync(task_crud.create_subtask, parent_id, subtask, return_minimal)
+
+
+async def create_tasks_bulk(db: AsyncSession, items: List[BulkTaskItem]) -> List[dict]:
+    """Создать пачку задач одной транзакцией"""
+    return await db.run_sync(task_crud.create_tasks_bulk, items)
+
+
+async def update_task(db: AsyncSession, task_id: int, task_update: TaskUpdate, current_user_id: int,
+                      return_minimal: bool = False) -> Optional[dict]:
+    """Обновить задачу с проверкой прав"""
+    return await db.run_sync(task_crud.update_task, task_id, task_update, current_user_id, return_minimal)
+
+
+async def update_task_status(db: AsyncSession, task_id: int, new_status: TaskStatus,
+                             current_user_id: int, return_minimal: bool = False) -> Optional[dict]:
+    """Обновить статус задачи (могут создатель или назначенные)"""
+    return await db.run_sync(task_crud.update_task_status, task_id, new_status, current_user_id, return_minimal)
+
+
+async def update_task_status_with_cascade(db: AsyncSession, task_id: int, new_status: TaskStatus,
+                                         current_user_id: int, return_minimal: bool = False) -> Optional[dict]:
+    """Обновить статус задачи и протянуть его вверх по предкам"""
+    return await db.run_sync(
+        task_crud.update_task_status_with_cascade, task_id, new_status, current_user_id, return_minimal
+    )
+
+
+async def bulk_update_task_status(db: AsyncSession, task_ids: List[int], new_status: TaskStatus,
+                                  current_user_id: int, expected_status: Optional[TaskStatus] = None) -> dict:
+    """Перевести пачку задач в новый статус"""
+    return await db.run_sync(
+        task_crud.bulk_update_task_status, task_ids, new_status, current_user_id, expected_status
+    )
+
+
+async def are_all_children_completed(db: AsyncSession, parent_id: int) -> bool:
+    """Проверить, все ли дочерние задачи родителя выполнены"""
+    return await db.run_sync(task_crud.are_all_children_completed, parent_id)
+
+
+async def delete_task(db: AsyncSession, task_id: int) -> bool:
+    """Удалить задачу"""
+    return await db.run_sync(task_crud.delete_task, task_id)
+
+
+async def assign_users_to_task(db: AsyncSession, task_id: int, user_ids: List[int]) -> bool:
+    """Назначить пользователей на задачу"""
+    return await db.run_sync(task_crud.assign_users_to_task, task_id, user_ids)
+
+
+async def apply_task_assignments(db: AsyncSession, task_id: int, user_ids: List[int],
+                                 mode: AssignmentMode = AssignmentMode.REPLACE) -> Optional[dict]:
+    """Изменить назначения задачи по разнице с текущими"""
+    return await db.run_sync(task_crud.apply_task_assignments, task_id, user_ids, mode)
+
+
+async def get_task_stats(db: AsyncSession, user_id: Optional[int] = None) -> dict:
+    """Получить статистику по задачам"""
+    return await db.run_sync(task_crud.get_task_stats, user_id)
+
+
+async def get_task_creator_ids(db: AsyncSession, task_ids: Sequence[int]) -> Dict[int, int]:
+    """id задачи → id создателя для существующих задач"""
+    return await db.run_sync(task_crud.get_task_creator_ids, task_ids)
+
+
+async def create_task_hierarchy(db: AsyncSession, parent_id: int, child_id: int) -> Optional[dict]:
+    """Создать связь родитель-потомок между задачами"""
+    return await db.run_sync(task_crud.create_task_hierarchy, parent_id, child_id)
+
+
+async def get_task_hierarchy(db: AsyncSession, task_id: int) -> dict:
+    """Получить иерархию задачи"""
+    return await db.run_sync(task_crud.get_task_hierarchy, task_id)
+
+
+async def get_ancestor_ids(db: AsyncSession, task_id: int) -> List[int]:
+    """ID всех предков задачи, от ближайших к дальним"""
+    return await db.run_sync(task_crud.get_ancestor_ids, task_id)
+
+
+async def get_descendant_ids(db: AsyncSession, task_id: int) -> List[int]:
+    """ID всех потомков задачи, от ближайших к дальним"""
+    return await db.run_sync(task_crud.get_descendant_ids, task_id)
+
+
+async def would_create_cycle(db: AsyncSession, parent_id: int, child_id: int) -> bool:
+    """Создаст ли связь parent→child цикл в иерархии"""
+    return await db.run_sync(task_crud.would_create_cycle, parent_id, child_id)
+
+
+async def get_task_tree(
+        db: AsyncSession,
+        task_id: int,
+        direction: TaskTreeDirection = TaskTreeDirection.DESCENDANTS,
+        max_depth: int = 10,
+        children_limit: Optional[int] = None,
+        children_offset: int = 0,
+        fields: Optional[List[str]] = None,
+        tree_format: TaskTreeFormat = TaskTreeFormat.NESTED
+) -> Optional[dict]:
+    """Поддерево (или предки) задачи одним запросом"""
+    return await db.run_sync(
+        task_crud.get_task_tree, task_id, direction, max_depth,
+        children_limit, children_offset, fields, tree_format
+    )
@@ -0,0 +1,138 @@
+"""Ответы по задачам в общем кэше (cache/): payload задачи и её иерархия.
+
+Записи помечены тегами task:{id} каждой задачи в ответе и user:{id} каждого
+вложенного пользователя. Записи в БД не сбрасывают кэш сразу, а копят теги
+в сессии: invalidate_tasks()/invalidate_users() вызываются рядом с изменением,
+теги сбрасываются в конце транзакции, когда новые данные уже видны другим
+(после отката тоже — лишний сброс безопасен).
+
+Заполняют кэш только чтения с primary. Реплика может отставать: прочитанная
+с неё после сброса старая строка вернулась бы в кэш, и автор записи, закреплённый
+за primary (database.mark_primary_sticky), получил бы её из кэша раньше любой
+маршрутизации — read-your-writes сломался бы до CACHE_TTL_SECONDS. Сессии
+с db.info["read_only"] кэш читают, но промахи в него не пишут.
+
+Под AsyncSession crud выполняется в greenlet run_sync на потоке event loop.
+Обращения к кэшу оттуда идут через await_only к асинхронным методам бэкенда
+(aget/aset/ainvalidate_tags): сетевой бэкенд ждёт ответа, не блокируя loop, —
+так же, как SQLAlchemy ждёт asyncpg.
+
+Читатель primary, который успел прочитать старую строку до commit и записал её
+в кэш после сброса, оставит её до CACHE_TTL_SECONDS; отсюда короткий TTL.
+"""
+import datetime
+import json
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+from cache import CACHE_TTL_SECONDS, CacheBackend, get_cache
+from monitoring.metrics import REGISTRY
+
+# Увеличивается при смене формата payload: реплики со старым кодом не читают новые записи
+PAYLOAD_VERSION = 2
+
+TASK_CACHE_REQUESTS = REGISTRY.counter(
+    "task_cache_requests_total", "Shared cache lookups for task responses", ("kind", "result")
+)
+
+_DATETIME_KEYS = {"created_at", "updated_at", "due_date", "assigned_at", "users_updated_at"}
+_PENDING_KEY = "task_cache_pending_tags"
+
+
+def task_tag(task_id: int) -> str:
+    return f"task:{task_id}"
+
+
+def user_tag(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def task_key(task_id: int) -> str:
+    return f"task:v{PAYLOAD_VERSION}:{task_id}"
+
+
+def hierarchy_key(task_id: int) -> str:
+    return f"task_hierarchy:v{PAYLOAD_VERSION}:{task_id}"
+
+
+def payload_tags(task: dict) -> List[str]:
+    """Теги словаря task_to_dict: сама задача, создатель и исполнители"""
+    return [task_tag(task["id"]), user_tag(task["creator_id"]), *map(user_tag, task["assigned_user_ids"])]
+
+
+def _default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot cache {type(value).__name__}")
+
+
+def _restore_datetimes(obj: dict) -> dict:
+    for key in _DATETIME_KEYS.intersection(obj):
+        if isinstance(obj[key], str):
+            obj[key] = datetime.datetime.fromisoformat(obj[key])
+    return obj
+
+
+def _cache_get(cache: CacheBackend, key: str) -> Optional[bytes]:
+    return await_only(cache.aget(key)) if in_greenlet() else cache.get(key)
+
+
+def _cache_set(cache: CacheBackend, key: str, value: bytes, tags: Iterable[str]) -> None:
+    if in_greenlet():
+        await_only(cache.aset(key, value, CACHE_TTL_SECONDS, tags))
+    else:
+        cache.set(key, value, CACHE_TTL_SECONDS, tags)
+
+
+def _cache_invalidate(cache: CacheBackend, tags: Iterable[str]) -> None:
+    if in_greenlet():
+        await_only(cache.ainvalidate_tags(*tags))
+    else:
+        cache.invalidate_tags(*tags)
+
+
+def cached_payload(
+        db: Session, kind: str, key: str, build: Callable[[], Optional[Tuple[dict, Iterable[str]]]]
+) -> Optional[dict]:
+    """Payload из кэша или build() → (payload, теги); None от build и чтения с реплики не кэшируются"""
+    cache = get_cache()
+    if cache is not None:
+        raw = _cache_get(cache, key)
+        if raw is not None:
+            TASK_CACHE_REQUESTS.inc(kind=kind, result="hit")
+            return json.loads(raw, object_hook=_restore_datetimes)
+        TASK_CACHE_REQUESTS.inc(kind=kind, result="miss")
+    built = build()
+    if built is None:
+        return None
+    payload, tags = built
+    if cache is not None and not db.info.get("read_only"):
+        _cache_set(cache, key, json.dumps(payload, default=_default).encode(), tags)
+    return payload
+
+
+def _pending(db: Session) -> set:
+    return db.info.setdefault(_PENDING_KEY, set())
+
+
+def invalidate_tasks(db: Session, task_ids: Iterable[int]) -> None:
+    """Сбросить ответы с этими задачами в конце текущей транзакции"""
+    _pending(db).update(task_tag(task_id) for task_id in task_ids if task_id is not None)
+
+
+def invalidate_users(db: Session, user_ids: Iterable[int]) -> None:
+    """Сбросить ответы, где эти пользователи — создатели или исполнители, в конце транзакции"""
+    _pending(db).update(user_tag(user_id) for user_id in user_ids if user_id is not None)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _invalidate_pending_tags(session: Session, transaction) -> None:
+    if transaction.parent is not None:
+        return
+    tags = session.info.pop(_PENDING_KEY, None)
+    cache = get_cache()
+    if tags and cache is not None:
+        _cache_invalidate(cache, tags)
@@ -0,0 +1,377 @@
+"""Снимок иерархии задач в памяти процесса.
+
+task_hierarchy хранится в формате CSR: отсортированный массив id задач, для
+каждой — смещение в массиве соседей. Дети и родители лежат в двух таких
+структурах, всё в array('i'), без объекта на ребро. Проверка на цикл, предки,
+потомки, размер поддерева и глубина считаются обходом массивов без обращений к БД.
+
+Снимок необязателен (TASK_GRAPH_ENABLED) и обновляется так:
+
+* связи, закоммиченные этим процессом через ORM, и удаления задач попадают
+  в него после commit (откат ничего не меняет);
+* изменения попадают в небольшой оверлей поверх CSR, который сжимается
+  пересборкой массивов после TASK_GRAPH_COMPACT_THRESHOLD изменений;
+* изменения из других процессов он не видит, поэтому снимок старше
+  TASK_GRAPH_MAX_AGE_SECONDS перечитывается из БД целиком.
+
+Источником истины остаётся task_closure. Снимок может отставать от других
+процессов, поэтому would_create_cycle верит ему только в сторону «цикл есть»
+(быстрый отказ), а разрешает связь лишь после проверки по task_closure.
+"""
+import bisect
+import logging
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from models.task import TaskHierarchyDB
+from monitoring.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+TASK_GRAPH_ENABLED = os.getenv("TASK_GRAPH_ENABLED", "false").lower() == "true"
+TASK_GRAPH_MAX_AGE_SECONDS = float(os.getenv("TASK_GRAPH_MAX_AGE_SECONDS", "60"))
+TASK_GRAPH_COMPACT_THRESHOLD = int(os.getenv("TASK_GRAPH_COMPACT_THRESHOLD", "1024"))
+
+_PENDING_KEY = "task_graph_pending"
+_FLUSH_KEY = "task_graph_flush"
+
+Edge = Tuple[int, int]
+
+
+class _Csr:
+    """Списки смежности: ids[i] → targets[offsets[i]:offsets[i + 1]]"""
+
+    __slots__ = ("ids", "offsets", "targets")
+
+    def __init__(self, edges: List[Edge]):
+        # edges отсортированы по (source, target)
+        self.ids = array("i")
+        self.offsets = array("i", [0])
+        self.targets = array("i")
+        for source, target in edges:
+            if not self.ids or self.ids[-1] != source:
+                if self.ids:
+                    self.offsets.append(len(self.targets))
+                self.ids.append(source)
+            self.targets.append(target)
+        if self.ids:
+            self.offsets.append(len(self.targets))
+
+    def neighbours(self, task_id: int) -> array:
+        index = bisect.bisect_left(self.ids, task_id)
+        if index == len(self.ids) or self.ids[index] != task_id:
+            return self.targets[0:0]
+        return self.targets[self.offsets[index]:self.offsets[index + 1]]
+
+    def nbytes(self) -> int:
+        return sum(part.itemsize * len(part) for part in (self.ids, self.offsets, self.targets))
+
+
+class TaskGraph:
+    """CSR-снимок task_hierarchy с оверлеем ещё не сжатых изменений"""
+
+    def __init__(self, edges: Iterable[Edge] = (), compact_threshold: int = TASK_GRAPH_COMPACT_THRESHOLD):
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._build(edges)
+
+    def _build(self, edges: Iterable[Edge]) -> None:
+        edges = sorted(set(edges))
+        self._children = _Csr(edges)
+        self._parents = _Csr(sorted((child, parent) for parent, child in edges))
+        self._edge_count = len(edges)
+        self._added: Set[Edge] = set()
+        self._removed: Set[Edge] = set()
+        # Оверлей добавленных рёбер по обоим концам, чтобы не перебирать его целиком
+        self._added_children: Dict[int, Set[int]] = {}
+        self._added_parents: Dict[int, Set[int]] = {}
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def from_session(cls, db: Session) -> "TaskGraph":
+        """Собрать снимок по task_hierarchy одним запросом"""
+        return cls(db.execute(select(TaskHierarchyDB.parent_id, TaskHierarchyDB.child_id)).tuples())
+
+    # --- изменения ---
+
+    def add_edge(self, parent_id: int, child_id: int) -> None:
+        with self._lock:
+            edge = (parent_id, child_id)
+            if edge in self._removed:
+                self._removed.discard(edge)
+            elif edge not in self._added and not self._in_csr(edge):
+                self._added.add(edge)
+                self._added_children.setdefault(parent_id, set()).add(child_id)
+                self._added_parents.setdefault(child_id, set()).add(parent_id)
+            self._maybe_compact()
+
+    def remove_edge(self, parent_id: int, child_id: int) -> None:
+        with self._lock:
+            edge = (parent_id, child_id)
+            if edge in self._added:
+                self._added.discard(edge)
+                self._added_children[parent_id].discard(child_id)
+                self._added_parents[child_id].discard(parent_id)
+            elif self._in_csr(edge):
+                self._removed.add(edge)
+            self._maybe_compact()
+
+    def remove_task(self, task_id: int) -> None:
+        """Убрать все связи задачи (задача удалена)"""
+        with self._lock:
+            for child_id in list(self.children(task_id)):
+                self.remove_edge(task_id, child_id)
+            for parent_id in list(self.parents(task_id)):
+                self.remove_edge(parent_id, task_id)
+
+    def _in_csr(self, edge: Edge) -> bool:
+        return edge[1] in self._children.neighbours(edge[0])
+
+    def _maybe_compact(self) -> None:
+        if len(self._added) + len(self._removed) >= self.compact_threshold:
+            self.compact()
+
+    def compact(self) -> None:
+        """Влить оверлей в массивы CSR"""
+        with self._lock:
+            built_at = self.built_at
+            self._build(self.edges())
+            # Сжатие не делает снимок свежее относительно других процессов
+            self.built_at = built_at
+
+    # --- чтение ---
+
+    def edges(self) -> Iterator[Edge]:
+        for index, parent_id in enumerate(self._children.ids):
+            start, end = self._children.offsets[index], self._children.offsets[index + 1]
+            for child_id in self._children.targets[start:end]:
+                if (parent_id, child_id) not in self._removed:
+                    yield parent_id, child_id
+        yield from self._added
+
+    def children(self, task_id: int) -> List[int]:
+        return self._neighbours(task_id, forward=True)
+
+    def parents(self, task_id: int) -> List[int]:
+        return self._neighbours(task_id, forward=False)
+
+    def _neighbours(self, task_id: int, forward: bool) -> List[int]:
+        csr = self._children if forward else self._parents
+        neighbours = list(csr.neighbours(task_id))
+        if self._removed:
+            pairs = ((task_id, n) for n in neighbours) if forward else ((n, task_id) for n in neighbours)
+            neighbours = [n for n, edge in zip(neighbours, pairs) if edge not in self._removed]
+        added = (self._added_children if forward else self._added_parents).get(task_id)
+        if added:
+            neighbours += sorted(added)
+        return neighbours
+
+    def _walk(self, task_id: int, forward: bool) -> Dict[int, int]:
+        """BFS: задача → кратчайшее расстояние от task_id"""
+        distances: Dict[int, int] = {}
+        queue = deque([(task_id, 0)])
+        while queue:
+            current, distance = queue.popleft()
+            for neighbour in self._neighbours(current, forward):
+                if neighbour not in distances:
+                    distances[neighbour] = distance + 1
+                    queue.append((neighbour, distance + 1))
+        distances.pop(task_id, None)
+        return distances
+
+    def descendants(self, task_id: int) -> List[int]:
+        """Все потомки, от ближайших к дальним (как crud.task.get_descendant_ids)"""
+        with self._lock:
+            distances = self._walk(task_id, forward=True)
+        return sorted(distances, key=lambda node: (distances[node], node))
+
+    def ancestors(self, task_id: int) -> List[int]:
+        """Все предки, от ближайших к дальним (как crud.task.get_ancestor_ids)"""
+        with self._lock:
+            distances = self._walk(task_id, forward=False)
+        return sorted(distances, key=lambda node: (distances[node], node))
+
+    def subtree_size(self, task_id: int) -> int:
+        """Число задач в поддереве, включая саму задачу"""
+        with self._lock:
+            return len(self._walk(task_id, forward=True)) + 1
+
+    def depth(self, task_id: int) -> int:
+        """Длина самой длинной цепочки родителей до корня (0 — у задачи нет родителей)"""
+        with self._lock:
+            depths: Dict[int, int] = {}
+            stack = [task_id]
+            while stack:
+                current = stack[-1]
+                pending = [p for p in self._neighbours(current, forward=False) if p not in depths]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                stack.pop()
+                depths[current] = max((depths[p] + 1 for p in self._neighbours(current, forward=False)), default=0)
+            return depths[task_id]
+
+    def creates_cycle(self, parent_id: int, child_id: int) -> bool:
+        """Замкнёт ли ребро parent→child цикл: parent достижим из child"""
+        if parent_id == child_id:
+            return True
+        with self._lock:
+            seen = {child_id}
+            stack = [child_id]
+            while stack:
+                for neighbour in self._neighbours(stack.pop(), forward=True):
+                    if neighbour == parent_id:
+                        return True
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        stack.append(neighbour)
+        return False
+
+    def memory_usage(self) -> dict:
+        """Сколько памяти занимает снимок: массивы CSR и оверлей"""
+        with self._lock:
+            csr_bytes = self._children.nbytes() + self._parents.nbytes()
+            overlay_bytes = sys.getsizeof(self._added) + sys.getsizeof(self._removed) + sum(
+                sys.getsizeof(edge) for edge in (*self._added, *self._removed)
+            )
+            return {
+                "edges": self._edge_count - len(self._removed) + len(self._added),
+                "csr_bytes": csr_bytes,
+                "overlay_edges": len(self._added) + len(self._removed),
+                "overlay_bytes": overlay_bytes,
+                "total_bytes": csr_bytes + overlay_bytes,
+            }
+
+
+_graph: Optional[TaskGraph] = None
+_graph_lock = threading.Lock()
+
+
+def get_task_graph(db: Session) -> Optional[TaskGraph]:
+    """Снимок процесса; None, если он выключен. Отсутствующий или устаревший перечитывается из БД"""
+    global _graph
+    if not TASK_GRAPH_ENABLED:
+        return None
+    graph = _graph
+    if graph is not None and time.monotonic() - graph.built_at <= TASK_GRAPH_MAX_AGE_SECONDS:
+        return graph
+    # Запрос идёт без блокировки: под run_sync он отдаёт управление event loop,
+    # и ждущий блокировку запрос остановил бы весь loop. Под ней только подмена ссылки
+    fresh = TaskGraph.from_session(db)
+    with _graph_lock:
+        if _graph is None or _graph.built_at < fresh.built_at:
+            _graph = fresh
+            logger.info("Task graph rebuilt: %s", fresh.memory_usage())
+        return _graph
+
+
+def reset_task_graph() -> None:
+    """Сбросить снимок; следующий get_task_graph соберёт его заново"""
+    global _graph
+    with _graph_lock:
+        _graph = None
+
+
+def _pending(session: Session) -> list:
+    """Изменения для снимка: (транзакция или savepoint, вид, id, id)"""
+    return session.info.setdefault(_PENDING_KEY, [])
+
+
+def _current_transaction(session: Session):
+    return session.get_nested_transaction() or session.get_transaction()
+
+
+def forget_task(db: Session, task_id: int) -> None:
+    """Убрать связи удаляемой задачи из снимка после commit (для массовых удалений)"""
+    _pending(db).append((_current_transaction(db), "task", task_id, None))
+
+
+def remember_edges(db: Session, edges: Iterable[Edge]) -> None:
+    """Добавить в снимок связи, вставленные в обход ORM, после commit"""
+    transaction = _current_transaction(db)
+    _pending(db).extend((transaction, "add", parent_id, child_id) for parent_id, child_id in edges)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_hierarchy_edges(session: Session, flush_context, instances) -> None:
+    added = [obj for obj in session.new if isinstance(obj, TaskHierarchyDB)]
+    removed = [obj for obj in session.deleted if isinstance(obj, TaskHierarchyDB)]
+    if added or removed:
+        session.info[_FLUSH_KEY] = (added, removed)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_hierarchy_edges(session: Session, flush_context) -> None:
+    flushed = session.info.pop(_FLUSH_KEY, None)
+    if flushed is None:
+        return
+    added, removed = flushed
+    transaction = _current_transaction(session)
+    pending = _pending(session)
+    pending += [(transaction, "remove", obj.parent_id, obj.child_id) for obj in removed]
+    pending += [(transaction, "add", obj.parent_id, obj.child_id) for obj in added]
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_hierarchy_edges(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    graph = _graph
+    if not pending or graph is None:
+        return
+    for _, change, first_id, second_id in pending:
+        if change == "add":
+            graph.add_edge(first_id, second_id)
+        elif change == "remove":
+            graph.remove_edge(first_id, second_id)
+        else:
+            graph.remove_task(first_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_hierarchy_edges(session: Session, previous_transaction) -> None:
+    """Забыть изменения, сделанные внутри откаченной транзакции или savepoint"""
+    session.info.pop(_FLUSH_KEY, None)
+    pending = session.info.get(_PENDING_KEY)
+    if not pending:
+        return
+
+    def rolled_back(transaction) -> bool:
+        while transaction is not None:
+            if transaction is previous_transaction:
+                return True
+            transaction = transaction.parent
+        return False
+
+    session.info[_PENDING_KEY] = [item for item in pending if not rolled_back(item[0])]
+
+
+def collect_task_graph_metrics() -> List[str]:
+    """Размер снимка в текстовом формате Prometheus (коллектор для /metrics)"""
+    graph = _graph
+    if graph is None:
+        return []
+    usage = graph.memory_usage()
+    lines: List[str] = []
+    for metric, key, help_text in (
+        ("task_graph_edges", "edges", "Hierarchy edges in the in-process task graph"),
+        ("task_graph_bytes", "total_bytes", "Memory held by the in-process task graph"),
+        ("task_graph_overlay_edges", "overlay_edges", "Edge changes not yet compacted into CSR arrays"),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge", f"{metric} {usage[key]}"]
+    lines += [
+        "# HELP task_graph_age_seconds Seconds since the task graph was read from the database",
+        "# TYPE task_graph_age_seconds gauge",
+        f"task_graph_age_seconds {time.monotonic() - graph.built_at:.3f}",
+    ]
+    return lines
+
+
+REGISTRY.register_collector(collect_task_graph_metrics)
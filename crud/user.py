@@ -1,45 +1,95 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List, Optional
+from sqlalchemy import or_, func, select
+from typing import List, Optional, Tuple
 from models.user import UserDB, UserRole
 from schemas.user import UserCreate, UserUpdate
+from monitoring.sql import track_sql
+from crud.pagination import encode_cursor, decode_cursor, estimate_count
+from crud.user_cache import get_user_cache, invalidate_user, attach_user, user_row
+from crud.task_cache import invalidate_users
 
 
+@track_sql
 def get_user(db: Session, user_id: int) -> Optional[UserDB]:
-    return db.query(UserDB).filter(UserDB.id == user_id).first()
+    cache = get_user_cache()
+    row = cache.get(user_id) if cache is not None else None
+    if row is not None:
+        return attach_user(db, row)
+    user = db.query(UserDB).filter(UserDB.id == user_id).first()
+    if user is not None and cache is not None:
+        cache.put(user_row(user))
+    return user
 
 
+@track_sql
 def get_user_by_username(db: Session, username: str) -> Optional[UserDB]:
-    return db.query(UserDB).filter(UserDB.username == username).first()
+    cache = get_user_cache()
+    row = cache.get_by_username(username) if cache is not None else None
+    if row is not None:
+        return attach_user(db, row)
+    user = db.query(UserDB).filter(UserDB.username == username).first()
+    if user is not None and cache is not None:
+        cache.put(user_row(user))
+    return user
+
+
+def _user_filters(role: Optional[UserRole] = None, search: Optional[str] = None) -> list:
+    conditions = []
+    if role:
+        conditions.append(UserDB.role == role)
+    if search:
+        search_filter = f"%{search}%"
+        conditions.append(or_(UserDB.username.ilike(search_filter), UserDB.full_name.ilike(search_filter)))
+    return conditions
 
 
+@track_sql
 def get_users(db: Session, skip: int = 0, limit: int = 100, role: Optional[UserRole] = None,
-              search: Optional[str] = None) -> List[UserDB]:
-    query = db.query(UserDB)
+              search: Optional[str] = None, after: Optional[str] = None) -> List[UserDB]:
+    query = db.query(UserDB).filter(*_user_filters(role, search))
 
-    if role:
-        query = query.filter(UserDB.role == role)
-
-    if search:
-        search_filter = f"%{search}%"
-        query = query.filter(or_(UserDB.username.ilike(search_filter), UserDB.full_name.ilike(search_filter)))
+    # Keyset-пагинация: username уникален, поэтому сам по себе является ключом
+    if after is not None:
+        query = query.filter(UserDB.username > after)
 
     return query.order_by(UserDB.username).offset(skip).limit(limit).all()
 
 
-def get_users_count(db: Session, role: Optional[UserRole] = None, search: Optional[str] = None) -> int:
-    query = db.query(UserDB)
+@track_sql
+def get_users_with_total(db: Session, skip: int = 0, limit: int = 100, role: Optional[UserRole] = None,
+                         search: Optional[str] = None) -> Tuple[List[UserDB], int]:
+    """Страница пользователей и их общее число одним запросом (count(*) OVER ())"""
+    rows = db.query(UserDB, func.count().over().label("total")).filter(*_user_filters(role, search)) \
+        .order_by(UserDB.username).offset(skip).limit(limit).all()
+    if not rows:
+        return [], get_users_count(db, role=role, search=search) if skip else 0
+    return [user for user, _ in rows], rows[0].total
 
-    if role:
-        query = query.filter(UserDB.role == role)
 
-    if search:
-        search_filter = f"%{search}%"
-        query = query.filter(or_(UserDB.username.ilike(search_filter), UserDB.full_name.ilike(search_filter)))
+@track_sql
+def estimate_users_count(db: Session, role: Optional[UserRole] = None,
+                         search: Optional[str] = None) -> Tuple[int, bool]:
+    """Примерное число пользователей по статистике планировщика: (число, это_оценка)"""
+    statement = select(UserDB.id).where(*_user_filters(role, search))
+    return estimate_count(db, statement, UserDB.__tablename__)
+
+
+def user_cursor(user: UserDB) -> str:
+    """Курсор, с которого начинается страница после этого пользователя"""
+    return encode_cursor(user.username)
 
-    return query.count()
+
+def decode_user_cursor(cursor: str) -> str:
+    """username из курсора; InvalidCursor, если курсор не от списка пользователей"""
+    return decode_cursor(cursor, str)[0]
+
+
+@track_sql
+def get_users_count(db: Session, role: Optional[UserRole] = None, search: Optional[str] = None) -> int:
+    return db.query(UserDB).filter(*_user_filters(role, search)).count()
 
 
+@track_sql
 def create_user(db: Session, user: UserCreate) -> Optional[UserDB]:
     if get_user_by_username(db, user.username):
         return None
@@ -51,6 +101,7 @@ def create_user(db: Session, user: UserCreate) -> Optional[UserDB]:
     return db_user
 
 
+@track_sql
 def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[UserDB]:
     db_user = get_user(db, user_id)
     if not db_user:
@@ -66,35 +117,45 @@ def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[
         if value is not None:
             setattr(db_user, field, value)
 
+    invalidate_users(db, [user_id])
     db.commit()
+    invalidate_user(user_id)
     db.refresh(db_user)
     return db_user
 
 
+@track_sql
 def delete_user(db: Session, user_id: int) -> bool:
     db_user = get_user(db, user_id)
     if not db_user:
         return False
 
     db.delete(db_user)
+    invalidate_users(db, [user_id])
     db.commit()
+    invalidate_user(user_id)
     return True
 
 
+@track_sql
 def get_users_by_role(db: Session, role: UserRole) -> List[UserDB]:
     return db.query(UserDB).filter(UserDB.role == role).order_by(UserDB.username).all()
 
 
+@track_sql
 def change_user_role(db: Session, user_id: int, new_role: UserRole) -> Optional[UserDB]:
     db_user = get_user(db, user_id)
     if not db_user:
         return None
 
     db_user.role = new_role
+    invalidate_users(db, [user_id])
     db.commit()
+    invalidate_user(user_id)
     db.refresh(db_user)
     return db_user
 
+@track_sql
 def search_users(db: Session, search_term: str, limit: int = 50) -> List[UserDB]:
     search_filter = f"%{search_term}%"
     return db.query(UserDB).filter(
@@ -0,0 +1,44 @@
+"""Асинхронные варианты CRUD-операций над пользователями (см. crud/task_async.py)"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
+
+from models.user import UserDB, UserRole
+import crud.user as user_crud
+from crud.user import user_cursor, decode_user_cursor
+from crud.user_loader import user_loader
+
+
+async def get_user(db: AsyncSession, user_id: int) -> Optional[UserDB]:
+    return await db.run_sync(user_crud.get_user, user_id)
+
+
+async def load_user(db: AsyncSession, user_id: int) -> Optional[UserDB]:
+    """get_user через загрузчик запроса: параллельные вызовы — один IN-запрос, повторные — из памяти"""
+    return await user_loader(db).load(db, user_id)
+
+
+async def load_users(db: AsyncSession, user_ids: List[int]) -> List[Optional[UserDB]]:
+    return await user_loader(db).load_many(db, user_ids)
+
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[UserDB]:
+    return await db.run_sync(user_crud.get_user_by_username, username)
+
+
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100, role: Optional[UserRole] = None,
+                    search: Optional[str] = None, after: Optional[str] = None) -> List[UserDB]:
+    return await db.run_sync(user_crud.get_users, skip=skip, limit=limit, role=role, search=search, after=after)
+
+
+async def get_users_count(db: AsyncSession, role: Optional[UserRole] = None, search: Optional[str] = None) -> int:
+    return await db.run_sync(user_crud.get_users_count, role=role, search=search)
+
+
+async def get_users_with_total(db: AsyncSession, skip: int = 0, limit: int = 100, role: Optional[UserRole] = None,
+                               search: Optional[str] = None) -> Tuple[List[UserDB], int]:
+    return await db.run_sync(user_crud.get_users_with_total, skip=skip, limit=limit, role=role, search=search)
+
+
+async def estimate_users_count(db: AsyncSession, role: Optional[UserRole] = None,
+                               search: Optional[str] = None) -> Tuple[int, bool]:
+    return await db.run_sync(user_crud.estimate_users_count, role=role, search=search)
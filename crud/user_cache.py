@@ -0,0 +1,197 @@
+"""Кэш пользователей в памяти процесса: LRU с TTL перед get_user/get_user_by_username.
+
+Пользователь нужен почти каждому запросу (создатель, исполнители, проверка
+прав), а меняется редко — через эндпоинты пользователей и события Kafka.
+Кэш хранит не ORM-объекты, а значения колонок; при попадании объект
+присоединяется к сессии запроса через merge(load=False), без SELECT.
+
+Кэш необязателен (USER_CACHE_ENABLED) и устроен так:
+
+* не больше USER_CACHE_MAX_SIZE пользователей, давно не спрошенные вытесняются первыми;
+* запись живёт USER_CACHE_TTL_SECONDS — столько видна правка из другого
+  процесса, который событие не получал;
+* update_user, change_user_role, delete_user и обработчики событий Kafka
+  после commit вызывают invalidate_user(). Другие записи в users должны делать так же.
+
+Отсутствующие пользователи не кэшируются: иначе create_user тоже пришлось бы
+инвалидировать. Попадания, промахи и вытеснения видны в /metrics.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from models.user import UserDB
+from monitoring.metrics import REGISTRY
+
+USER_CACHE_ENABLED = os.getenv("USER_CACHE_ENABLED", "false").lower() == "true"
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+
+USER_CACHE_REQUESTS = REGISTRY.counter(
+    "user_cache_requests_total", "In-process user cache lookups by result", ("result",)
+)
+USER_CACHE_EVICTIONS = REGISTRY.counter(
+    "user_cache_evictions_total", "Entries dropped from the in-process user cache", ("reason",)
+)
+
+USER_COLUMNS = ("id", "username", "full_name", "role", "created_at", "updated_at")
+
+UserRow = Dict[str, Any]
+
+
+class UserCache:
+    """LRU пользователей по id (и по username) с ограниченным временем жизни записи"""
+
+    def __init__(self, max_size: int = USER_CACHE_MAX_SIZE, ttl: float = USER_CACHE_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # id -> (истекает в, строка); порядок — от давно не спрошенных к недавним
+        self._entries: "OrderedDict[int, Tuple[float, UserRow]]" = OrderedDict()
+        self._ids_by_username: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: int) -> Optional[UserRow]:
+        with self._lock:
+            row = self._get(user_id)
+        USER_CACHE_REQUESTS.inc(result="hit" if row is not None else "miss")
+        return row
+
+    def get_by_username(self, username: str) -> Optional[UserRow]:
+        with self._lock:
+            user_id = self._ids_by_username.get(username)
+            row = self._get(user_id) if user_id is not None else None
+        USER_CACHE_REQUESTS.inc(result="hit" if row is not None else "miss")
+        return row
+
+    def _get(self, user_id: int) -> Optional[UserRow]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, row = entry
+        if expires_at <= self._clock():
+            self._drop(user_id, "expired")
+            return None
+        self._entries.move_to_end(user_id)
+        return row
+
+    def put(self, row: UserRow) -> None:
+        with self._lock:
+            if row["id"] in self._entries:
+                self._drop(row["id"])
+            self._entries[row["id"]] = (self._clock() + self.ttl, row)
+            self._ids_by_username[row["username"]] = row["id"]
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)), "lru")
+
+    def invalidate(self, user_id: Optional[int] = None, username: Optional[str] = None) -> None:
+        """Забыть пользователя по id и/или username"""
+        with self._lock:
+            if username is not None and username in self._ids_by_username:
+                self._drop(self._ids_by_username[username], "invalidated")
+            if user_id is not None and user_id in self._entries:
+                self._drop(user_id, "invalidated")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._ids_by_username.clear()
+
+    def _drop(self, user_id: int, reason: Optional[str] = None) -> None:
+        _, row = self._entries.pop(user_id)
+        if self._ids_by_username.get(row["username"]) == user_id:
+            del self._ids_by_username[row["username"]]
+        if reason is not None:
+            USER_CACHE_EVICTIONS.inc(reason=reason)
+
+
+_cache: Optional[UserCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_user_cache() -> Optional[UserCache]:
+    """Кэш процесса; None, если он выключен"""
+    global _cache
+    if not USER_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = UserCache()
+    return _cache
+
+
+def reset_user_cache() -> None:
+    """Сбросить кэш; следующий get_user_cache создаст его пустым с текущими настройками"""
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def invalidate_user(user_id: Optional[int] = None, username: Optional[str] = None) -> None:
+    """Забыть пользователя после записи в users; вызывать после commit"""
+    cache = _cache
+    if cache is not None:
+        cache.invalidate(user_id, username)
+
+
+def user_row(user: UserDB) -> UserRow:
+    return {name: getattr(user, name) for name in USER_COLUMNS}
+
+
+def attach_user(db: Session, row: UserRow) -> UserDB:
+    """Пользователь из кэша как persistent-объект сессии, без запроса к БД"""
+    # Уже загруженный в сессию объект главнее: merge перезаписал бы его несохранённые изменения
+    existing = db.identity_map.get(db.identity_key(UserDB, row["id"]))
+    if existing is not None:
+        return existing
+    user = UserDB(**row)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def cached_users(
+        db: Session, user_ids: Iterable[int], fetch: Callable[[Session, List[int]], Iterable[UserDB]]
+) -> Dict[int, UserDB]:
+    """Пользователи по id: найденные в кэше — без запроса, остальные — одним вызовом fetch.
+
+    Отсутствующих в результате нет. Без кэша — просто fetch.
+    """
+    user_ids = list(user_ids)
+    cache = get_user_cache()
+    if cache is None:
+        return {user.id: user for user in fetch(db, user_ids)}
+    found = {}
+    for user_id in user_ids:
+        row = cache.get(user_id)
+        if row is not None:
+            found[user_id] = attach_user(db, row)
+    missing = [user_id for user_id in user_ids if user_id not in found]
+    if missing:
+        for user in fetch(db, missing):
+            cache.put(user_row(user))
+            found[user.id] = user
+    return found
+
+
+def collect_user_cache_metrics() -> List[str]:
+    """Размер кэша в текстовом формате Prometheus (коллектор для /metrics)"""
+    cache = _cache
+    if cache is None:
+        return []
+    return [
+        "# HELP user_cache_entries Users held by the in-process user cache",
+        "# TYPE user_cache_entries gauge",
+        f"user_cache_entries {len(cache)}",
+    ]
+
+
+REGISTRY.register_collector(collect_user_cache_metrics)
@@ -0,0 +1,139 @@
+"""Пакетная загрузка пользователей в рамках одного запроса (DataLoader).
+
+Обработчик и crud часто спрашивают одних и тех же пользователей: создатель и
+исполнители при создании задачи, текущий пользователь для проверки прав.
+UserLoader живёт в session.info, то есть ровно столько, сколько сессия запроса:
+
+* get_many() (sync, для crud) — один IN-запрос на всех ещё не загруженных;
+* load()/load_many() (async, для эндпоинтов) — вызовы, сделанные за один проход
+  цикла событий, собираются в один такой запрос.
+
+Отсутствующие пользователи тоже запоминаются. Кэш сбрасывается в конце
+транзакции: после commit или rollback пользователи могли измениться.
+Перед запросом в БД загрузчик смотрит в кэш процесса (crud/user_cache.py), если он включён.
+"""
+import asyncio
+from typing import Dict, Iterable, List, Optional, Union
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models.user import UserDB
+from monitoring.sql import track_sql
+from crud.user_cache import cached_users
+
+_LOADER_KEY = "user_loader"
+
+
+class UserLoader:
+    def __init__(self):
+        self._cache: Dict[int, Optional[UserDB]] = {}
+        self._serialized: Dict[int, dict] = {}
+        self._pending: Dict[int, List[asyncio.Future]] = {}
+        self._dispatch: Optional[asyncio.Task] = None
+
+    def get_many(self, db: Session, user_ids: Iterable[int]) -> Dict[int, Optional[UserDB]]:
+        """Пользователи по id (None — нет такого); незагруженные читаются одним запросом"""
+        user_ids = list(dict.fromkeys(user_ids))
+        missing = [user_id for user_id in user_ids if user_id not in self._cache]
+        if missing:
+            found = cached_users(db, missing, _query_users)
+            for user_id in missing:
+                self._cache[user_id] = found.get(user_id)
+        return {user_id: self._cache[user_id] for user_id in user_ids}
+
+    def get(self, db: Session, user_id: int) -> Optional[UserDB]:
+        return self.get_many(db, [user_id])[user_id]
+
+    async def load(self, db: AsyncSession, user_id: int) -> Optional[UserDB]:
+        """Пользователь по id; запросы одного прохода цикла событий объединяются.
+
+        Пока идёт пакетный запрос, сессию нельзя использовать параллельно для другого.
+        """
+        if user_id in self._cache:
+            return self._cache[user_id]
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(user_id, []).append(future)
+        if self._dispatch is None:
+            self._dispatch = asyncio.ensure_future(self._dispatch_pending(db))
+        return await future
+
+    async def load_many(self, db: AsyncSession, user_ids: Iterable[int]) -> List[Optional[UserDB]]:
+        return list(await asyncio.gather(*(self.load(db, user_id) for user_id in user_ids)))
+
+    async def _dispatch_pending(self, db: AsyncSession) -> None:
+        # Даём остальным корутинам этого прохода поставить свои id в очередь
+        await asyncio.sleep(0)
+        pending, self._pending, self._dispatch = self._pending, {}, None
+        try:
+            users = await db.run_sync(self.get_many, list(pending))
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for user_id, futures in pending.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(users[user_id])
+
+    def forget(self, user_id: int) -> None:
+        self._cache.pop(user_id, None)
+        self._serialized.pop(user_id, None)
+
+    def serialize(self, user: UserDB) -> dict:
+        """Словарь пользователя для ответа; один на пользователя, сколько бы задач на него ни ссылалось"""
+        data = self._serialized.get(user.id)
+        if data is None:
+            data = self._serialized[user.id] = user_to_dict(user)
+        return data
+
+
+def user_to_dict(user: UserDB) -> dict:
+    return {
+        "id": user.id,
+        "username": user.username,
+        "full_name": user.full_name,
+        "role": user.role.value,
+        "created_at": user.created_at
+    }
+
+
+@track_sql
+def _query_users(db: Session, user_ids: List[int]) -> List[UserDB]:
+    return db.query(UserDB).filter(UserDB.id.in_(user_ids)).all()
+
+
+def user_loader(db: Union[Session, AsyncSession]) -> UserLoader:
+    """Загрузчик сессии; создаётся при первом обращении"""
+    session = db.sync_session if isinstance(db, AsyncSession) else db
+    loader = session.info.get(_LOADER_KEY)
+    if loader is None:
+        loader = session.info[_LOADER_KEY] = UserLoader()
+    return loader
+
+
+@event.listens_for(Session, "after_flush")
+def _forget_changed_users(session: Session, flush_context) -> None:
+    loader = session.info.get(_LOADER_KEY)
+    if loader is None:
+        return
+    for obj in list(session.new) + list(session.deleted) + list(session.dirty):
+        if isinstance(obj, UserDB):
+            loader.forget(obj.id)
+
+
+@event.listens_for(Session, "persistent_to_detached")
+def _forget_detached_user(session: Session, instance) -> None:
+    # Отсоединённый объект нельзя отдавать дальше: его связи уже не загрузить
+    loader = session.info.get(_LOADER_KEY)
+    if loader is not None and isinstance(instance, UserDB):
+        loader.forget(instance.id)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _reset_user_loader(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_LOADER_KEY, None)
@@ -1,24 +1,191 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from starlette.requests import Request
+from starlette.responses import Response
+from typing import AsyncIterator, Optional
 import os
+import time
+
+from monitoring.pool import PoolTelemetry, instrumented_pool
+
 DB_USER = os.getenv("DATABASE_USERNAME", "postgres")
 DB_PASSWORD = os.getenv("DATABASE_PASSWORD", "1363")
 DB_HOST = os.getenv("DATABASE_HOST", "localhost")
 DB_PORT = os.getenv("DATABASE_PORT", "5432")
 DB_NAME = os.getenv("DATABASE_NAME", "tasktracker")
+# Реплика для чтения (необязательная): GET-запросы уходят на неё
+DB_REPLICA_HOST = os.getenv("DATABASE_REPLICA_HOST", "")
+DB_REPLICA_PORT = os.getenv("DATABASE_REPLICA_PORT", DB_PORT)
+# Сколько секунд после записи клиент читает только с primary
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+PRIMARY_STICKY_COOKIE = "tt_primary_until"
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Тот же сервер, но через asyncpg — для async-эндпоинтов v2
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+REPLICA_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_NAME}"
+ASYNC_REPLICA_DATABASE_URL = (
+    f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_NAME}"
+)
+
+# Параметры пула соединений (на каждый движок отдельно)
+DB_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DATABASE_POOL_PRE_PING", "true").lower() == "true"
+# Kafka consumer читает сообщения в одном потоке — ему хватает своего маленького пула
+KAFKA_DB_POOL_SIZE = int(os.getenv("KAFKA_DATABASE_POOL_SIZE", "1"))
+
+pool_telemetry = PoolTelemetry("primary")
+async_pool_telemetry = PoolTelemetry("primary_async")
+kafka_pool_telemetry = PoolTelemetry("kafka")
+
+
+def _pool_options(pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW) -> dict:
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+class RoutingSession(Session):
+    """Сессия, которая читает с реплики, если запрос помечен как read-only.
+
+    Флаг ставится в session.info["read_only"]; всё, что идёт через flush,
+    и любые запросы без флага выполняются на primary.
+    """
+    replica_bind = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.replica_bind is not None and self.info.get("read_only") and not self._flushing:
+            return self.replica_bind
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+engine = create_engine(DATABASE_URL, poolclass=instrumented_pool(QueuePool, pool_telemetry), **_pool_options())
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=instrumented_pool(AsyncAdaptedQueuePool, async_pool_telemetry),
+    **_pool_options()
+)
+
+replica_engine = None
+async_replica_engine = None
+if DB_REPLICA_HOST:
+    replica_engine = create_engine(
+        REPLICA_DATABASE_URL,
+        poolclass=instrumented_pool(QueuePool, PoolTelemetry("replica")),
+        **_pool_options()
+    )
+    async_replica_engine = create_async_engine(
+        ASYNC_REPLICA_DATABASE_URL,
+        poolclass=instrumented_pool(AsyncAdaptedQueuePool, PoolTelemetry("replica_async")),
+        **_pool_options()
+    )
+
+
+class _SyncRoutingSession(RoutingSession):
+    replica_bind = replica_engine
+
+
+class _AsyncRoutingSession(RoutingSession):
+    replica_bind = async_replica_engine.sync_engine if async_replica_engine is not None else None
+
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=_SyncRoutingSession)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    sync_session_class=_AsyncRoutingSession
+)
+
+kafka_engine = create_engine(
+    DATABASE_URL,
+    poolclass=instrumented_pool(QueuePool, kafka_pool_telemetry),
+    **_pool_options(pool_size=KAFKA_DB_POOL_SIZE, max_overflow=0)
+)
+KafkaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=kafka_engine)
 
 Base = declarative_base()
 
 
-def get_db():
+def is_sticky_to_primary(request: Request) -> bool:
+    """Клиент недавно писал — его чтения должны идти на primary"""
+    try:
+        until = float(request.cookies.get(PRIMARY_STICKY_COOKIE, 0))
+    except ValueError:
+        return False
+    return until > time.time()
+
+
+def mark_primary_sticky(response: Response) -> None:
+    """Закрепить клиента за primary на REPLICA_STICKY_SECONDS после записи"""
+    until = time.time() + REPLICA_STICKY_SECONDS
+    response.set_cookie(
+        PRIMARY_STICKY_COOKIE,
+        f"{until:.3f}",
+        max_age=max(1, int(REPLICA_STICKY_SECONDS + 0.999)),
+        httponly=True
+    )
+
+
+def can_use_replica(request: Optional[Request]) -> bool:
+    """Можно ли обслужить запрос с реплики"""
+    return (
+        request is not None
+        and request.method in ("GET", "HEAD")
+        and not is_sticky_to_primary(request)
+    )
+
+
+def get_db(request: Request = None):
     db = SessionLocal()
+    db.info["read_only"] = replica_engine is not None and can_use_replica(request)
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db(request: Request = None) -> AsyncIterator[AsyncSession]:
+    """Асинхронная сессия БД: запросы не занимают поток из пула AnyIO"""
+    async with AsyncSessionLocal() as db:
+        db.sync_session.info["read_only"] = async_replica_engine is not None and can_use_replica(request)
+        yield db
+
+
+ALEMBIC_INI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+
+class SchemaRevisionMismatch(RuntimeError):
+    """Схема БД не соответствует последней миграции Alembic"""
+
+
+def check_schema_revision(bind=None) -> str:
+    """Сверяет ревизию в alembic_version с head в migrations/.
+
+    Схема создаётся только миграциями (`alembic upgrade head`), а не create_all,
+    поэтому сервис не стартует на неприменённых миграциях.
+    """
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    script = ScriptDirectory.from_config(Config(ALEMBIC_INI_PATH))
+    head = script.get_current_head()
+    with (bind or engine).connect() as connection:
+        current = MigrationContext.configure(connection).get_current_revision()
+    if current != head:
+        raise SchemaRevisionMismatch(
+            f"Database schema revision is {current!r}, expected {head!r}; run `alembic upgrade head`"
+        )
+    return current
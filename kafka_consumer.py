@@ -6,6 +6,10 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 from typing import Callable
 import os
+
+from crud.user_cache import invalidate_user
+from crud.task_cache import invalidate_users
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -129,7 +133,10 @@ class KafkaConsumer:
                     self._handle_account_deleted(db, user_data)
                 else:
                     logging.warning(f"Unknown event type: {event_type}")
+                invalidate_users(db, [user_data.get('user_id')])
                 db.commit()
+                # id из события и username — на случай, если у пользователя сменился id
+                invalidate_user(user_data.get('user_id'), user_data.get('username'))
             except Exception as e:
                 db.rollback()
                 logging.error(f"Database error processing {event_type}: {e}")
@@ -1,5 +1,9 @@
-from fastapi import FastAPI
-from database import engine, Base, SessionLocal
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from database import (
+    async_engine, kafka_engine, replica_engine, async_replica_engine, KafkaSessionLocal,
+    mark_primary_sticky, check_schema_revision
+)
 from fastapi.middleware.cors import CORSMiddleware
 from api.endpoints import v1_users_router, v1_tasks_router, v2_users_router, v2_tasks_router
 import json
@@ -7,14 +11,17 @@ import os
 import logging
 from contextlib import asynccontextmanager
 from kafka_consumer import KafkaConsumer
+from monitoring.pool import pool_status
+from monitoring.metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from monitoring.middleware import MetricsMiddleware
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 kafka_consumer = None
 
 def get_db_session():
-    """Функция для получения сессии БД для Kafka consumer"""
-    db = SessionLocal()
+    """Функция для получения сессии БД для Kafka consumer (отдельный пул)"""
+    db = KafkaSessionLocal()
     try:
         return db
     except Exception as e:
@@ -27,8 +34,8 @@ def get_db_session():
 async def lifespan(app: FastAPI):
     logger.info("Starting Task Tracking Service")
     if not os.getenv("TESTING"):
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created/verified")
+        revision = check_schema_revision()
+        logger.info(f"Database schema is at revision {revision}")
 
         global kafka_consumer
         try:
@@ -48,6 +55,11 @@ async def lifespan(app: FastAPI):
     if not os.getenv("TESTING") and kafka_consumer:
         kafka_consumer.stop()
         logger.info("Kafka consumer stopped")
+    await async_engine.dispose()
+    kafka_engine.dispose()
+    if replica_engine is not None:
+        replica_engine.dispose()
+        await async_replica_engine.dispose()
 
 app = FastAPI(
     title="Task Tracking Service",
@@ -64,6 +76,24 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+
+@app.middleware("http")
+async def primary_stickiness(request: Request, call_next):
+    """После успешной записи клиент какое-то время читает с primary (read-your-writes)"""
+    response = await call_next(request)
+    if (
+        replica_engine is not None
+        and request.method not in ("GET", "HEAD", "OPTIONS")
+        and response.status_code < 400
+    ):
+        mark_primary_sticky(response)
+    return response
+
+
+# Последним — чтобы быть самым внешним и мерить полное время запроса
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(v1_users_router)
 app.include_router(v1_tasks_router)
 app.include_router(v2_users_router)
@@ -83,7 +113,23 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "kafka_sync": "active" if kafka_consumer and kafka_consumer.running else "inactive"}
+    return {
+        "status": "healthy",
+        "kafka_sync": "active" if kafka_consumer and kafka_consumer.running else "inactive",
+        "database_pools": pool_status()
+    }
+
+
+@app.get("/health/db-pool")
+def db_pool_info():
+    """Загрузка пулов соединений: выдано, overflow, ожидание и таймауты"""
+    return pool_status()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Метрики в формате Prometheus: RED по маршрутам, SQL на запрос, пулы соединений"""
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
 
 
 @app.get("/kafka/info")
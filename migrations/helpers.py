@@ -0,0 +1,12 @@
+"""Общие операции для ревизий в migrations/versions"""
+from alembic import op
+
+
+def drop_column(table_name: str, column_name: str) -> None:
+    """Удаляет колонку в downgrade.
+
+    SQLite до 3.35 не умеет DROP COLUMN, поэтому используется batch-режим:
+    на SQLite он пересоздаёт таблицу, на PostgreSQL выполняет обычный ALTER TABLE.
+    """
+    with op.batch_alter_table(table_name) as batch_op:
+        batch_op.drop_column(column_name)
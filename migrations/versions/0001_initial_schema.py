@@ -0,0 +1,66 @@
+"""initial schema
+
+Схема, которую раньше создавал Base.metadata.create_all при старте.
+Для уже существующей БД: alembic stamp 0001_initial_schema.
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-17 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_initial_schema"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(length=50), nullable=False, unique=True),
+        sa.Column("full_name", sa.String(length=200)),
+        sa.Column("role", sa.Enum("USER", "MANAGER", "ADMIN", name="userrole"), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_table(
+        "tasks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(length=200), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+        sa.Column("due_date", sa.DateTime(), nullable=True),
+        sa.Column("status", sa.Enum("OPEN", "IN_PROGRESS", "REVIEW", "COMPLETED", name="taskstatus")),
+        sa.Column("creator_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+    )
+    op.create_index("ix_tasks_status", "tasks", ["status"])
+    op.create_table(
+        "task_hierarchy",
+        sa.Column("parent_id", sa.Integer(), sa.ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("child_id", sa.Integer(), sa.ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_table(
+        "task_assignments",
+        sa.Column("task_id", sa.Integer(), sa.ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("assigned_at", sa.DateTime()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("task_assignments")
+    op.drop_table("task_hierarchy")
+    op.drop_index("ix_tasks_status", table_name="tasks")
+    op.drop_table("tasks")
+    op.drop_table("users")
+    sa.Enum(name="taskstatus").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="userrole").drop(op.get_bind(), checkfirst=True)
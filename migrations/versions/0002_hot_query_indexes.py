@@ -0,0 +1,52 @@
+"""indexes for hot list, filter and hierarchy queries
+
+Индексы создаются CONCURRENTLY вне транзакции, чтобы не блокировать
+запись в живую таблицу tasks.
+
+Revision ID: 0002_hot_query_indexes
+Revises: 0001_initial_schema
+Create Date: 2026-10-17 10:05:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_hot_query_indexes"
+down_revision: Union[str, None] = "0001_initial_schema"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_TASK_CONDITION = sa.text("status <> 'COMPLETED'")
+
+# (имя, таблица, колонки, условие частичного индекса)
+INDEXES = (
+    ("ix_tasks_updated_at_id", "tasks", [sa.text("updated_at DESC"), sa.text("id DESC")], None),
+    ("ix_tasks_creator_id_updated_at", "tasks", ["creator_id", sa.text("updated_at DESC")], None),
+    ("ix_tasks_status_updated_at", "tasks", ["status", sa.text("updated_at DESC")], None),
+    ("ix_tasks_active_updated_at", "tasks", [sa.text("updated_at DESC")], ACTIVE_TASK_CONDITION),
+    ("ix_tasks_active_due_date", "tasks", ["due_date"], ACTIVE_TASK_CONDITION),
+    ("ix_task_assignments_user_id_task_id", "task_assignments", ["user_id", "task_id"], None),
+    ("ix_task_hierarchy_child_id", "task_hierarchy", ["child_id"], None),
+)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_concurrently=True,
+                postgresql_where=where,
+                sqlite_where=where,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
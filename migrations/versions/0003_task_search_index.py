@@ -0,0 +1,43 @@
+"""full-text search index over task title and description
+
+GIN-индекс по выражению из models.task.task_search_document: выражение
+должно совпадать с запросом посимвольно, иначе планировщик его не использует.
+Только для PostgreSQL; в SQLite поиск остаётся на LIKE.
+
+Revision ID: 0003_task_search_index
+Revises: 0002_hot_query_indexes
+Create Date: 2026-10-17 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_task_search_index"
+down_revision: Union[str, None] = "0002_hot_query_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_search_document "
+            f"ON tasks USING gin (({SEARCH_DOCUMENT}))"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_tasks_search_document")
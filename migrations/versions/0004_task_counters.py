@@ -0,0 +1,54 @@
+"""task_counters table for O(1) task stats
+
+Счётчики заполняются по текущим данным в этой же миграции; дальше их
+поддерживает приложение (models/task_counters.py).
+
+Revision ID: 0004_task_counters
+Revises: 0003_task_search_index
+Create Date: 2026-10-17 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_task_counters"
+down_revision: Union[str, None] = "0003_task_search_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TASK_STATUSES = ("OPEN", "IN_PROGRESS", "REVIEW", "COMPLETED")
+
+
+def upgrade() -> None:
+    # Тип taskstatus уже создан в 0001
+    status_type = sa.Enum(*TASK_STATUSES, name="taskstatus").with_variant(
+        postgresql.ENUM(*TASK_STATUSES, name="taskstatus", create_type=False), "postgresql"
+    )
+    op.create_table(
+        "task_counters",
+        sa.Column("scope", sa.String(length=16), primary_key=True),
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("status", status_type, primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+    op.execute(
+        "INSERT INTO task_counters (scope, user_id, status, count) "
+        "SELECT 'all', 0, status, count(*) FROM tasks GROUP BY status"
+    )
+    op.execute(
+        "INSERT INTO task_counters (scope, user_id, status, count) "
+        "SELECT 'user', involved.user_id, tasks.status, count(*) "
+        "FROM (SELECT creator_id AS user_id, id AS task_id FROM tasks "
+        "      UNION SELECT user_id, task_id FROM task_assignments) AS involved "
+        "JOIN tasks ON tasks.id = involved.task_id "
+        "GROUP BY involved.user_id, tasks.status"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("task_counters")
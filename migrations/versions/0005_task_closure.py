@@ -0,0 +1,53 @@
+"""task_closure table for single-query hierarchy lookups
+
+Таблица заполняется по текущим связям task_hierarchy в этой же миграции;
+дальше её поддерживает приложение (models/task_closure.py).
+
+Revision ID: 0005_task_closure
+Revises: 0004_task_counters
+Create Date: 2026-10-17 15:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_task_closure"
+down_revision: Union[str, None] = "0004_task_counters"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "task_closure",
+        sa.Column("ancestor_id", sa.Integer(), sa.ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("descendant_id", sa.Integer(), sa.ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("depth", sa.Integer(), primary_key=True),
+        sa.Column("path_count", sa.Integer(), nullable=False),
+    )
+    op.create_index(
+        "ix_task_closure_descendant_ancestor", "task_closure", ["descendant_id", "ancestor_id", "depth"]
+    )
+    # Каждая строка рекурсии — отдельный путь; GROUP BY сворачивает их в path_count.
+    # Иерархия и раньше проверялась на циклы, ограничение глубины — страховка от старых данных
+    op.execute(
+        "INSERT INTO task_closure (ancestor_id, descendant_id, depth, path_count) "
+        "WITH RECURSIVE paths (ancestor_id, descendant_id, depth) AS ("
+        "  SELECT parent_id, child_id, 1 FROM task_hierarchy "
+        "  UNION ALL "
+        "  SELECT paths.ancestor_id, task_hierarchy.child_id, paths.depth + 1 "
+        "  FROM paths JOIN task_hierarchy ON task_hierarchy.parent_id = paths.descendant_id "
+        "  WHERE paths.depth < 1000"
+        ") "
+        "SELECT ancestor_id, descendant_id, depth, count(*) FROM paths "
+        "GROUP BY ancestor_id, descendant_id, depth"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_task_closure_descendant_ancestor", table_name="task_closure")
+    op.drop_table("task_closure")
@@ -0,0 +1,29 @@
+"""tasks.version for minimal write responses and change detection
+
+Revision ID: 0006_task_version
+Revises: 0005_task_closure
+Create Date: 2026-10-17 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import drop_column
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_task_version"
+down_revision: Union[str, None] = "0005_task_closure"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # server_default заполняет существующие строки без отдельного UPDATE
+    op.add_column("tasks", sa.Column("version", sa.Integer(), nullable=False, server_default=sa.text("1")))
+
+
+def downgrade() -> None:
+    drop_column("tasks", "version")
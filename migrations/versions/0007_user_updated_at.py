@@ -0,0 +1,31 @@
+"""users.updated_at as a validator for task responses that embed users
+
+Существующие строки получают updated_at = created_at.
+
+Revision ID: 0007_user_updated_at
+Revises: 0006_task_version
+Create Date: 2026-10-17 21:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import drop_column
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_user_updated_at"
+down_revision: Union[str, None] = "0006_task_version"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    op.execute("UPDATE users SET updated_at = created_at")
+
+
+def downgrade() -> None:
+    drop_column("users", "updated_at")
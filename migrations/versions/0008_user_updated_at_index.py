@@ -0,0 +1,33 @@
+"""index users.updated_at for the task list validator
+
+max(users.updated_at) входит в ETag списков задач и читается на каждый
+список; без индекса это полный проход по users. Индекс создаётся
+CONCURRENTLY вне транзакции, как в 0002.
+
+Revision ID: 0008_user_updated_at_index
+Revises: 0007_user_updated_at
+Create Date: 2026-10-17 23:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_user_updated_at_index"
+down_revision: Union[str, None] = "0007_user_updated_at"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_users_updated_at", "users", ["updated_at"], postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_users_updated_at", table_name="users", postgresql_concurrently=True, if_exists=True)
@@ -1,4 +1,7 @@
 from .user import UserDB
 from .task import TaskDB, TaskHierarchyDB, TaskAssignmentDB
+from .task_counters import TaskCounterDB
+from .task_closure import TaskClosureDB
+from .task_versions import touch_tasks
 
-__all__ = ["UserDB", "TaskDB", "TaskHierarchyDB", "TaskAssignmentDB"]
\ No newline at end of file
+__all__ = ["UserDB", "TaskDB", "TaskHierarchyDB", "TaskAssignmentDB", "TaskCounterDB", "TaskClosureDB"]
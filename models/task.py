@@ -1,6 +1,6 @@
 import enum
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text, Index, FetchedValue, event, text, func
+from sqlalchemy.orm import object_session, relationship
 import datetime
 from database import Base
 
@@ -13,8 +13,26 @@ class TaskStatus(enum.Enum):
     COMPLETED = "completed"
 
 
+# Условие частичных индексов по "активным" задачам. Enum хранится по имени члена.
+ACTIVE_TASK_CONDITION = text("status <> 'COMPLETED'")
+
+
 class TaskDB(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Все списки сортируются по updated_at DESC (id — для стабильного порядка)
+        Index("ix_tasks_updated_at_id", text("updated_at DESC"), text("id DESC")),
+        Index("ix_tasks_creator_id_updated_at", "creator_id", text("updated_at DESC")),
+        Index("ix_tasks_status_updated_at", "status", text("updated_at DESC")),
+        Index(
+            "ix_tasks_active_updated_at", text("updated_at DESC"),
+            postgresql_where=ACTIVE_TASK_CONDITION, sqlite_where=ACTIVE_TASK_CONDITION
+        ),
+        Index(
+            "ix_tasks_active_due_date", "due_date",
+            postgresql_where=ACTIVE_TASK_CONDITION, sqlite_where=ACTIVE_TASK_CONDITION
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     title = Column(String(200), nullable=False)
@@ -36,13 +54,52 @@ class TaskDB(Base):
         back_populates="parent_task"
     )
     assignments = relationship("TaskAssignmentDB", back_populates="task", cascade="all, delete-orphan")
+    # Растёт на каждое изменение строки: ORM-UPDATE увеличивает его в SQL (_bump_task_version),
+    # массовые UPDATE в обход unit of work — явно. Это не оптимистическая блокировка:
+    # конкурирующие записи не проверяют прочитанное значение и не падают с StaleDataError
+    version = Column(Integer, nullable=False, server_default=text("1"), server_onupdate=FetchedValue())
+
+    # Новое version возвращается из INSERT/UPDATE через RETURNING, без отдельного SELECT
+    __mapper_args__ = {"eager_defaults": True}
 
     def __repr__(self):
         return f"<Task(id={self.id}, title='{self.title}', status='{self.status}')>"
 
 
+@event.listens_for(TaskDB, "before_update")
+def _bump_task_version(mapper, connection, target: TaskDB) -> None:
+    # version + 1 на стороне БД: параллельные правки не теряют увеличений друг друга
+    if object_session(target).is_modified(target, include_collections=False):
+        target.version = TaskDB.version + 1
+
+
+# Конфигурация полнотекстового поиска PostgreSQL: 'simple' не стеммит, поэтому
+# одинаково работает для русских и английских задач, а префиксы дают tsquery "слово:*".
+# Константы вставляются литералами: с параметрами планировщик не сопоставит выражение с индексом.
+TASK_SEARCH_CONFIG = text("'simple'::regconfig")
+
+
+def task_search_document():
+    """tsvector по задаче: заголовок весит больше описания (A против B)"""
+    empty = text("''")
+    return func.setweight(
+        func.to_tsvector(TASK_SEARCH_CONFIG, func.coalesce(TaskDB.title, empty)), text("'A'")
+    ).op("||")(
+        func.setweight(func.to_tsvector(TASK_SEARCH_CONFIG, func.coalesce(TaskDB.description, empty)), text("'B'"))
+    )
+
+
+# GIN-индекс по выражению (а не отдельная tsvector-колонка) не требует триггеров:
+# PostgreSQL сам поддерживает его при INSERT/UPDATE. В SQLite поиск идёт через LIKE.
+Index("ix_tasks_search_document", task_search_document(), postgresql_using="gin").ddl_if(dialect="postgresql")
+
+
 class TaskHierarchyDB(Base):
     __tablename__ = "task_hierarchy"
+    # PK (parent_id, child_id) покрывает поиск детей; для поиска родителей нужен child_id
+    __table_args__ = (
+        Index("ix_task_hierarchy_child_id", "child_id"),
+    )
 
     parent_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True, nullable=False)
     child_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True, nullable=False)
@@ -56,6 +113,10 @@ class TaskHierarchyDB(Base):
 
 class TaskAssignmentDB(Base):
     __tablename__ = "task_assignments"
+    # PK (task_id, user_id) не помогает фильтру "задачи пользователя"
+    __table_args__ = (
+        Index("ix_task_assignments_user_id_task_id", "user_id", "task_id"),
+    )
 
     task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, nullable=False)
@@ -0,0 +1,282 @@
+"""Closure-таблица иерархии задач.
+
+task_hierarchy хранит только прямые связи родитель→потомок. task_closure хранит
+все пути в этом DAG: строка (ancestor_id, descendant_id, depth) с числом путей
+такой длины. Поэтому предки, потомки и проверка на цикл — один запрос по индексу
+вместо обхода по уровням.
+
+У задачи может быть несколько родителей, так что между двумя задачами бывает
+несколько путей; path_count позволяет корректно удалять связи: удаление ребра
+вычитает ровно те пути, которые через него проходили.
+
+Таблица поддерживается в той же транзакции:
+
+* связи, добавленные или удалённые через ORM, обрабатываются в after_flush;
+* массовые удаления (delete_task) вызывают detach_task_from_closure() явно.
+
+Пересобрать таблицу с нуля по task_hierarchy можно через rebuild_task_closure().
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import Column, ForeignKey, Index, Integer, bindparam, event, func, literal, select, true, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database import Base
+from models.task import TaskHierarchyDB
+
+_PENDING_KEY = "task_closure_pending"
+
+
+class TaskClosureDB(Base):
+    __tablename__ = "task_closure"
+    # PK (ancestor_id, ...) отвечает за потомков, индекс по descendant_id — за предков
+    __table_args__ = (
+        Index("ix_task_closure_descendant_ancestor", "descendant_id", "ancestor_id", "depth"),
+    )
+
+    ancestor_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    depth = Column(Integer, primary_key=True)
+    path_count = Column(Integer, nullable=False, default=1)
+
+    def __repr__(self):
+        return (
+            f"<TaskClosure(ancestor_id={self.ancestor_id}, descendant_id={self.descendant_id}, "
+            f"depth={self.depth}, path_count={self.path_count})>"
+        )
+
+
+def _ancestors_or_self(task_id: int):
+    """(ancestor_id, depth, path_count) всех предков задачи плюс она сама на глубине 0"""
+    closure = TaskClosureDB.__table__
+    return union_all(
+        select(closure.c.ancestor_id.label("task_id"), closure.c.depth, closure.c.path_count)
+        .where(closure.c.descendant_id == task_id),
+        select(literal(task_id).label("task_id"), literal(0).label("depth"), literal(1).label("path_count"))
+    ).subquery()
+
+
+def _descendants_or_self(task_id: int):
+    """(descendant_id, depth, path_count) всех потомков задачи плюс она сама на глубине 0"""
+    closure = TaskClosureDB.__table__
+    return union_all(
+        select(closure.c.descendant_id.label("task_id"), closure.c.depth, closure.c.path_count)
+        .where(closure.c.ancestor_id == task_id),
+        select(literal(task_id).label("task_id"), literal(0).label("depth"), literal(1).label("path_count"))
+    ).subquery()
+
+
+def _paths_through(parent_id: int, child_id: int, edge_length: int = 1):
+    """Пути вида предок(parent) → ... → потомок(child), проходящие через ребро или узел.
+
+    Для ребра parent→child edge_length = 1; для узла (parent == child) — 0,
+    тогда пара (узел, узел) на глубине 0 исключается.
+    """
+    ancestors = _ancestors_or_self(parent_id)
+    descendants = _descendants_or_self(child_id)
+    depth = ancestors.c.depth + descendants.c.depth + edge_length
+    statement = select(
+        ancestors.c.task_id.label("ancestor_id"),
+        descendants.c.task_id.label("descendant_id"),
+        depth.label("depth"),
+        func.sum(ancestors.c.path_count * descendants.c.path_count).label("path_count")
+    ).select_from(ancestors.join(descendants, true()))
+    if edge_length == 0:
+        statement = statement.where(depth > 0)
+    # Разные пары (глубина до parent, глубина от child) дают одну и ту же строку closure
+    return statement.group_by(ancestors.c.task_id, descendants.c.task_id, depth)
+
+
+def add_edge(connection: Connection, parent_id: int, child_id: int) -> None:
+    """Добавить в closure все пути через новое ребро parent→child (один INSERT ... SELECT)"""
+    table = TaskClosureDB.__table__
+    paths = _paths_through(parent_id, child_id)
+    columns = ["ancestor_id", "descendant_id", "depth", "path_count"]
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        # WHERE обязателен: иначе SQLite путает ON CONFLICT с условием JOIN
+        statement = insert(table).from_select(columns, paths.where(true()))
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.ancestor_id, table.c.descendant_id, table.c.depth],
+            set_={"path_count": table.c.path_count + statement.excluded["path_count"]}
+        )
+        connection.execute(statement)
+        return
+    _add_paths(connection, connection.execute(paths).all())
+
+
+def add_edges_for_new_tasks(connection: Connection, edges: Iterable[Tuple[int, int]]) -> None:
+    """Добавить в closure связи, у которых потомок — только что созданная задача.
+
+    У новых задач нет своих потомков вне edges, поэтому их предки выводятся из
+    предков родителей без обхода по рёбрам в БД: один SELECT по уже существующим
+    родителям и один INSERT на все строки (для массового создания).
+    """
+    edges = list(edges)
+    if not edges:
+        return
+    parents_of: Dict[int, List[int]] = {}
+    for parent_id, child_id in edges:
+        parents_of.setdefault(child_id, []).append(parent_id)
+    existing_parents = sorted({parent_id for parent_id, _ in edges} - set(parents_of))
+
+    # task_id → Counter{(ancestor_id, depth): path_count}
+    ancestors: Dict[int, Counter] = {parent_id: Counter() for parent_id in existing_parents}
+    table = TaskClosureDB.__table__
+    if existing_parents:
+        for ancestor_id, descendant_id, depth, path_count in connection.execute(
+            select(table.c.ancestor_id, table.c.descendant_id, table.c.depth, table.c.path_count)
+            .where(table.c.descendant_id.in_(existing_parents))
+        ):
+            ancestors[descendant_id][(ancestor_id, depth)] += path_count
+
+    # Родители раньше детей; стек вместо рекурсии — цепочки бывают длиннее лимита рекурсии
+    for task_id in parents_of:
+        stack = [task_id]
+        while stack:
+            current = stack[-1]
+            if current in ancestors:
+                stack.pop()
+                continue
+            missing = [parent_id for parent_id in parents_of[current] if parent_id not in ancestors]
+            if missing:
+                stack.extend(missing)
+                continue
+            paths = Counter()
+            for parent_id in parents_of[current]:
+                paths[(parent_id, 1)] += 1
+                for (ancestor_id, depth), count in ancestors[parent_id].items():
+                    paths[(ancestor_id, depth + 1)] += count
+            ancestors[current] = paths
+            stack.pop()
+
+    rows = [
+        {"ancestor_id": ancestor_id, "descendant_id": child_id, "depth": depth, "path_count": count}
+        for child_id in sorted(parents_of)
+        for (ancestor_id, depth), count in sorted(ancestors[child_id].items())
+    ]
+    connection.execute(table.insert(), rows)
+
+
+def _add_paths(connection: Connection, rows: Iterable[Tuple[int, int, int, int]]) -> None:
+    table = TaskClosureDB.__table__
+    for ancestor_id, descendant_id, depth, path_count in rows:
+        key = (table.c.ancestor_id == ancestor_id, table.c.descendant_id == descendant_id, table.c.depth == depth)
+        updated = connection.execute(
+            table.update().where(*key).values(path_count=table.c.path_count + path_count)
+        )
+        if not updated.rowcount:
+            connection.execute(table.insert().values(
+                ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth, path_count=path_count
+            ))
+
+
+def _remove_paths(connection: Connection, paths) -> None:
+    """Вычесть пути из closure и удалить строки, в которых путей не осталось"""
+    rows = connection.execute(paths).all()
+    if not rows:
+        return
+    table = TaskClosureDB.__table__
+    connection.execute(
+        table.update()
+        .where(
+            table.c.ancestor_id == bindparam("b_ancestor_id"),
+            table.c.descendant_id == bindparam("b_descendant_id"),
+            table.c.depth == bindparam("b_depth")
+        )
+        .values(path_count=table.c.path_count - bindparam("b_removed")),
+        [
+            {"b_ancestor_id": a, "b_descendant_id": d, "b_depth": depth, "b_removed": count}
+            for a, d, depth, count in sorted(rows)
+        ]
+    )
+    connection.execute(table.delete().where(table.c.path_count <= 0))
+
+
+def remove_edge(connection: Connection, parent_id: int, child_id: int) -> None:
+    """Убрать из closure пути, проходившие через ребро parent→child"""
+    _remove_paths(connection, _paths_through(parent_id, child_id))
+
+
+def detach_task_from_closure(session: Session, task_id: int) -> None:
+    """Убрать все пути, проходящие через задачу; вызывается до удаления её связей"""
+    _remove_paths(session.connection(), _paths_through(task_id, task_id, edge_length=0))
+
+
+def creates_cycle(connection: Connection, parent_id: int, child_id: int) -> bool:
+    """Замкнёт ли ребро parent→child цикл: child уже предок parent (или это та же задача)"""
+    if parent_id == child_id:
+        return True
+    closure = TaskClosureDB.__table__
+    return connection.execute(
+        select(literal(True)).where(
+            closure.c.ancestor_id == child_id,
+            closure.c.descendant_id == parent_id
+        ).limit(1)
+    ).first() is not None
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_hierarchy_changes(session: Session, flush_context, instances) -> None:
+    added = [obj for obj in session.new if isinstance(obj, TaskHierarchyDB)]
+    removed = [
+        (obj.parent_id, obj.child_id) for obj in session.deleted if isinstance(obj, TaskHierarchyDB)
+    ]
+    if added or removed:
+        session.info[_PENDING_KEY] = (added, removed)
+
+
+@event.listens_for(Session, "after_flush")
+def _update_task_closure(session: Session, flush_context) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending is None:
+        return
+    added, removed = pending
+    connection = session.connection()
+    for parent_id, child_id in removed:
+        remove_edge(connection, parent_id, child_id)
+    for edge in added:
+        add_edge(connection, edge.parent_id, edge.child_id)
+
+
+def rebuild_task_closure(session: Session) -> int:
+    """Пересобрать closure по task_hierarchy; возвращает число строк.
+
+    Пути не перечисляются по одному (в DAG с общими потомками их экспоненциально
+    много), а считаются по уровням: frontier — число путей длины depth для каждой
+    пары (предок, задача), следующий уровень — продление каждой пары на одно ребро.
+    Работа пропорциональна числу строк closure, рекурсии нет.
+    """
+    connection = session.connection()
+    table = TaskClosureDB.__table__
+    children: Dict[int, List[int]] = {}
+    for parent_id, child_id in connection.execute(select(TaskHierarchyDB.parent_id, TaskHierarchyDB.child_id)):
+        children.setdefault(parent_id, []).append(child_id)
+    # В DAG путь не длиннее числа задач со связями; дальше — только цикл
+    max_depth = len(children.keys() | {child_id for ids in children.values() for child_id in ids})
+
+    rows = []
+    frontier = Counter({(parent_id, parent_id): 1 for parent_id in children})
+    depth = 0
+    while frontier:
+        depth += 1
+        if depth > max_depth:
+            raise ValueError("task_hierarchy contains a cycle")
+        next_frontier: Counter = Counter()
+        for (ancestor_id, task_id), count in frontier.items():
+            for child_id in children.get(task_id, ()):
+                next_frontier[(ancestor_id, child_id)] += count
+        rows += [
+            {"ancestor_id": a, "descendant_id": d, "depth": depth, "path_count": count}
+            for (a, d), count in sorted(next_frontier.items())
+        ]
+        frontier = next_frontier
+
+    connection.execute(table.delete())
+    if rows:
+        connection.execute(table.insert(), rows)
+    return len(rows)
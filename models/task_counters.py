@@ -0,0 +1,232 @@
+"""Счётчики задач по статусам, поддерживаемые инкрементально.
+
+/stats/overview читает готовые числа по первичному ключу вместо GROUP BY по всей
+таблице tasks. Счётчики меняются в той же транзакции, что и сами задачи:
+
+* изменения через ORM (новые/удалённые задачи, смена status или creator_id,
+  добавление и удаление назначений) ловятся событиями before_flush/after_flush;
+* массовые UPDATE/DELETE в обход unit of work нужно оборачивать
+  в track_task_counters().
+
+Если счётчики всё же разошлись с данными (ручные правки в БД, каскады ON DELETE
+на стороне СУБД), их чинит reconcile_task_counters() — см. reconcile_counters.py.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, FrozenSet, Iterable, Iterator, Tuple
+
+from sqlalchemy import Column, Enum, Integer, String, event, func, inspect, select, text, union
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database import Base
+from models.task import TaskDB, TaskAssignmentDB, TaskStatus
+
+SCOPE_ALL = "all"    # по всем задачам, user_id = 0
+SCOPE_USER = "user"  # задачи, где пользователь создатель или исполнитель (каждая задача — один раз)
+
+_PENDING_KEY = "task_counters_pending"
+
+TaskState = Tuple[TaskStatus, FrozenSet[int]]
+
+
+class TaskCounterDB(Base):
+    __tablename__ = "task_counters"
+
+    scope = Column(String(16), primary_key=True)
+    # Без внешнего ключа: 0 для scope="all", а строки удалённых пользователей просто обнуляются
+    user_id = Column(Integer, primary_key=True)
+    status = Column(Enum(TaskStatus), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TaskCounter(scope='{self.scope}', user_id={self.user_id}, status='{self.status}', count={self.count})>"
+
+
+def _snapshot(connection: Connection, task_ids: Iterable[int]) -> Dict[int, TaskState]:
+    """Статус и участники (создатель + исполнители) каждой из задач"""
+    task_ids = sorted(task_ids)
+    if not task_ids:
+        return {}
+    rows = connection.execute(
+        select(TaskDB.id, TaskDB.status, TaskDB.creator_id, TaskAssignmentDB.user_id)
+        .outerjoin(TaskAssignmentDB, TaskAssignmentDB.task_id == TaskDB.id)
+        .where(TaskDB.id.in_(task_ids))
+    ).all()
+    states: Dict[int, Tuple[TaskStatus, set]] = {}
+    for task_id, status, creator_id, assignee_id in rows:
+        _, users = states.setdefault(task_id, (status, {creator_id}))
+        if assignee_id is not None:
+            users.add(assignee_id)
+    return {task_id: (status, frozenset(users)) for task_id, (status, users) in states.items()}
+
+
+def _counts(states: Dict[int, TaskState]) -> Counter:
+    counts = Counter()
+    for status, users in states.values():
+        counts[(SCOPE_ALL, 0, status)] += 1
+        for user_id in users:
+            counts[(SCOPE_USER, user_id, status)] += 1
+    return counts
+
+
+def _apply(connection: Connection, before: Dict[int, TaskState], after: Dict[int, TaskState]) -> None:
+    """Прибавить к счётчикам разницу между двумя снимками"""
+    deltas = _counts(after)
+    deltas.subtract(_counts(before))
+    # Один порядок блокировок строк во всех транзакциях — без взаимных блокировок
+    keys = sorted((key for key, delta in deltas.items() if delta), key=lambda key: (key[0], key[1], key[2].name))
+    rows = [
+        {"scope": scope, "user_id": user_id, "status": status, "count": deltas[(scope, user_id, status)]}
+        for scope, user_id, status in keys
+    ]
+    if not rows:
+        return
+
+    table = TaskCounterDB.__table__
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.scope, table.c.user_id, table.c.status],
+            set_={"count": table.c.count + statement.excluded["count"]}
+        )
+        connection.execute(statement, rows)
+        return
+
+    for row in rows:
+        updated = connection.execute(
+            table.update()
+            .where(table.c.scope == row["scope"], table.c.user_id == row["user_id"], table.c.status == row["status"])
+            .values(count=table.c.count + row["count"])
+        )
+        if not updated.rowcount:
+            connection.execute(table.insert().values(**row))
+
+
+@contextmanager
+def track_task_counters(session: Session, task_ids: Iterable[int]) -> Iterator[None]:
+    """Обновить счётчики вокруг массовой операции над задачами task_ids.
+
+    Нужен для query.update()/delete() и Core-запросов: они идут мимо unit of work,
+    и события flush их не видят.
+    """
+    # Отложенные ORM-изменения считаются своим flush, а не этим снимком
+    session.flush()
+    connection = session.connection()
+    task_ids = set(task_ids)
+    before = _snapshot(connection, task_ids)
+    yield
+    _apply(connection, before, _snapshot(connection, task_ids))
+
+
+def _changed(obj, *attributes: str) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_task_changes(session: Session, flush_context, instances) -> None:
+    known_ids = set()
+    new_objects = []
+    for obj in session.new:
+        if isinstance(obj, TaskDB):
+            new_objects.append(obj)
+        elif isinstance(obj, TaskAssignmentDB):
+            if obj.task_id is not None:
+                known_ids.add(obj.task_id)
+            else:
+                new_objects.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, TaskDB) and _changed(obj, "status", "creator_id"):
+            known_ids.add(obj.id)
+        elif isinstance(obj, TaskAssignmentDB) and _changed(obj, "task_id", "user_id"):
+            known_ids.update(i for i in inspect(obj).attrs.task_id.history.deleted if i is not None)
+            known_ids.add(obj.task_id)
+    for obj in session.deleted:
+        if isinstance(obj, TaskDB):
+            known_ids.add(obj.id)
+        elif isinstance(obj, TaskAssignmentDB):
+            known_ids.add(obj.task_id)
+
+    known_ids.discard(None)
+    if not known_ids and not new_objects:
+        return
+    before = _snapshot(session.connection(), known_ids)
+    session.info[_PENDING_KEY] = (known_ids, new_objects, before)
+
+
+@event.listens_for(Session, "after_flush")
+def _update_task_counters(session: Session, flush_context) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending is None:
+        return
+    known_ids, new_objects, before = pending
+    task_ids = set(known_ids)
+    for obj in new_objects:
+        task_ids.add(obj.id if isinstance(obj, TaskDB) else obj.task_id)
+    task_ids.discard(None)
+    connection = session.connection()
+    _apply(connection, before, _snapshot(connection, task_ids))
+
+
+def _true_counts(connection: Connection) -> Counter:
+    """Счётчики, посчитанные заново по tasks и task_assignments"""
+    counts = Counter()
+    for status, count in connection.execute(
+        select(TaskDB.status, func.count()).group_by(TaskDB.status)
+    ):
+        counts[(SCOPE_ALL, 0, status)] = count
+
+    # UNION убирает дубли: создатель, назначенный на свою задачу, считается один раз
+    involved = union(
+        select(TaskDB.creator_id.label("user_id"), TaskDB.id.label("task_id")),
+        select(TaskAssignmentDB.user_id, TaskAssignmentDB.task_id)
+    ).subquery()
+    for user_id, status, count in connection.execute(
+        select(involved.c.user_id, TaskDB.status, func.count())
+        .join(TaskDB, TaskDB.id == involved.c.task_id)
+        .group_by(involved.c.user_id, TaskDB.status)
+    ):
+        counts[(SCOPE_USER, user_id, status)] = count
+    return counts
+
+
+def reconcile_task_counters(session: Session) -> int:
+    """Пересчитать счётчики с нуля и исправить расхождения; возвращает число исправленных строк.
+
+    В PostgreSQL таблица счётчиков блокируется от записи на время пересчёта:
+    транзакции, успевшие изменить задачи, дождутся конца сверки и применят свои
+    дельты уже поверх исправленных значений.
+    """
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("LOCK TABLE task_counters IN SHARE ROW EXCLUSIVE MODE"))
+
+    expected = _true_counts(connection)
+    table = TaskCounterDB.__table__
+    actual = {
+        (scope, user_id, status): count
+        for scope, user_id, status, count in connection.execute(
+            select(table.c.scope, table.c.user_id, table.c.status, table.c.count)
+        )
+    }
+
+    fixed = 0
+    for key in set(actual) | set(expected):
+        if actual.get(key) == expected.get(key):
+            continue
+        scope, user_id, status = key
+        where = (table.c.scope == scope, table.c.user_id == user_id, table.c.status == status)
+        if not expected.get(key):
+            connection.execute(table.delete().where(*where))
+            if not actual.get(key):
+                continue
+        elif key in actual:
+            connection.execute(table.update().where(*where).values(count=expected[key]))
+        else:
+            connection.execute(table.insert().values(scope=scope, user_id=user_id, status=status, count=expected[key]))
+        fixed += 1
+    return fixed
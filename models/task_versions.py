@@ -0,0 +1,69 @@
+"""version задачи как валидатор её представления (ETag в v2).
+
+Ответ по задаче включает не только её колонки, но и исполнителей и вложенные
+объекты пользователей:
+
+* назначения, добавленные или удалённые через ORM, увеличивают version
+  (событие before_flush); массовые изменения назначений в обход unit of work
+  вызывают touch_tasks(). Вместе с version сдвигается и updated_at —
+  Last-Modified не отстаёт от ETag;
+* правка профиля пользователя задач не трогает: её отражает users.updated_at,
+  который ETag задачи берёт при построении ответа (crud.task.TaskValidators).
+  Переименование не переписывает все задачи пользователя.
+
+Изменённые в том же flush задачи пропускаются — их version увеличит сам ORM.
+"""
+import datetime
+from typing import Iterable
+
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from models.task import TaskDB, TaskAssignmentDB
+
+
+def touch_tasks(session: Session, task_ids: Iterable[int], **values) -> None:
+    """Увеличить version и updated_at задач одним UPDATE (values — другие колонки или своё updated_at).
+
+    Загруженные в сессию копии этих задач истекают по version, иначе в них
+    осталось бы старое значение.
+    """
+    task_ids = sorted(set(task_ids))
+    if not task_ids:
+        return
+    values.setdefault("updated_at", datetime.datetime.utcnow())
+    session.execute(
+        update(TaskDB).where(TaskDB.id.in_(task_ids)).values(version=TaskDB.version + 1, **values),
+        execution_options={"synchronize_session": False}
+    )
+    for task_id in task_ids:
+        task = session.identity_map.get(session.identity_key(TaskDB, task_id))
+        if task is not None:
+            session.expire(task, ["version", *values])
+
+
+def _assignment_task_id(assignment: TaskAssignmentDB):
+    # Назначение, добавленное в коллекцию задачи, получает task_id только при flush
+    if assignment.task_id is not None:
+        return assignment.task_id
+    return assignment.task.id if assignment.task is not None else None
+
+
+@event.listens_for(Session, "before_flush")
+def _touch_tasks_with_changed_assignments(session: Session, flush_context, instances) -> None:
+    task_ids = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, TaskAssignmentDB):
+            task_ids.add(_assignment_task_id(obj))
+    task_ids.discard(None)
+    if not task_ids:
+        return
+
+    # Новые и удаляемые задачи не нуждаются в version, изменённые ORM обновит сам
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, TaskDB):
+            task_ids.discard(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, TaskDB) and session.is_modified(obj, include_collections=False):
+            task_ids.discard(obj.id)
+    touch_tasks(session, task_ids)
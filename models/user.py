@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, String, DateTime, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Index
 from sqlalchemy.orm import relationship
 import datetime
 from database import Base
@@ -13,12 +13,18 @@ class UserRole(enum.Enum):
 
 class UserDB(Base):
     __tablename__ = "users"
+    # max(updated_at) — часть валидатора списков задач (crud.task.get_task_list_validators)
+    __table_args__ = (
+        Index("ix_users_updated_at", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True)
     username = Column(String(50), unique=True, nullable=False)
     full_name = Column(String(200))
     role = Column(Enum(UserRole), default=UserRole.USER, nullable=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # Меняется с каждым UPDATE строки; входит в ETag задач, где пользователь создатель или исполнитель
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     created_tasks = relationship("TaskDB", back_populates="creator", cascade="all, delete-orphan")
     assigned_tasks = relationship("TaskAssignmentDB", back_populates="user", cascade="all, delete-orphan")
 
@@ -0,0 +1,11 @@
+from .pool import PoolTelemetry, instrumented_pool, pool_status
+from .metrics import REGISTRY, Counter, Histogram
+from .sql import RequestSQLStats, current_stats, track_sql
+from .query_budget import QueryBudgetExceeded, query_budget, raise_on_lazy_load
+
+__all__ = [
+    "PoolTelemetry", "instrumented_pool", "pool_status",
+    "REGISTRY", "Counter", "Histogram",
+    "RequestSQLStats", "current_stats", "track_sql",
+    "QueryBudgetExceeded", "query_budget", "raise_on_lazy_load",
+]
@@ -0,0 +1,101 @@
+"""ASGI-middleware с RED-метриками по шаблону маршрута и SQL-статистикой запроса"""
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
+
+from monitoring import sql as sql_stats
+from monitoring.metrics import REGISTRY, QUERY_COUNT_BUCKETS, ROWS_BUCKETS
+from monitoring.pool import collect_pool_metrics
+from monitoring.query_budget import budget_for, check_budget
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+REQUEST_DB_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries", "SQL statements executed per request", ("route",), QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_TIME = REGISTRY.histogram(
+    "http_request_db_duration_seconds", "Time spent in SQL per request", ("route",)
+)
+REQUEST_DB_ROWS = REGISTRY.histogram(
+    "http_request_db_rows", "Rows returned or affected per request", ("route",), ROWS_BUCKETS
+)
+OPERATION_DB_QUERIES = REGISTRY.counter(
+    "db_queries_total", "SQL statements by route and crud operation", ("route", "operation")
+)
+OPERATION_DB_TIME = REGISTRY.counter(
+    "db_query_duration_seconds_total", "Time spent in SQL by route and crud operation", ("route", "operation")
+)
+QUERY_BUDGET_EXCEEDED = REGISTRY.counter(
+    "http_request_query_budget_exceeded_total", "Requests that ran more SQL than the route budget", ("route",)
+)
+REGISTRY.register_collector(collect_pool_metrics)
+
+
+def resolve_route(scope):
+    """Маршрут, обработавший запрос (или None, если ни один не подошёл)"""
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route
+    app = scope.get("app")
+    for candidate in getattr(getattr(app, "router", None), "routes", []):
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return candidate
+    return None
+
+
+def route_template(scope) -> str:
+    """Шаблон пути (/v2/tasks/{task_id}), а не конкретный URL — чтобы не плодить метки"""
+    route = resolve_route(scope)
+    return route.path if route is not None else UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = sql_stats.RequestSQLStats()
+        token = sql_stats.activate(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                route = resolve_route(scope)
+                if route is not None and not check_budget(route.path, budget_for(route), stats):
+                    QUERY_BUDGET_EXCEEDED.inc(route=route.path)
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={stats.duration * 1000:.1f};desc="{stats.queries} queries"'
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            sql_stats.deactivate(token)
+            route = route_template(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status_code))
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=method, route=route)
+            REQUEST_DB_QUERIES.observe(stats.queries, route=route)
+            REQUEST_DB_TIME.observe(stats.duration, route=route)
+            REQUEST_DB_ROWS.observe(stats.rows, route=route)
+            for operation, (count, duration) in stats.operations.items():
+                OPERATION_DB_QUERIES.inc(count, route=route, operation=operation)
+                OPERATION_DB_TIME.inc(duration, route=route, operation=operation)
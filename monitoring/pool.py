@@ -0,0 +1,126 @@
+"""Телеметрия пула соединений SQLAlchemy.
+
+Пул подменяется наследником, который замеряет время ожидания соединения
+в _do_get и считает таймауты; текущая загрузка берётся из самого пула.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import exc
+from sqlalchemy.pool import Pool
+
+# Границы корзин гистограммы ожидания соединения, в секундах
+WAIT_BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: Dict[str, "PoolTelemetry"] = {}
+
+
+class PoolTelemetry:
+    """Счётчики одного пула: выдачи соединений, таймауты и гистограмма ожидания"""
+
+    def __init__(self, name: str, buckets: Tuple[float, ...] = WAIT_BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self.pool: Optional[Pool] = None
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_bucket_counts = [0] * len(buckets)
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_count += 1
+            self.wait_sum += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self.wait_bucket_counts[i] += 1
+
+    def snapshot(self) -> dict:
+        """Текущее состояние пула и накопленные счётчики"""
+        pool = self.pool
+        with self._lock:
+            data = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds": {
+                    "count": self.wait_count,
+                    "sum": round(self.wait_sum, 6),
+                    "buckets": {str(bound): count for bound, count in zip(self.buckets, self.wait_bucket_counts)},
+                },
+            }
+        if pool is not None and hasattr(pool, "checkedout"):
+            data.update({
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            })
+        return data
+
+
+def instrumented_pool(pool_class: Type[Pool], telemetry: PoolTelemetry) -> Type[Pool]:
+    """Класс пула, пишущий ожидание соединений в telemetry (для create_engine(poolclass=...))"""
+
+    class InstrumentedPool(pool_class):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            telemetry.pool = self
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                telemetry.record_wait(time.perf_counter() - started, timed_out=True)
+                raise
+            telemetry.record_wait(time.perf_counter() - started)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    _registry[telemetry.name] = telemetry
+    return InstrumentedPool
+
+
+def pool_status() -> Dict[str, dict]:
+    """Снимки всех зарегистрированных пулов по имени"""
+    return {name: telemetry.snapshot() for name, telemetry in _registry.items()}
+
+
+def collect_pool_metrics() -> List[str]:
+    """Состояние пулов в текстовом формате Prometheus (коллектор для /metrics)"""
+    snapshots = pool_status()
+    lines: List[str] = []
+    gauges = (
+        ("db_pool_size", "size", "Configured pool size"),
+        ("db_pool_checked_out", "checked_out", "Connections currently checked out"),
+        ("db_pool_checked_in", "checked_in", "Idle connections in the pool"),
+        ("db_pool_overflow", "overflow", "Connections opened above pool_size"),
+    )
+    for metric, key, help_text in gauges:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        lines += [f'{metric}{{pool="{name}"}} {data[key]}' for name, data in snapshots.items() if key in data]
+    for metric, key, help_text in (
+        ("db_pool_checkouts_total", "checkouts", "Connections handed out by the pool"),
+        ("db_pool_timeouts_total", "timeouts", "Checkouts that hit pool_timeout"),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        lines += [f'{metric}{{pool="{name}"}} {data[key]}' for name, data in snapshots.items()]
+    lines += [
+        "# HELP db_pool_wait_seconds Time spent waiting for a pooled connection",
+        "# TYPE db_pool_wait_seconds histogram",
+    ]
+    for name, data in snapshots.items():
+        wait = data["wait_seconds"]
+        for bound, count in wait["buckets"].items():
+            lines.append(f'db_pool_wait_seconds_bucket{{pool="{name}",le="{bound}"}} {count}')
+        lines.append(f'db_pool_wait_seconds_bucket{{pool="{name}",le="+Inf"}} {wait["count"]}')
+        lines.append(f'db_pool_wait_seconds_count{{pool="{name}"}} {wait["count"]}')
+        lines.append(f'db_pool_wait_seconds_sum{{pool="{name}"}} {wait["sum"]}')
+    return lines
@@ -0,0 +1,91 @@
+"""Бюджет SQL-запросов на эндпоинт (детектор N+1) и режим raise-on-lazy-load.
+
+Бюджет объявляется декоратором @query_budget(n) на обработчике. Проверку
+делает MetricsMiddleware перед отправкой ответа; поведение задаёт
+SQL_QUERY_BUDGET_MODE: off, log (по умолчанию — предупреждение в лог и
+метрика) или raise (для тестов — запрос падает с QueryBudgetExceeded).
+"""
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, raiseload
+
+from monitoring.sql import RequestSQLStats
+
+logger = logging.getLogger(__name__)
+
+MODE_OFF = "off"
+MODE_LOG = "log"
+MODE_RAISE = "raise"
+
+QUERY_BUDGET_MODE = os.getenv("SQL_QUERY_BUDGET_MODE", MODE_LOG).lower()
+# Бюджет для эндпоинтов без декоратора; 0 — не проверять
+DEFAULT_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET_DEFAULT", "0"))
+
+_raise_on_lazy_load: ContextVar[bool] = ContextVar(
+    "raise_on_lazy_load", default=os.getenv("SQL_RAISE_ON_LAZY_LOAD", "false").lower() == "true"
+)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Эндпоинт выполнил больше SQL-запросов, чем ему разрешено"""
+
+
+def query_budget(max_queries: int) -> Callable:
+    """Объявить максимальное число SQL-запросов для обработчика"""
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorator
+
+
+def budget_for(route) -> Optional[int]:
+    endpoint = getattr(route, "endpoint", None)
+    budget = getattr(endpoint, "query_budget", None)
+    if budget is None and DEFAULT_QUERY_BUDGET > 0:
+        budget = DEFAULT_QUERY_BUDGET
+    return budget
+
+
+def check_budget(route_path: str, budget: Optional[int], stats: RequestSQLStats,
+                 mode: Optional[str] = None) -> bool:
+    """Проверить статистику запроса; False — бюджет превышен"""
+    mode = mode or QUERY_BUDGET_MODE
+    if budget is None or mode == MODE_OFF or stats.queries <= budget:
+        return True
+    breakdown = ", ".join(
+        f"{operation}={int(count)}"
+        for operation, (count, _) in sorted(stats.operations.items(), key=lambda item: -item[1][0])
+    )
+    message = f"{route_path} executed {stats.queries} SQL queries, budget is {budget} ({breakdown})"
+    if mode == MODE_RAISE:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+    return False
+
+
+@contextmanager
+def raise_on_lazy_load(enabled: bool = True):
+    """Внутри блока ленивая загрузка связей TaskDB/UserDB вызывает исключение"""
+    token = _raise_on_lazy_load.set(enabled)
+    try:
+        yield
+    finally:
+        _raise_on_lazy_load.reset(token)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _apply_raiseload(orm_execute_state):
+    if not _raise_on_lazy_load.get():
+        return
+    if not orm_execute_state.is_select or orm_execute_state.is_relationship_load:
+        return
+    from models.task import TaskDB
+    from models.user import UserDB
+    mapped = {mapper.class_ for mapper in orm_execute_state.all_mappers}
+    if mapped & {TaskDB, UserDB}:
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload("*", sql_only=True))
@@ -0,0 +1,87 @@
+"""Учёт SQL-запросов в рамках одного HTTP-запроса.
+
+Слушатели before/after_cursor_execute висят на классе Engine, поэтому
+покрывают все движки (primary, реплику, async через sync_engine). Итоги
+копятся в объекте RequestSQLStats из contextvar, который ставит
+MetricsMiddleware.
+"""
+import functools
+import time
+from contextvars import ContextVar, Token
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+UNTRACKED_OPERATION = "other"
+
+
+class RequestSQLStats:
+    """Количество запросов, время в БД и число строк за один запрос"""
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+        self.rows = 0
+        # операция crud -> [число запросов, время]
+        self.operations: Dict[str, List[float]] = {}
+
+    def record(self, operation: str, duration: float, rows: int) -> None:
+        self.queries += 1
+        self.duration += duration
+        if rows > 0:
+            self.rows += rows
+        totals = self.operations.setdefault(operation, [0, 0.0])
+        totals[0] += 1
+        totals[1] += duration
+
+
+_current_stats: ContextVar[Optional[RequestSQLStats]] = ContextVar("request_sql_stats", default=None)
+_current_operation: ContextVar[str] = ContextVar("sql_operation", default=UNTRACKED_OPERATION)
+
+
+def activate(stats: RequestSQLStats) -> Token:
+    return _current_stats.set(stats)
+
+
+def deactivate(token: Token) -> None:
+    _current_stats.reset(token)
+
+
+def current_stats() -> Optional[RequestSQLStats]:
+    return _current_stats.get()
+
+
+def track_sql(func: Callable) -> Callable:
+    """Относить SQL, выполненный внутри функции, к операции с её именем"""
+    operation = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current_operation.set(operation)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_operation.reset(token)
+
+    return wrapper
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_time"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(_current_operation.get(), time.perf_counter() - started, cursor.rowcount)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start_time"):
+        connection.info["query_start_time"].pop()
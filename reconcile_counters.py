@@ -0,0 +1,39 @@
+import argparse
+import logging
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import SessionLocal
+from models.task_counters import reconcile_task_counters
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сверка счётчиков task_counters с таблицей tasks')
+    parser.add_argument('--dry-run', action='store_true', help='Только показать число расхождений, не исправляя')
+
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        fixed = reconcile_task_counters(db)
+        if args.dry_run:
+            db.rollback()
+            logger.info(f"Расходящихся счётчиков: {fixed}")
+        else:
+            db.commit()
+            logger.info(f"Исправлено счётчиков: {fixed}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ошибка сверки счётчиков: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import Any, Optional, List, Generic, TypeVar
 from datetime import datetime
+import enum
 
 T = TypeVar('T')
 
@@ -47,6 +48,13 @@ class PaginatedResponse(BaseModel, Generic[T]):
         from_attributes = True
 
 
+class TotalMode(str, enum.Enum):
+    """Как считать pagination.total в списках"""
+    OFF = "false"          # не считать; has_next по лишней строке (limit + 1)
+    EXACT = "exact"        # count(*) OVER () в том же запросе, что и страница
+    ESTIMATE = "estimate"  # оценка планировщика PostgreSQL, для больших выборок
+
+
 class PaginationParams(BaseModel):
     """Параметры пагинации для запросов"""
     page: int = Field(1, ge=1, description="Номер страницы")
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, validator, Field
 from datetime import datetime
 from typing import List, Optional
+import enum
 from models.task import TaskStatus
 from schemas.user import UserResponse
 
@@ -26,15 +27,44 @@ class TaskUpdate(BaseModel):
     status: Optional[TaskStatus] = None
     assigned_user_ids: Optional[List[int]] = None
 
+# Предел одного запроса POST /v2/tasks/bulk
+BULK_CREATE_MAX_TASKS = 5000
+
+
+class BulkTaskItem(TaskCreate):
+    ref: Optional[str] = Field(None, max_length=64, description="Ключ элемента внутри запроса, на него ссылается parent_ref")
+    parent_ref: Optional[str] = Field(None, max_length=64, description="ref родителя из этого же запроса")
+    parent_id: Optional[int] = Field(None, description="ID уже существующей родительской задачи")
+
+
+class BulkTaskCreate(BaseModel):
+    tasks: List[BulkTaskItem] = Field(..., min_length=1, max_length=BULK_CREATE_MAX_TASKS)
+
+
+class AssignmentMode(str, enum.Enum):
+    """Как список пользователей применяется к назначениям задачи"""
+    REPLACE = "replace"  # ровно эти пользователи
+    ADD = "add"          # добавить к текущим
+    REMOVE = "remove"    # снять с задачи
+
+
 class TaskStatusUpdate(BaseModel):
     status: TaskStatus
 
+class TaskStatusBulkUpdate(BaseModel):
+    task_ids: List[int] = Field(..., min_length=1, max_length=1000)
+    status: TaskStatus
+    expected_status: Optional[TaskStatus] = Field(
+        None, description="Менять только задачи, которые сейчас в этом статусе"
+    )
+
 class TaskResponse(TaskBase):
     id: int
     status: TaskStatus
     creator_id: int
     created_at: datetime
     updated_at: datetime
+    version: int = 1
     creator: Optional[UserResponse] = None
     assigned_users: List[UserResponse] = []
 
@@ -42,4 +72,20 @@ class TaskResponse(TaskBase):
         from_attributes = True
 
 class Task(TaskResponse):
-    pass
\ No newline at end of file
+    pass
+
+class TaskSearchResult(BaseModel):
+    task: TaskResponse
+    rank: float
+    snippet: str = Field(..., description="Фрагмент текста, найденные слова обёрнуты в <mark>")
+
+class TaskTreeDirection(str, enum.Enum):
+    """В какую сторону раскрывать дерево задачи"""
+    DESCENDANTS = "descendants"  # подзадачи
+    ANCESTORS = "ancestors"      # родительские задачи
+
+
+class TaskTreeFormat(str, enum.Enum):
+    """Форма ответа /tree"""
+    NESTED = "nested"  # узлы с вложенными списками, общий потомок повторяется под каждым родителем
+    FLAT = "flat"      # список узлов и список рёбер
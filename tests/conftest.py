@@ -1,21 +1,28 @@
 import pytest
 import os
 import sys
+from contextlib import contextmanager
 from typing import Generator
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.pool import StaticPool
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 os.environ["TESTING"] = "1"
+# В тестах превышение @query_budget роняет запрос, а не только пишет в лог
+os.environ.setdefault("SQL_QUERY_BUDGET_MODE", "raise")
+# Общий кэш ответов включён, чтобы тесты ловили пропущенные инвалидации
+os.environ.setdefault("CACHE_BACKEND", "memory")
 
 from main import app
-from database import get_db
+from database import get_db, get_async_db
 from crud import create_user
 from models.user import UserRole
 from schemas import UserCreate
 from api.endpoints.v2.tasks import get_current_user
+from cache import get_cache
 
 
 @pytest.fixture(scope="session")
@@ -65,15 +72,60 @@ def db_session(engine, create_tables) -> Generator[Session, None, None]:
         connection.close()
 
 
+@pytest.fixture
+def async_db_session(db_session) -> AsyncSession:
+    """AsyncSession поверх той же тестовой транзакции, что и db_session"""
+    return AsyncSession(sync_session_class=lambda **kw: db_session)
+
+
 @pytest.fixture(autouse=True)
-def override_db(db_session):
-    """Подменяет get_db — нужно для ВСЕХ тестов"""
+def override_db(db_session, async_db_session):
+    """Подменяет get_db и get_async_db — нужно для ВСЕХ тестов"""
     def _get_test_db():
         yield db_session
 
+    async def _get_test_async_db():
+        yield async_db_session
+
     app.dependency_overrides[get_db] = _get_test_db
+    app.dependency_overrides[get_async_db] = _get_test_async_db
     yield
     app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_async_db, None)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Данные каждого теста откатываются, id повторяются — кэш не должен их пережить"""
+    yield
+    cache = get_cache()
+    if cache is not None:
+        cache.clear()
+
+
+@pytest.fixture
+def assert_max_queries(engine):
+    """Контекстный менеджер: блок должен выполнить не больше limit SQL-запросов.
+
+    Считает всё, что идёт через тестовый движок, включая запросы из TestClient.
+    """
+    @contextmanager
+    def _assert_max_queries(limit: int):
+        statements = []
+
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "after_cursor_execute", _count)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "after_cursor_execute", _count)
+        assert len(statements) <= limit, (
+            f"Expected at most {limit} queries, got {len(statements)}:\n" + "\n".join(statements)
+        )
+
+    return _assert_max_queries
 
 
 @pytest.fixture
@@ -1,7 +1,7 @@
 # tests/integration/conftest.py
 import pytest
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, get_async_db
 from main import app
 from crud import create_user
 from models.user import UserRole
@@ -28,7 +28,7 @@ def sample_user(db_session: Session):
 #     app.dependency_overrides.pop(get_current_user, None)
 
 @pytest.fixture(autouse=True)
-def override_dependencies(sample_user, db_session):
+def override_dependencies(sample_user, db_session, async_db_session):
     """Подменяет get_current_user И get_db для интеграционных тестов"""
 
     # Подменяем get_db чтобы app использовал тестовую SQLite сессию
@@ -38,7 +38,11 @@ def override_dependencies(sample_user, db_session):
         finally:
             pass  # не закрываем — это делает фикстура db_session
 
+    async def override_get_async_db():
+        yield async_db_session
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     app.dependency_overrides[get_current_user] = lambda: sample_user.id
 
     yield
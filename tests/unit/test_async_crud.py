@@ -0,0 +1,117 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class TestAsyncCRUD:
+    """Тесты асинхронных обёрток crud/task_async.py и crud/user_async.py"""
+
+    @pytest.mark.asyncio
+    async def test_get_user_async(self, async_db_session: AsyncSession, db_session):
+        """get_user через AsyncSession видит данные синхронной сессии"""
+        import crud.user_async as user_crud_async
+        from crud.user import create_user
+        from schemas.user import UserCreate
+        from models.user import UserRole
+
+        user = create_user(db_session, UserCreate(
+            username="async_user",
+            full_name="Async User",
+            role=UserRole.USER
+        ))
+
+        result = await user_crud_async.get_user(async_db_session, user.id)
+        assert result is not None
+        assert result.username == "async_user"
+        assert await user_crud_async.get_user(async_db_session, 99999) is None
+        assert await user_crud_async.get_users_count(async_db_session) >= 1
+
+    @pytest.mark.asyncio
+    async def test_create_and_list_tasks_async(self, async_db_session: AsyncSession, db_session):
+        """Создание и получение задач через асинхронные функции"""
+        import crud.task_async as task_crud_async
+        from crud.user import create_user
+        from schemas.task import TaskCreate
+        from schemas.user import UserCreate
+        from models.user import UserRole
+
+        creator = create_user(db_session, UserCreate(
+            username="async_task_creator",
+            full_name="Async Task Creator",
+            role=UserRole.MANAGER
+        ))
+
+        created = await task_crud_async.create_task(async_db_session, TaskCreate(
+            title="Async Task",
+            description="Created via AsyncSession",
+            creator_id=creator.id,
+            assigned_user_ids=[creator.id]
+        ))
+        assert created["title"] == "Async Task"
+        assert created["assigned_user_ids"] == [creator.id]
+
+        task = await task_crud_async.get_task(async_db_session, created["id"])
+        assert task_crud_async.task_to_dict(task)["creator"]["username"] == "async_task_creator"
+
+        tasks = await task_crud_async.get_tasks(async_db_session, user_id=creator.id)
+        assert [t.id for t in tasks] == [created["id"]]
+        assert await task_crud_async.get_tasks_count(async_db_session, user_id=creator.id) == 1
+
+
+class TestUserLoader:
+    """Тесты загрузчика пользователей crud/user_loader.py"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_loads_share_one_query(self, async_db_session: AsyncSession, db_session,
+                                                    assert_max_queries):
+        """Параллельные load() — один IN-запрос, повторные — без запросов"""
+        import asyncio
+        import crud.user_async as user_crud_async
+        from crud.user import create_user
+        from schemas.user import UserCreate
+        from models.user import UserRole
+
+        users = [
+            create_user(db_session, UserCreate(username=f"loader_{i}", full_name=f"Loader {i}", role=UserRole.USER))
+            for i in range(3)
+        ]
+        ids = [user.id for user in users]
+
+        with assert_max_queries(1):
+            loaded = await asyncio.gather(
+                *(user_crud_async.load_user(async_db_session, user_id) for user_id in ids + [ids[0], 99999])
+            )
+            assert [user.username if user else None for user in loaded] == [
+                "loader_0", "loader_1", "loader_2", "loader_0", None
+            ]
+        with assert_max_queries(0):
+            assert await user_crud_async.load_user(async_db_session, ids[1]) is loaded[1]
+            assert await user_crud_async.load_users(async_db_session, [ids[2], 99999]) == [loaded[2], None]
+
+    def test_cache_reset_after_commit(self, db_session):
+        """Загрузчик (вместе с закэшированными промахами) не переживает commit"""
+        from crud.user import create_user
+        from crud.user_loader import user_loader
+        from schemas.user import UserCreate
+        from models.user import UserRole
+
+        loader = user_loader(db_session)
+        assert loader.get(db_session, 99999) is None
+        user = create_user(db_session, UserCreate(username="loader_late", full_name="Late", role=UserRole.USER))
+        assert user_loader(db_session) is not loader
+        assert user_loader(db_session).get(db_session, user.id) is user
+
+    def test_task_to_dict_shares_user_dicts(self, db_session):
+        """Создатель нескольких задач сериализуется один раз за запрос"""
+        from crud.task import create_task, get_tasks, task_to_dict
+        from crud.user import create_user
+        from schemas.task import TaskCreate
+        from schemas.user import UserCreate
+        from models.user import UserRole
+
+        creator = create_user(db_session, UserCreate(username="loader_creator", full_name="C", role=UserRole.MANAGER))
+        for i in range(2):
+            create_task(db_session, TaskCreate(title=f"Loader {i}", creator_id=creator.id))
+
+        first, second = [task_to_dict(task) for task in get_tasks(db_session, user_id=creator.id)]
+        assert first["creator"] is second["creator"]
+        assert first["creator"]["username"] == "loader_creator"
@@ -0,0 +1,454 @@
+import os
+
+import pytest
+from sqlalchemy.orm import Session
+
+
+def _fake_key(key):
+    return key.decode() if isinstance(key, bytes) else key
+
+
+class FakeRedis:
+    """Клиент Redis в памяти процесса: команды, которые использует RedisCache.
+
+    Ключи принимаются строками и байтами, значения и члены множеств
+    возвращаются байтами, как у redis-py; PX/PEXPIRE считаются по clock.
+    Каждая запись увеличивает версию ключа, по ней pipeline проверяет WATCH.
+    """
+
+    def __init__(self, clock=None):
+        import time
+
+        self._clock = clock or time.monotonic
+        self._data = {}
+        self._expires = {}
+        self._versions = {}
+
+    def _alive(self, key):
+        key = _fake_key(key)
+        expires = self._expires.get(key)
+        if expires is not None and expires <= self._clock():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+            self._touch(key)
+        return key in self._data
+
+    def _touch(self, key):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def version(self, key):
+        key = _fake_key(key)
+        self._alive(key)
+        return self._versions.get(key, 0)
+
+    def get(self, key):
+        key = _fake_key(key)
+        return self._data[key] if self._alive(key) else None
+
+    def set(self, key, value, px=None):
+        key = _fake_key(key)
+        self._data[key] = bytes(value)
+        self._expires.pop(key, None)
+        if px is not None:
+            self._expires[key] = self._clock() + px / 1000
+        self._touch(key)
+        return True
+
+    def delete(self, *keys):
+        deleted = 0
+        for key in map(_fake_key, keys):
+            if self._alive(key):
+                del self._data[key]
+                self._expires.pop(key, None)
+                self._touch(key)
+                deleted += 1
+        return deleted
+
+    def sadd(self, key, *members):
+        key, members = _fake_key(key), {_fake_key(member).encode() for member in members}
+        if not self._alive(key):
+            self._data[key] = set()
+        self._data[key].update(members)
+        self._touch(key)
+        return len(members)
+
+    def srem(self, key, *members):
+        key, members = _fake_key(key), {_fake_key(member).encode() for member in members}
+        if not self._alive(key):
+            return 0
+        removed = len(self._data[key] & members)
+        self._data[key] -= members
+        if not self._data[key]:
+            self.delete(key)
+        self._touch(key)
+        return removed
+
+    def smembers(self, key):
+        key = _fake_key(key)
+        return set(self._data[key]) if self._alive(key) else set()
+
+    def pexpire(self, key, ms):
+        key = _fake_key(key)
+        if not self._alive(key):
+            return False
+        self._expires[key] = self._clock() + ms / 1000
+        self._touch(key)
+        return True
+
+    def sunion(self, keys):
+        members = set()
+        for key in map(_fake_key, keys):
+            if self._alive(key):
+                members |= self._data[key]
+        return members
+
+    def scan_iter(self, match="*"):
+        import fnmatch
+
+        return iter([key for key in list(self._data) if self._alive(key) and fnmatch.fnmatchcase(key, match)])
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Pipeline как в redis-py: после watch() команды выполняются сразу,
+    после multi() (или без watch) — копятся до execute()"""
+
+    def __init__(self, client):
+        self._client = client
+        self._watched = {}
+        self._queue = []
+        self._immediate = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+    def __getattr__(self, name):
+        command = getattr(self._client, name)
+
+        def call(*args, **kwargs):
+            if self._immediate:
+                return command(*args, **kwargs)
+            self._queue.append((command, args, kwargs))
+            return self
+        return call
+
+    def watch(self, *keys):
+        self._watched.update((key, self._client.version(key)) for key in keys)
+        self._immediate = True
+
+    def multi(self):
+        self._immediate = False
+
+    def execute(self):
+        from cache.redis_backend import WatchError
+
+        try:
+            if any(self._client.version(key) != version for key, version in self._watched.items()):
+                raise WatchError("Watched variable changed.")
+            return [command(*args, **kwargs) for command, args, kwargs in self._queue]
+        finally:
+            self.reset()
+
+    def reset(self):
+        self._watched = {}
+        self._queue = []
+        self._immediate = False
+
+
+@pytest.fixture(params=["memory", "fake-redis", "redis"])
+def backend(request):
+    """Один и тот же контракт для MemoryCache и RedisCache.
+
+    RedisCache всегда проверяется с FakeRedis, а против локального сервера
+    с протоколом Redis (redis-server, KeyDB, Dragonfly) — если задан TEST_REDIS_URL.
+    """
+    from cache import MemoryCache, RedisCache
+
+    if request.param == "memory":
+        yield MemoryCache()
+        return
+    if request.param == "fake-redis":
+        yield RedisCache(FakeRedis())
+        return
+    url = os.getenv("TEST_REDIS_URL")
+    if not url:
+        pytest.skip("TEST_REDIS_URL is not set")
+    pytest.importorskip("redis")
+    cache = RedisCache.from_url(url, prefix="tasktracker-test:")
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+class TestCacheBackends:
+    """Тесты бэкендов общего кэша"""
+
+    def test_get_set_delete_and_tags(self, backend):
+        """Запись, чтение, удаление и сброс по тегам"""
+        assert backend.get("missing") is None
+
+        backend.set("a", b"1", 60, tags=["task:1"])
+        backend.set("b", b"2", 60, tags=["task:1", "user:7"])
+        backend.set("c", b"3", 60, tags=["task:2"])
+        assert backend.get("a") == b"1"
+
+        backend.delete("a", "missing")
+        assert backend.get("a") is None
+
+        backend.invalidate_tags("user:7", "task:unknown")
+        assert backend.get("b") is None
+        assert backend.get("c") == b"3"
+
+        # Перезапись заменяет и теги
+        backend.set("c", b"4", 60, tags=["task:3"])
+        backend.invalidate_tags("task:2")
+        assert backend.get("c") == b"4"
+
+        backend.clear()
+        assert backend.get("c") is None
+
+    def test_memory_lru_and_ttl(self):
+        """MemoryCache вытесняет давно не спрошенные ключи и забывает истёкшие"""
+        from cache import MemoryCache
+
+        now = [0.0]
+        cache = MemoryCache(max_size=2, clock=lambda: now[0])
+        cache.set("a", b"1", 10, tags=["t"])
+        cache.set("b", b"2", 5)
+        assert cache.get("a") == b"1"
+        cache.set("c", b"3", 10)
+        assert cache.get("b") is None
+        assert len(cache) == 2
+
+        now[0] = 10
+        assert cache.get("a") is None
+        assert cache.get("c") is None
+        assert len(cache) == 0
+        # Индекс тегов не держит удалённые ключи
+        cache.invalidate_tags("t")
+
+    def test_redis_failures_are_misses(self):
+        """Недоступный сервер не ломает запрос: промах, пропуск записи, счётчик ошибок"""
+        from cache import RedisCache
+        from cache.redis_backend import CACHE_ERRORS
+
+        class DownClient:
+            def __getattr__(self, name):
+                def fail(*args, **kwargs):
+                    raise ConnectionRefusedError("down")
+                return fail
+
+        cache = RedisCache(DownClient())
+        errors = CACHE_ERRORS.value(operation="get")
+        assert cache.get("a") is None
+        cache.set("a", b"1", 60, tags=["task:1"])
+        cache.invalidate_tags("task:1")
+        assert CACHE_ERRORS.value(operation="get") - errors == 1
+
+    def test_redis_invalidate_races_with_set(self):
+        """set() с тем же тегом между SUNION и EXEC не оставляет запись без сброса"""
+        from cache import RedisCache
+
+        class RacingRedis(FakeRedis):
+            racer = None
+
+            def sunion(self, keys):
+                members = super().sunion(keys)
+                if self.racer:
+                    racer, self.racer = self.racer, None
+                    racer()
+                return members
+
+        client = RacingRedis()
+        cache = RedisCache(client)
+        cache.set("a", b"1", 60, tags=["task:1"])
+        client.racer = lambda: cache.set("late", b"2", 60, tags=["task:1"])
+
+        cache.invalidate_tags("task:1")
+        assert cache.get("a") is None
+        assert cache.get("late") is None
+        assert list(client.scan_iter(match=f"{cache.prefix}*")) == []
+
+    def test_redis_ttl_bounded_by_tag(self):
+        """Запись живёт не дольше своего тега; истёкшие ключи не видны"""
+        from cache import RedisCache
+
+        now = [0.0]
+        client = FakeRedis(clock=lambda: now[0])
+        cache = RedisCache(client, tag_ttl=10)
+        cache.set("a", b"1", 60, tags=["task:1"])
+        now[0] = 9
+        assert cache.get("a") == b"1"
+        now[0] = 10
+        assert cache.get("a") is None
+        assert list(client.scan_iter()) == []
+
+    def test_cache_backend_is_abstract(self):
+        """CacheBackend нельзя создать без реализации всех операций"""
+        from cache.base import CacheBackend
+
+        with pytest.raises(TypeError):
+            CacheBackend()
+
+    def test_create_cache(self):
+        """CACHE_BACKEND выбирает бэкенд; неизвестное значение — ошибка"""
+        from cache import MemoryCache, create_cache
+
+        assert create_cache("none") is None
+        assert isinstance(create_cache("memory"), MemoryCache)
+        with pytest.raises(ValueError):
+            create_cache("memcached")
+
+
+class TestTaskCache:
+    """Payload задачи и иерархия из общего кэша; сброс по тегам при записи"""
+
+    def _setup(self, db_session: Session):
+        from crud.user import create_user
+        from crud.task import create_task
+        from models.user import UserRole
+        from schemas.task import TaskCreate
+        from schemas.user import UserCreate
+
+        owner = create_user(db_session, UserCreate(username="cache_owner", role=UserRole.MANAGER))
+        worker = create_user(db_session, UserCreate(username="cache_worker", role=UserRole.USER))
+        task_id = create_task(db_session, TaskCreate(
+            title="Cached", creator_id=owner.id, assigned_user_ids=[worker.id]
+        ))["id"]
+        return owner, worker, task_id
+
+    def test_task_payload_cached_and_invalidated(self, db_session: Session, assert_max_queries):
+        """Повторное чтение без запросов; правка задачи и пользователя сбрасывают запись"""
+        from crud.task import get_task_payload, get_task_version, update_task, update_task_status
+        from crud.user import update_user
+        from models.task import TaskStatus
+        from schemas.task import TaskUpdate
+        from schemas.user import UserUpdate
+
+        owner, worker, task_id = self._setup(db_session)
+        payload, validators = get_task_payload(db_session, task_id)
+        assert validators == get_task_version(db_session, task_id)
+        db_session.expunge_all()
+        with assert_max_queries(0):
+            cached = get_task_payload(db_session, task_id)
+        assert cached == (payload, validators)
+        assert cached[0]["created_at"] == payload["created_at"]
+
+        update_task(db_session, task_id, TaskUpdate(title="Renamed"), owner.id)
+        assert get_task_payload(db_session, task_id)[0]["title"] == "Renamed"
+
+        update_task_status(db_session, task_id, TaskStatus.IN_PROGRESS, owner.id)
+        payload, validators = get_task_payload(db_session, task_id)
+        assert payload["status"] == TaskStatus.IN_PROGRESS.value
+
+        update_user(db_session, worker.id, UserUpdate(full_name="Cached Worker"))
+        payload, renamed = get_task_payload(db_session, task_id)
+        assert payload["assigned_users"][0]["full_name"] == "Cached Worker"
+        assert renamed.users_updated_at > validators.users_updated_at
+        assert renamed == get_task_version(db_session, task_id)
+
+        assert get_task_payload(db_session, 10 ** 6) is None
+
+    def test_stale_replica_read_is_not_cached(self, tmp_path):
+        """Промах, прочитанный с отстающей реплики после записи, не попадает в кэш"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from cache import get_cache
+        from database import Base, RoutingSession
+        from crud.task import create_task, get_task_payload, update_task
+        from crud.task_cache import task_key
+        from crud.user import create_user
+        from models.user import UserRole
+        from schemas.task import TaskCreate, TaskUpdate
+        from schemas.user import UserCreate
+
+        primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+        replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+
+        class TestRoutingSession(RoutingSession):
+            replica_bind = replica
+
+        factory = sessionmaker(bind=primary, class_=TestRoutingSession)
+        for engine in (primary, replica):
+            Base.metadata.create_all(engine)
+            with sessionmaker(bind=engine)() as db:
+                owner = create_user(db, UserCreate(username="replica_owner", role=UserRole.MANAGER))
+                task_id = create_task(db, TaskCreate(title="Before", creator_id=owner.id))["id"]
+
+        # Запись на primary сбрасывает кэш; реплика её ещё не получила
+        with factory() as db:
+            update_task(db, task_id, TaskUpdate(title="After"), owner.id)
+
+        with factory() as db:
+            db.info["read_only"] = True
+            assert get_task_payload(db, task_id)[0]["title"] == "Before"
+        assert get_cache().get(task_key(task_id)) is None
+
+        # Автор записи, закреплённый за primary, видит свою правку
+        with factory() as db:
+            assert get_task_payload(db, task_id)[0]["title"] == "After"
+        with factory() as db:
+            db.info["read_only"] = True
+            assert get_task_payload(db, task_id)[0]["title"] == "After"
+
+        primary.dispose()
+        replica.dispose()
+
+    def test_hierarchy_invalidated_by_child(self, db_session: Session, assert_max_queries):
+        """Иерархия родителя сбрасывается новой связью и правкой дочерней задачи"""
+        from crud.task import create_task, create_task_hierarchy, get_task_hierarchy, update_task
+        from schemas.task import TaskCreate, TaskUpdate
+
+        owner, _, parent_id = self._setup(db_session)
+        child_id = create_task(db_session, TaskCreate(title="Child", creator_id=owner.id))["id"]
+        assert get_task_hierarchy(db_session, parent_id)["children"] == []
+
+        create_task_hierarchy(db_session, parent_id, child_id)
+        assert [child["id"] for child in get_task_hierarchy(db_session, parent_id)["children"]] == [child_id]
+        with assert_max_queries(0):
+            get_task_hierarchy(db_session, parent_id)
+
+        update_task(db_session, child_id, TaskUpdate(title="Child renamed"), owner.id)
+        assert get_task_hierarchy(db_session, parent_id)["children"][0]["title"] == "Child renamed"
+
+    @pytest.mark.asyncio
+    async def test_async_session_keeps_redis_off_event_loop(self, db_session: Session, async_db_session):
+        """Под AsyncSession команды Redis идут из пула потоков, а не с потока event loop"""
+        import threading
+        import crud.task_async as task_crud_async
+        from cache import RedisCache, get_cache, set_cache
+        from crud.task_cache import task_key
+        from schemas.task import TaskUpdate
+
+        owner, _, task_id = self._setup(db_session)
+        owner_id = owner.id
+        threads = []
+
+        class ThreadRecordingRedis(FakeRedis):
+            def get(self, key):
+                threads.append(threading.get_ident())
+                return super().get(key)
+
+            def pipeline(self, transaction=True):
+                threads.append(threading.get_ident())
+                return super().pipeline(transaction)
+
+        client = ThreadRecordingRedis()
+        cached_key = RedisCache(client)._key(task_key(task_id))
+        previous = get_cache()
+        set_cache(RedisCache(client))
+        try:
+            await task_crud_async.get_task_payload(async_db_session, task_id)
+            assert cached_key in client.scan_iter()
+            await task_crud_async.update_task(async_db_session, task_id, TaskUpdate(title="Async renamed"), owner_id)
+            assert cached_key not in client.scan_iter()
+        finally:
+            set_cache(previous)
+        # get и set при промахе, сброс тегов после commit
+        assert len(threads) >= 3
+        assert threading.get_ident() not in threads
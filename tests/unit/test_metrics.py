@@ -0,0 +1,35 @@
+class TestMetricsRegistry:
+    """Тесты реестра метрик и учёта SQL"""
+
+    def test_histogram_render(self):
+        """Гистограмма рендерится накопительными корзинами"""
+        from monitoring.metrics import Registry
+
+        registry = Registry()
+        latency = registry.histogram("test_latency_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+        latency.observe(0.05, route="/a")
+        latency.observe(0.5, route="/a")
+        latency.observe(5, route="/a")
+
+        body = registry.render()
+        assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 1' in body
+        assert 'test_latency_seconds_bucket{route="/a",le="1"} 2' in body
+        assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 3' in body
+        assert 'test_latency_seconds_count{route="/a"} 3' in body
+
+    def test_sql_stats_grouped_by_operation(self, db_session):
+        """Запросы внутри crud-функций учитываются под их именем"""
+        from monitoring import sql as sql_stats
+        from crud.user import get_user, get_users_count
+
+        stats = sql_stats.RequestSQLStats()
+        token = sql_stats.activate(stats)
+        try:
+            get_user(db_session, 1)
+            get_users_count(db_session)
+        finally:
+            sql_stats.deactivate(token)
+
+        assert stats.queries == 2
+        assert stats.operations["get_user"][0] == 1
+        assert stats.operations["get_users_count"][0] == 1
@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+
+
+def _upgrade(engine, revision: str = "head"):
+    from alembic import command
+    from alembic.config import Config
+    from database import ALEMBIC_INI_PATH
+
+    config = Config(ALEMBIC_INI_PATH)
+    # Транзакциями управляет сам Alembic: 0002 выходит из неё для CREATE INDEX CONCURRENTLY
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, revision)
+
+
+class TestMigrations:
+    """Тесты дерева миграций Alembic"""
+
+    def test_single_head(self):
+        """У дерева миграций ровно одна голова"""
+        from alembic.config import Config
+        from alembic.script import ScriptDirectory
+        from database import ALEMBIC_INI_PATH
+
+        script = ScriptDirectory.from_config(Config(ALEMBIC_INI_PATH))
+        assert len(script.get_heads()) == 1
+
+    def test_upgrade_matches_models(self, tmp_path):
+        """После upgrade head в БД те же таблицы и индексы, что описаны в моделях"""
+        from database import Base
+        import models  # noqa: F401
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+        _upgrade(engine)
+        inspector = inspect(engine)
+
+        assert set(inspector.get_table_names()) == set(Base.metadata.tables) | {"alembic_version"}
+        for table in Base.metadata.sorted_tables:
+            # Индексы с ddl_if(dialect="postgresql") в SQLite не создаются ни моделями, ни миграциями
+            expected = {
+                index.name for index in table.indexes
+                if index._ddl_if is None or index._ddl_if.dialect in (None, "sqlite")
+            }
+            actual = {index["name"] for index in inspector.get_indexes(table.name)}
+            assert actual == expected, table.name
+        engine.dispose()
+
+    def test_check_schema_revision(self, tmp_path):
+        """Старт падает на непрогнанных миграциях и проходит на head"""
+        from database import check_schema_revision, SchemaRevisionMismatch
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'revision.db'}")
+        with pytest.raises(SchemaRevisionMismatch):
+            check_schema_revision(engine)
+
+        _upgrade(engine, "0001_initial_schema")
+        with pytest.raises(SchemaRevisionMismatch):
+            check_schema_revision(engine)
+
+        _upgrade(engine)
+        assert check_schema_revision(engine) == "0008_user_updated_at_index"
+        engine.dispose()
@@ -0,0 +1,119 @@
+import datetime
+import pytest
+from sqlalchemy.orm import Session
+
+
+class TestCursorEncoding:
+    """Тесты упаковки ключа сортировки в курсор"""
+
+    def test_roundtrip(self):
+        """Курсор распаковывается в те же значения и типы"""
+        from crud.pagination import encode_cursor, decode_cursor
+
+        moment = datetime.datetime(2026, 10, 17, 12, 30, 15, 123456)
+        cursor = encode_cursor(moment, 42)
+
+        assert "=" not in cursor
+        assert decode_cursor(cursor, datetime.datetime, int) == (moment, 42)
+
+    @pytest.mark.parametrize("cursor", ["not base64!", "bm90IGpzb24", "WzFd", "WyJ4IiwgMV0"])
+    def test_invalid_cursor(self, cursor):
+        """Битый или чужой курсор — InvalidCursor"""
+        from crud.pagination import decode_cursor, InvalidCursor
+
+        with pytest.raises(InvalidCursor):
+            decode_cursor(cursor, datetime.datetime, int)
+
+    def test_user_cursor_is_not_a_task_cursor(self):
+        """Курсор списка пользователей не подходит для списка задач"""
+        from crud.pagination import encode_cursor, InvalidCursor
+        from crud.task import decode_task_cursor
+
+        with pytest.raises(InvalidCursor):
+            decode_task_cursor(encode_cursor("alice"))
+
+
+class TestKeysetPagination:
+    """Тесты выборки страниц по курсору"""
+
+    def test_get_tasks_after_cursor(self, db_session: Session):
+        """Страницы по курсору идут без пропусков и повторов при равных updated_at"""
+        from crud.task import get_tasks, task_cursor, decode_task_cursor
+        from crud.user import create_user
+        from schemas.user import UserCreate
+        from models.task import TaskDB, TaskStatus
+        from models.user import UserRole
+
+        creator = create_user(db_session, UserCreate(username="keyset_creator", role=UserRole.USER))
+        same_time = datetime.datetime(2026, 1, 1, 12, 0, 0)
+        for index in range(5):
+            db_session.add(TaskDB(
+                title=f"Keyset {index}",
+                creator_id=creator.id,
+                status=TaskStatus.OPEN,
+                updated_at=same_time if index < 3 else same_time + datetime.timedelta(minutes=index)
+            ))
+        db_session.commit()
+
+        seen = []
+        after = None
+        while True:
+            page = get_tasks(db_session, limit=2, after=after)
+            if not page:
+                break
+            seen.extend(task.id for task in page)
+            after = decode_task_cursor(task_cursor(page[-1]))
+
+        assert seen == [task.id for task in get_tasks(db_session, limit=100)]
+        assert len(seen) == len(set(seen)) == 5
+
+    def test_get_users_after_cursor(self, db_session: Session):
+        """Пользователи листаются по username"""
+        from crud.user import create_user, get_users, user_cursor, decode_user_cursor
+        from schemas.user import UserCreate
+        from models.user import UserRole
+
+        for username in ["carol", "alice", "bob"]:
+            create_user(db_session, UserCreate(username=username, role=UserRole.USER))
+
+        first = get_users(db_session, limit=2)
+        assert [user.username for user in first] == ["alice", "bob"]
+        rest = get_users(db_session, limit=2, after=decode_user_cursor(user_cursor(first[-1])))
+        assert [user.username for user in rest] == ["carol"]
+
+
+class TestTotals:
+    """Тесты подсчёта total без второго прохода по фильтрам"""
+
+    def test_get_tasks_with_total(self, db_session: Session):
+        """Оконный count совпадает с get_tasks_count, в том числе за последней страницей"""
+        from crud.task import get_tasks_with_total, get_tasks_count
+        from crud.user import create_user
+        from schemas.user import UserCreate
+        from models.task import TaskDB, TaskStatus
+        from models.user import UserRole
+
+        creator = create_user(db_session, UserCreate(username="total_creator", role=UserRole.USER))
+        for index in range(5):
+            db_session.add(TaskDB(
+                title=f"Total {index}",
+                creator_id=creator.id,
+                status=TaskStatus.COMPLETED if index % 2 else TaskStatus.OPEN
+            ))
+        db_session.commit()
+
+        tasks, total = get_tasks_with_total(db_session, limit=2, status="open")
+        assert len(tasks) == 2
+        assert total == get_tasks_count(db_session, status="open") == 3
+
+        tasks, total = get_tasks_with_total(db_session, skip=10, limit=2, status="open")
+        assert tasks == [] and total == 3
+
+    def test_estimate_count_falls_back_to_exact(self, db_session: Session):
+        """Вне PostgreSQL оценки нет — число точное и помечено как точное"""
+        from crud.user import create_user, estimate_users_count
+        from schemas.user import UserCreate
+        from models.user import UserRole
+
+        create_user(db_session, UserCreate(username="estimate_user", role=UserRole.ADMIN))
+        assert estimate_users_count(db_session, role=UserRole.ADMIN) == (1, False)
@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import QueuePool
+
+
+class TestPoolTelemetry:
+    """Тесты телеметрии пула соединений"""
+
+    def test_checkout_and_gauges(self, tmp_path):
+        """Выдача соединения учитывается в счётчиках и текущей загрузке"""
+        from monitoring.pool import PoolTelemetry, instrumented_pool
+
+        telemetry = PoolTelemetry("test_checkout")
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'pool.db'}",
+            poolclass=instrumented_pool(QueuePool, telemetry),
+            pool_size=2,
+            max_overflow=0
+        )
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            snapshot = telemetry.snapshot()
+            assert snapshot["checked_out"] == 1
+            assert snapshot["size"] == 2
+
+        snapshot = telemetry.snapshot()
+        assert snapshot["checked_out"] == 0
+        assert snapshot["checkouts"] == 1
+        assert snapshot["wait_seconds"]["count"] == 1
+        engine.dispose()
+
+    def test_timeout_is_counted(self, tmp_path):
+        """Таймаут ожидания соединения попадает в счётчик timeouts"""
+        from monitoring.pool import PoolTelemetry, instrumented_pool, pool_status
+
+        telemetry = PoolTelemetry("test_timeout")
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'pool.db'}",
+            poolclass=instrumented_pool(QueuePool, telemetry),
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.05
+        )
+        with engine.connect():
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+
+        snapshot = pool_status()["test_timeout"]
+        assert snapshot["timeouts"] == 1
+        assert snapshot["checkouts"] == 1
+        engine.dispose()
@@ -0,0 +1,185 @@
+import pytest
+from sqlalchemy.orm import Session
+
+
+class TestQueryBudget:
+    """Тесты бюджета SQL-запросов и режима raise-on-lazy-load"""
+
+    def test_check_budget_modes(self):
+        """log возвращает False, raise бросает исключение, off ничего не проверяет"""
+        from monitoring.query_budget import check_budget, QueryBudgetExceeded
+        from monitoring.sql import RequestSQLStats
+
+        stats = RequestSQLStats()
+        for _ in range(3):
+            stats.record("get_user", 0.001, 1)
+
+        assert check_budget("/v2/users/", 3, stats, mode="raise")
+        assert not check_budget("/v2/users/", 2, stats, mode="log")
+        assert check_budget("/v2/users/", 2, stats, mode="off")
+        with pytest.raises(QueryBudgetExceeded, match="get_user=3"):
+            check_budget("/v2/users/", 2, stats, mode="raise")
+
+    def test_endpoint_budgets_are_declared(self):
+        """Горячие v2-эндпоинты объявляют бюджет"""
+        from api.endpoints.v2 import tasks, users
+
+        assert tasks.read_tasks.query_budget == 6
+        assert tasks.read_task.query_budget == 2
+        assert users.read_users.query_budget == 3
+
+    def test_task_list_serialization_has_no_lazy_loads(self, db_session: Session):
+        """get_tasks + task_to_dict не делают ленивых загрузок"""
+        from crud.task import create_task, get_tasks, task_to_dict
+        from crud.user import create_user
+        from schemas.task import TaskCreate
+        from schemas.user import UserCreate
+        from models.user import UserRole
+        from monitoring.query_budget import raise_on_lazy_load
+
+        creator = create_user(db_session, UserCreate(
+            username="lazy_creator",
+            full_name="Lazy Creator",
+            role=UserRole.MANAGER
+        ))
+        create_task(db_session, TaskCreate(
+            title="Lazy Task",
+            creator_id=creator.id,
+            assigned_user_ids=[creator.id]
+        ))
+        db_session.expunge_all()
+
+        with raise_on_lazy_load():
+            tasks = get_tasks(db_session, user_id=creator.id)
+            data = [task_to_dict(task) for task in tasks]
+        assert data[0]["assigned_user_ids"] == [creator.id]
+
+    def test_task_list_queries_do_not_grow_with_assignees(self, db_session: Session, assert_max_queries):
+        """Страница задач — три запроса (задачи, id исполнителей, пользователи) при любом числе исполнителей"""
+        from crud.task import get_tasks, get_tasks_with_total, task_to_dict
+        from crud.user import create_user
+        from schemas.user import UserCreate
+        from models.task import TaskDB, TaskAssignmentDB, TaskStatus
+        from models.user import UserRole
+
+        users = [
+            create_user(db_session, UserCreate(username=f"fanout_{i}", role=UserRole.USER)) for i in range(12)
+        ]
+        for i in range(5):
+            db_session.add(TaskDB(
+                title=f"Fan-out {i}", creator_id=users[0].id, status=TaskStatus.OPEN,
+                assignments=[TaskAssignmentDB(user_id=user.id) for user in users[:2 + i * 2]]
+            ))
+        db_session.commit()
+        creator_id = users[0].id
+        user_ids = [user.id for user in users]
+        db_session.expunge_all()
+
+        with assert_max_queries(3):
+            tasks = get_tasks(db_session, user_id=creator_id, limit=3)
+            data = [task_to_dict(task) for task in tasks]
+        assert [len(task["assigned_users"]) for task in data] == [10, 8, 6]
+        assert data[0]["assigned_user_ids"] == sorted(user_ids[:10])
+        assert data[0]["creator"]["username"] == "fanout_0"
+        # Назначения приходят списками id, ORM-объекты для них не создаются
+        assert not any(isinstance(obj, TaskAssignmentDB) for obj in db_session.identity_map.values())
+
+        # После записи списки из страницы не используются: назначения читаются заново
+        db_session.delete(db_session.get(TaskAssignmentDB, (tasks[0].id, user_ids[1])))
+        db_session.flush()
+        assert len(task_to_dict(tasks[0])["assigned_user_ids"]) == 9
+
+        db_session.expunge_all()
+        with assert_max_queries(3):
+            tasks, total = get_tasks_with_total(db_session, skip=1, limit=2, user_id=creator_id)
+            data = [task_to_dict(task) for task in tasks]
+        assert total == 5
+        assert [task["title"] for task in data] == ["Fan-out 3", "Fan-out 2"]
+
+    def test_task_projections_skip_unrequested_relations(self, db_session: Session, assert_max_queries):
+        """fields без связей — один запрос; expand добавляет назначения и пользователей"""
+        from crud.task import get_task_projections, get_task_projection
+        from crud.user import create_user
+        from schemas.user import UserCreate
+        from models.task import TaskDB, TaskAssignmentDB, TaskStatus
+        from models.user import UserRole
+
+        users = [create_user(db_session, UserCreate(username=f"sparse_{i}", role=UserRole.USER)) for i in range(3)]
+        for i in range(3):
+            db_session.add(TaskDB(
+                title=f"Sparse {i}", creator_id=users[0].id, status=TaskStatus.OPEN,
+                assignments=[TaskAssignmentDB(user_id=user.id) for user in users[:i + 1]]
+            ))
+        db_session.commit()
+        creator_id = users[0].id
+        db_session.expunge_all()
+
+        with assert_max_queries(1):
+            tasks, total = get_task_projections(
+                db_session, ["title", "status"], user_id=creator_id, limit=2, with_total=True
+            )
+        assert total == 3
+        assert [task.data for task in tasks] == [
+            {"id": tasks[0].id, "title": "Sparse 2", "status": "open"},
+            {"id": tasks[1].id, "title": "Sparse 1", "status": "open"},
+        ]
+
+        with assert_max_queries(3):
+            tasks, _ = get_task_projections(
+                db_session, ["title"], ["creator", "assignees"], user_id=creator_id, limit=1
+            )
+        data = tasks[0].data
+        assert set(data) == {"id", "title", "creator", "assigned_users"}
+        assert data["creator"]["username"] == "sparse_0"
+        assert [user["username"] for user in data["assigned_users"]] == ["sparse_0", "sparse_1", "sparse_2"]
+
+        with assert_max_queries(1):
+            projection = get_task_projection(db_session, tasks[0].id, ["due_date"])
+        assert projection.data == {"id": tasks[0].id, "due_date": None}
+        assert get_task_projection(db_session, -1, ["title"]) is None
+
+    def test_lazy_load_raises_in_strict_mode(self, db_session: Session):
+        """Непредзагруженная связь TaskDB в строгом режиме вызывает ошибку"""
+        from sqlalchemy.exc import InvalidRequestError
+        from crud.task import create_task
+        from crud.user import create_user
+        from schemas.task import TaskCreate
+        from schemas.user import UserCreate
+        from models.task import TaskDB
+        from models.user import UserRole
+        from monitoring.query_budget import raise_on_lazy_load
+
+        creator = create_user(db_session, UserCreate(
+            username="strict_creator",
+            full_name="Strict Creator",
+            role=UserRole.MANAGER
+        ))
+        create_task(db_session, TaskCreate(title="Strict Task", creator_id=creator.id))
+        db_session.expunge_all()
+
+        with raise_on_lazy_load():
+            task = db_session.query(TaskDB).filter(TaskDB.creator_id == creator.id).first()
+            with pytest.raises(InvalidRequestError):
+                _ = task.creator
+
+
+def test_read_task_fits_budget(assert_max_queries, db_session: Session):
+    """Фикстура assert_max_queries считает запросы из TestClient"""
+    from fastapi.testclient import TestClient
+    from main import app
+    from crud.task import create_task
+    from crud.user import create_user
+    from schemas.task import TaskCreate
+    from schemas.user import UserCreate
+    from models.user import UserRole
+
+    creator = create_user(db_session, UserCreate(
+        username="budget_creator",
+        full_name="Budget Creator",
+        role=UserRole.MANAGER
+    ))
+    task = create_task(db_session, TaskCreate(title="Budget Task", creator_id=creator.id))
+
+    with TestClient(app) as client:
+        with assert_max_queries(1):
+            assert client.get(f"/v2/tasks/{task['id']}").status_code == 200
@@ -0,0 +1,61 @@
+import time
+from sqlalchemy import create_engine, text
+from starlette.requests import Request
+
+
+def _request(method: str, cookie: str = "") -> Request:
+    headers = [(b"cookie", cookie.encode())] if cookie else []
+    return Request({"type": "http", "method": method, "headers": headers, "path": "/"})
+
+
+class TestReplicaRouting:
+    """Тесты маршрутизации чтения на реплику"""
+
+    def test_routing_session_uses_replica_only_for_reads(self, tmp_path):
+        """Чтение в read-only сессии идёт на реплику, flush — на primary"""
+        from sqlalchemy.orm import sessionmaker
+        from database import RoutingSession
+
+        primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+        replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+        with primary.begin() as conn:
+            conn.execute(text("CREATE TABLE marker (name TEXT)"))
+            conn.execute(text("INSERT INTO marker VALUES ('primary')"))
+        with replica.begin() as conn:
+            conn.execute(text("CREATE TABLE marker (name TEXT)"))
+            conn.execute(text("INSERT INTO marker VALUES ('replica')"))
+
+        class TestRoutingSession(RoutingSession):
+            replica_bind = replica
+
+        factory = sessionmaker(bind=primary, class_=TestRoutingSession)
+        with factory() as db:
+            assert db.execute(text("SELECT name FROM marker")).scalar() == "primary"
+        with factory() as db:
+            db.info["read_only"] = True
+            assert db.execute(text("SELECT name FROM marker")).scalar() == "replica"
+
+        primary.dispose()
+        replica.dispose()
+
+    def test_can_use_replica(self):
+        """GET без недавней записи — на реплику; запись и закреплённый клиент — на primary"""
+        from database import can_use_replica, PRIMARY_STICKY_COOKIE
+
+        assert can_use_replica(_request("GET"))
+        assert not can_use_replica(_request("POST"))
+        assert not can_use_replica(None)
+
+        sticky = f"{PRIMARY_STICKY_COOKIE}={time.time() + 60}"
+        assert not can_use_replica(_request("GET", sticky))
+        expired = f"{PRIMARY_STICKY_COOKIE}={time.time() - 60}"
+        assert can_use_replica(_request("GET", expired))
+
+    def test_mark_primary_sticky_sets_cookie(self):
+        """После записи в ответ добавляется cookie закрепления за primary"""
+        from starlette.responses import Response
+        from database import mark_primary_sticky, PRIMARY_STICKY_COOKIE
+
+        response = Response()
+        mark_primary_sticky(response)
+        assert PRIMARY_STICKY_COOKIE in response.headers["set-cookie"]
@@ -0,0 +1,44 @@
+import json
+import warnings
+
+from sqlalchemy.orm import Session
+
+
+class TestTaskPageSerialization:
+    """Быстрый путь сериализации списков задач (api/endpoints/v2/serialization.py)"""
+
+    def test_matches_response_model(self, db_session: Session):
+        """JSON без валидации совпадает с тем, что дал бы response_model"""
+        import datetime
+        from api.endpoints.v2.serialization import task_page_response
+        from crud.task import create_task, get_tasks, task_to_dict
+        from crud.user import create_user
+        from models.user import UserRole
+        from schemas.response import PaginatedResponse
+        from schemas.task import TaskCreate, TaskResponse
+        from schemas.user import UserCreate
+
+        creator = create_user(db_session, UserCreate(username="fast_creator", full_name="Fast", role=UserRole.MANAGER))
+        worker = create_user(db_session, UserCreate(username="fast_worker", role=UserRole.USER))
+        create_task(db_session, TaskCreate(title="No extras", creator_id=creator.id))
+        create_task(db_session, TaskCreate(
+            title="Full", description="Описание", due_date=datetime.datetime(2030, 1, 2, 3, 4, 5),
+            creator_id=creator.id, assigned_user_ids=[creator.id, worker.id]
+        ))
+        tasks = [task_to_dict(task) for task in get_tasks(db_session, user_id=creator.id)]
+        pagination = {"total": 2, "page": 1, "size": 100, "has_next": False, "next_cursor": None}
+
+        with warnings.catch_warnings():
+            # Расхождение схем с данными pydantic-core выдаёт предупреждением
+            warnings.simplefilter("error")
+            response = task_page_response("Tasks retrieved successfully", tasks, pagination)
+        fast = json.loads(response.body)
+        expected = PaginatedResponse[TaskResponse](
+            message="Tasks retrieved successfully", data=tasks, pagination=pagination
+        ).model_dump(mode="json")
+
+        assert response.media_type == "application/json"
+        fast.pop("timestamp")
+        expected.pop("timestamp")
+        assert fast == expected
+        assert [task["title"] for task in fast["data"]] == ["Full", "No extras"]
@@ -0,0 +1,140 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+
+def _make_tasks(db_session: Session, *titles: str) -> dict:
+    from crud.user import create_user
+    from schemas.user import UserCreate
+    from models.user import UserRole
+    from models.task import TaskDB, TaskStatus
+
+    user = create_user(db_session, UserCreate(username="closure_user", role=UserRole.MANAGER))
+    tasks = {title: TaskDB(title=title, creator_id=user.id, status=TaskStatus.OPEN) for title in titles}
+    db_session.add_all(tasks.values())
+    db_session.commit()
+    return {title: task.id for title, task in tasks.items()}
+
+
+def _closure_rows(db_session: Session) -> set:
+    from models.task_closure import TaskClosureDB
+
+    table = TaskClosureDB.__table__
+    return set(db_session.execute(
+        select(table.c.ancestor_id, table.c.descendant_id, table.c.depth, table.c.path_count)
+    ).all())
+
+
+class TestTaskClosure:
+    """Тесты closure-таблицы иерархии задач"""
+
+    def test_diamond_counts_every_path(self, db_session: Session):
+        """В ромбе a→b→d, a→c→d до d два пути длины 2; удаление ребра вычитает один"""
+        from crud.task import create_task_hierarchy, get_ancestor_ids, get_descendant_ids
+        from models.task import TaskHierarchyDB
+
+        ids = _make_tasks(db_session, "a", "b", "c", "d", "e")
+        a, b, c, d, e = (ids[name] for name in "abcde")
+        for parent_id, child_id in [(a, b), (a, c), (b, d), (c, d), (d, e)]:
+            create_task_hierarchy(db_session, parent_id, child_id)
+
+        rows = _closure_rows(db_session)
+        assert (a, d, 2, 2) in rows
+        assert (a, e, 3, 2) in rows
+        assert get_ancestor_ids(db_session, e) == [d, b, c, a]
+        assert get_descendant_ids(db_session, a) == [b, c, d, e]
+
+        edge = db_session.query(TaskHierarchyDB).filter_by(parent_id=b, child_id=d).one()
+        db_session.delete(edge)
+        db_session.commit()
+
+        rows = _closure_rows(db_session)
+        assert (a, d, 2, 1) in rows
+        assert not any(row[0] == b and row[1] in (d, e) for row in rows)
+        assert get_ancestor_ids(db_session, e) == [d, c, a]
+
+    def test_cycle_check(self, db_session: Session):
+        """Связь от потомка к предку (и к самой себе) создаёт цикл"""
+        from crud.task import create_task_hierarchy, would_create_cycle
+
+        ids = _make_tasks(db_session, "root", "middle", "leaf", "other")
+        create_task_hierarchy(db_session, ids["root"], ids["middle"])
+        create_task_hierarchy(db_session, ids["middle"], ids["leaf"])
+
+        assert would_create_cycle(db_session, ids["leaf"], ids["root"])
+        assert would_create_cycle(db_session, ids["leaf"], ids["leaf"])
+        assert not would_create_cycle(db_session, ids["root"], ids["leaf"])
+        assert not would_create_cycle(db_session, ids["other"], ids["root"])
+
+    def test_delete_middle_task(self, db_session: Session):
+        """Удаление задачи из середины цепочки убирает все пути через неё"""
+        from crud.task import create_task_hierarchy, delete_task, get_descendant_ids
+
+        ids = _make_tasks(db_session, "top", "middle", "bottom", "side")
+        create_task_hierarchy(db_session, ids["top"], ids["middle"])
+        create_task_hierarchy(db_session, ids["middle"], ids["bottom"])
+        create_task_hierarchy(db_session, ids["top"], ids["side"])
+
+        assert delete_task(db_session, ids["middle"])
+        assert get_descendant_ids(db_session, ids["top"]) == [ids["side"]]
+        assert _closure_rows(db_session) == {(ids["top"], ids["side"], 1, 1)}
+
+    def test_rebuild_matches_incremental(self, db_session: Session):
+        """Пересборка с нуля даёт ту же таблицу, что и инкрементальное обновление"""
+        from crud.task import create_task_hierarchy
+        from models.task_closure import rebuild_task_closure
+
+        ids = _make_tasks(db_session, "p1", "p2", "c1", "c2", "g1")
+        for parent, child in [("p1", "c1"), ("p2", "c1"), ("p1", "c2"), ("c1", "g1"), ("c2", "g1")]:
+            create_task_hierarchy(db_session, ids[parent], ids[child])
+
+        incremental = _closure_rows(db_session)
+        assert rebuild_task_closure(db_session) == len(incremental)
+        assert _closure_rows(db_session) == incremental
+
+    def test_rebuild_counts_paths_without_enumerating_them(self, db_session: Session):
+        """Лестница из ромбов: 2^30 путей до последней задачи считаются без перебора и рекурсии"""
+        import sys
+        from models.task import TaskDB, TaskHierarchyDB
+        from models.task_closure import rebuild_task_closure, TaskClosureDB
+
+        seed_id = _make_tasks(db_session, "ladder_seed")["ladder_seed"]
+        creator_id = db_session.get(TaskDB, seed_id).creator_id
+        diamonds = 30
+        insert = TaskDB.__table__.insert()
+        ids = [
+            db_session.execute(insert.values(title=f"ladder {i}", creator_id=creator_id)).inserted_primary_key[0]
+            for i in range(3 * diamonds + 1)
+        ]
+        edges = []
+        for i in range(diamonds):
+            top, left, right, bottom = ids[3 * i], ids[3 * i + 1], ids[3 * i + 2], ids[3 * i + 3]
+            edges += [(top, left), (top, right), (left, bottom), (right, bottom)]
+        # В обход ORM: closure строит только пересборка
+        db_session.execute(TaskHierarchyDB.__table__.insert(), [{"parent_id": p, "child_id": c} for p, c in edges])
+
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(200)
+        try:
+            rebuild_task_closure(db_session)
+        finally:
+            sys.setrecursionlimit(limit)
+
+        table = TaskClosureDB.__table__
+        path_count = db_session.execute(
+            select(table.c.path_count).where(table.c.ancestor_id == ids[0], table.c.descendant_id == ids[-1])
+        ).scalar_one()
+        assert path_count == 2 ** diamonds
+
+    def test_rebuild_rejects_cycle(self, db_session: Session):
+        """Цикл в task_hierarchy (старые данные) — ошибка, а не бесконечная пересборка"""
+        import pytest
+        from models.task import TaskHierarchyDB
+        from models.task_closure import rebuild_task_closure
+
+        ids = _make_tasks(db_session, "loop_a", "loop_b")
+        db_session.execute(TaskHierarchyDB.__table__.insert(), [
+            {"parent_id": ids["loop_a"], "child_id": ids["loop_b"]},
+            {"parent_id": ids["loop_b"], "child_id": ids["loop_a"]},
+        ])
+        with pytest.raises(ValueError):
+            rebuild_task_closure(db_session)
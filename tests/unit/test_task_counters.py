@@ -0,0 +1,100 @@
+import datetime
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+def _make_user(db_session: Session, username: str):
+    from crud.user import create_user
+    from schemas.user import UserCreate
+    from models.user import UserRole
+
+    return create_user(db_session, UserCreate(username=username, role=UserRole.MANAGER))
+
+
+class TestTaskCounters:
+    """Тесты инкрементальных счётчиков задач"""
+
+    def test_counters_follow_task_lifecycle(self, db_session: Session):
+        """Создание, смена статуса, переназначение и удаление сразу видны в статистике"""
+        from crud.task import create_task, update_task_status, assign_users_to_task, delete_task, get_task_stats
+        from models.task_counters import reconcile_task_counters
+        from models.task import TaskStatus
+        from schemas.task import TaskCreate
+
+        creator = _make_user(db_session, "counter_creator")
+        assignee = _make_user(db_session, "counter_assignee")
+        other = _make_user(db_session, "counter_other")
+
+        task = create_task(db_session, TaskCreate(
+            title="Counted task", creator_id=creator.id, assigned_user_ids=[assignee.id]
+        ))
+        assert get_task_stats(db_session)["open"] == 1
+        assert get_task_stats(db_session, assignee.id)["open"] == 1
+
+        update_task_status(db_session, task["id"], TaskStatus.REVIEW, creator.id)
+        stats = get_task_stats(db_session, creator.id)
+        assert stats["open"] == 0 and stats["review"] == 1
+
+        assign_users_to_task(db_session, task["id"], [other.id])
+        assert get_task_stats(db_session, assignee.id)["total"] == 0
+        assert get_task_stats(db_session, other.id)["review"] == 1
+
+        assert reconcile_task_counters(db_session) == 0
+
+        delete_task(db_session, task["id"])
+        assert get_task_stats(db_session)["total"] == 0
+        assert get_task_stats(db_session, other.id)["total"] == 0
+        assert reconcile_task_counters(db_session) == 0
+
+    def test_user_stats_include_unassigned_created_tasks(self, db_session: Session):
+        """Созданная, но никому не назначенная задача входит в статистику создателя один раз"""
+        from crud.task import get_task_stats
+        from models.task import TaskDB, TaskAssignmentDB, TaskStatus
+
+        creator = _make_user(db_session, "counter_solo")
+        db_session.add(TaskDB(title="Unassigned", creator_id=creator.id, status=TaskStatus.OPEN))
+        self_assigned = TaskDB(title="Self assigned", creator_id=creator.id, status=TaskStatus.OPEN)
+        db_session.add(self_assigned)
+        db_session.flush()
+        db_session.add(TaskAssignmentDB(task_id=self_assigned.id, user_id=creator.id))
+        db_session.commit()
+
+        assert get_task_stats(db_session, creator.id)["open"] == 2
+
+    def test_overdue(self, db_session: Session):
+        """overdue — незавершённые задачи с прошедшим сроком"""
+        from crud.task import get_task_stats
+        from models.task import TaskDB, TaskStatus
+
+        creator = _make_user(db_session, "counter_overdue")
+        yesterday = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+        tomorrow = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+        for due_date, status in [
+            (yesterday, TaskStatus.OPEN),
+            (yesterday, TaskStatus.COMPLETED),
+            (tomorrow, TaskStatus.OPEN),
+        ]:
+            db_session.add(TaskDB(title="Due", creator_id=creator.id, status=status, due_date=due_date))
+        db_session.commit()
+
+        assert get_task_stats(db_session)["overdue"] == 1
+        assert get_task_stats(db_session, creator.id)["overdue"] == 1
+
+    def test_reconcile_repairs_drift(self, db_session: Session):
+        """Сверка исправляет счётчики, изменённые в обход приложения"""
+        from crud.task import get_task_stats
+        from models.task import TaskDB, TaskStatus
+        from models.task_counters import reconcile_task_counters
+
+        creator = _make_user(db_session, "counter_drift")
+        db_session.add(TaskDB(title="Drift", creator_id=creator.id, status=TaskStatus.OPEN))
+        db_session.commit()
+
+        db_session.execute(text("UPDATE task_counters SET count = 42"))
+        db_session.execute(text("UPDATE tasks SET status = 'REVIEW'"))
+        assert get_task_stats(db_session)["open"] == 42
+
+        assert reconcile_task_counters(db_session) > 0
+        stats = get_task_stats(db_session, creator.id)
+        assert stats["open"] == 0 and stats["review"] == 1
+        assert reconcile_task_counters(db_session) == 0
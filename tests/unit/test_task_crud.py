@@ -1107,6 +1107,26 @@ class TestTaskFunctions:
         assert updated_task is not None
         assert updated_task["assigned_user_ids"] == [assignee2.id]
 
+    def test_update_task_empty_assignees_clears_them(self, db_session: Session):
+        """Пустой assigned_user_ids снимает назначения, отсутствующий — оставляет"""
+        from crud.task import create_task, update_task
+        from crud.user import create_user
+        from schemas.task import TaskCreate, TaskUpdate
+        from schemas.user import UserCreate
+        from models.user import UserRole
+
+        creator = create_user(db_session, UserCreate(username="clear_creator", role=UserRole.USER))
+        assignee = create_user(db_session, UserCreate(username="clear_assignee", role=UserRole.USER))
+        task_id = create_task(db_session, TaskCreate(
+            title="Task to Clear", creator_id=creator.id, assigned_user_ids=[assignee.id]
+        ))["id"]
+
+        updated_task = update_task(db_session, task_id, TaskUpdate(title="Kept"), creator.id)
+        assert updated_task["assigned_user_ids"] == [assignee.id]
+
+        updated_task = update_task(db_session, task_id, TaskUpdate(assigned_user_ids=[]), creator.id)
+        assert updated_task["assigned_user_ids"] == []
+
     def test_update_task_permissions_creator(self, db_session: Session):
         """Тест прав доступа для обновления задачи (создатель)"""
         from crud.task import create_task, update_task, get_task
@@ -1801,4 +1821,402 @@ class TestTaskFunctions:
 
         # Для несуществующей задачи
         invalid_hierarchy = get_task_hierarchy(db_session, 99999)
-        assert invalid_hierarchy == {}
\ No newline at end of file
+        assert invalid_hierarchy == {}
+
+class TestTaskSearch:
+    """Тесты поиска задач с ранжированием"""
+
+    def _create_tasks(self, db_session: Session):
+        from crud.user import create_user
+        from schemas.user import UserCreate
+        from models.task import TaskDB, TaskStatus
+        from models.user import UserRole
+
+        creator = create_user(db_session, UserCreate(
+            username="fts_creator",
+            full_name="FTS Creator",
+            role=UserRole.USER
+        ))
+        for title, description in [
+            ("Deploy pipeline", "Configure the release pipeline"),
+            ("Write docs", "Describe how to deploy the service"),
+            ("Fix login", "Users cannot sign in"),
+        ]:
+            db_session.add(TaskDB(
+                title=title,
+                description=description,
+                creator_id=creator.id,
+                status=TaskStatus.OPEN
+            ))
+        db_session.commit()
+
+    def test_search_tasks_ranks_title_matches_first(self, db_session: Session):
+        """Совпадение в заголовке ранжируется выше совпадения в описании"""
+        from crud.task import search_tasks
+
+        self._create_tasks(db_session)
+        results, has_next = search_tasks(db_session, "deploy")
+
+        assert [task.title for task, _, _ in results] == ["Deploy pipeline", "Write docs"]
+        assert results[0][1] > results[1][1]
+        assert "<mark>deploy</mark>" in results[1][2]
+        assert has_next is False
+
+    def test_search_tasks_prefix_and_paging(self, db_session: Session):
+        """Слова ищутся по префиксу, has_next считается без count"""
+        from crud.task import search_tasks
+
+        self._create_tasks(db_session)
+        results, has_next = search_tasks(db_session, "pipe", limit=1)
+        assert [task.title for task, _, _ in results] == ["Deploy pipeline"]
+        assert has_next is False
+
+        results, has_next = search_tasks(db_session, "dep", limit=1)
+        assert len(results) == 1
+        assert has_next is True
+
+        assert search_tasks(db_session, "&|!") == ([], False)
+
+    def test_search_condition_matches_gin_index(self):
+        """Запрос в PostgreSQL использует то же выражение, что и GIN-индекс"""
+        from sqlalchemy.dialects import postgresql
+        from sqlalchemy.schema import CreateIndex
+        from models.task import TaskDB, task_search_document
+
+        dialect = postgresql.dialect()
+        index = next(i for i in TaskDB.__table__.indexes if i.name == "ix_tasks_search_document")
+        index_sql = str(CreateIndex(index).compile(dialect=dialect))
+        document_sql = str(task_search_document().compile(dialect=dialect)).replace("tasks.", "")
+
+        assert document_sql in index_sql
+        assert "%(" not in document_sql
+
+
+class TestStatusPropagation:
+    """Распространение выполнения и переоткрытия по предкам"""
+
+    def _make_dag(self, db_session: Session) -> dict:
+        """root → a, root → b, a → shared, b → shared, b → extra"""
+        from crud.user import create_user
+        from crud.task import create_task_hierarchy
+        from schemas.user import UserCreate
+        from models.user import UserRole
+        from models.task import TaskDB, TaskStatus
+
+        user = create_user(db_session, UserCreate(username="propagation_user", role=UserRole.MANAGER))
+        tasks = {
+            name: TaskDB(title=name, creator_id=user.id, status=TaskStatus.OPEN)
+            for name in ("root", "a", "b", "shared", "extra")
+        }
+        db_session.add_all(tasks.values())
+        db_session.commit()
+        ids = {name: task.id for name, task in tasks.items()}
+        ids["user"] = user.id
+        for parent, child in [("root", "a"), ("root", "b"), ("a", "shared"), ("b", "shared"), ("b", "extra")]:
+            create_task_hierarchy(db_session, ids[parent], ids[child])
+        return ids
+
+    def _statuses(self, db_session: Session, ids: dict) -> dict:
+        from models.task import TaskDB
+
+        db_session.expire_all()
+        return {
+            name: db_session.get(TaskDB, task_id).status
+            for name, task_id in ids.items() if name != "user"
+        }
+
+    def test_completion_reaches_every_ready_ancestor(self, db_session: Session):
+        """Общая подзадача закрывает обоих родителей, только когда у них не осталось открытых потомков"""
+        from crud.task import update_task_status_with_cascade, are_all_children_completed, get_task_stats
+        from models.task import TaskStatus
+
+        ids = self._make_dag(db_session)
+        update_task_status_with_cascade(db_session, ids["shared"], TaskStatus.COMPLETED, ids["user"])
+        statuses = self._statuses(db_session, ids)
+        assert statuses["a"] == TaskStatus.COMPLETED
+        assert statuses["b"] == TaskStatus.OPEN
+        assert statuses["root"] == TaskStatus.OPEN
+        assert not are_all_children_completed(db_session, ids["b"])
+
+        update_task_status_with_cascade(db_session, ids["extra"], TaskStatus.COMPLETED, ids["user"])
+        statuses = self._statuses(db_session, ids)
+        assert statuses["b"] == TaskStatus.COMPLETED
+        assert statuses["root"] == TaskStatus.COMPLETED
+        assert are_all_children_completed(db_session, ids["root"])
+        assert get_task_stats(db_session)["completed"] == 5
+
+    def test_reopen_reverts_completed_ancestors(self, db_session: Session):
+        """Переоткрытая подзадача возвращает выполненных предков в работу, прочие не трогает"""
+        from crud.task import update_task_status_with_cascade, get_task_stats, REOPENED_ANCESTOR_STATUS
+        from models.task import TaskStatus
+
+        ids = self._make_dag(db_session)
+        for name in ("shared", "extra"):
+            update_task_status_with_cascade(db_session, ids[name], TaskStatus.COMPLETED, ids["user"])
+
+        update_task_status_with_cascade(db_session, ids["extra"], TaskStatus.REVIEW, ids["user"])
+        statuses = self._statuses(db_session, ids)
+        assert statuses["extra"] == TaskStatus.REVIEW
+        assert statuses["b"] == REOPENED_ANCESTOR_STATUS
+        assert statuses["root"] == REOPENED_ANCESTOR_STATUS
+        assert statuses["a"] == TaskStatus.COMPLETED
+        assert get_task_stats(db_session)["completed"] == 2
+
+
+class TestBulkCreate:
+    """Массовое создание задач"""
+
+    def test_bulk_create_with_hierarchy_and_errors(self, db_session: Session):
+        """Создаются валидные элементы; ошибки и их подзадачи перечислены по индексам"""
+        from crud.user import create_user
+        from crud.task import create_tasks_bulk, get_descendant_ids, get_ancestor_ids, get_task_stats
+        from models.task_closure import rebuild_task_closure
+        from models.task import TaskDB, TaskStatus
+        from models.user import UserRole
+        from schemas.user import UserCreate
+        from schemas.task import BulkTaskItem
+
+        manager = create_user(db_session, UserCreate(username="bulk_manager", role=UserRole.MANAGER))
+        member = create_user(db_session, UserCreate(username="bulk_member", role=UserRole.USER))
+        existing = TaskDB(title="Existing", creator_id=manager.id, status=TaskStatus.OPEN)
+        db_session.add(existing)
+        db_session.commit()
+
+        def item(title, **kwargs):
+            return BulkTaskItem(title=title, creator_id=kwargs.pop("creator_id", manager.id), **kwargs)
+
+        results = create_tasks_bulk(db_session, [
+            item("Epic", ref="epic", parent_id=existing.id),
+            item("Story", ref="story", parent_ref="epic", assigned_user_ids=[member.id, member.id]),
+            item("Subtask", parent_ref="story"),
+            item("By member", ref="bad", creator_id=member.id),
+            item("Under bad", parent_ref="bad"),
+            item("Loop a", ref="a", parent_ref="b"),
+            item("Loop b", ref="b", parent_ref="a"),
+            item("Unknown", parent_ref="missing"),
+            item("Ghost user", assigned_user_ids=[999999]),
+        ])
+
+        created = [result["id"] for result in results if result["id"] is not None]
+        assert len(created) == 3
+        assert [result["index"] for result in results if result["error"]] == [3, 4, 5, 6, 7, 8]
+        assert "cannot create tasks" in results[3]["error"]
+        assert results[4]["error"].startswith("Parent item failed")
+        assert results[5]["error"] == results[6]["error"] == "Cycle in parent_ref"
+        assert results[7]["error"] == "Unknown parent_ref 'missing'"
+
+        epic, story, subtask = created
+        assert get_descendant_ids(db_session, existing.id) == [epic, story, subtask]
+        assert get_ancestor_ids(db_session, subtask) == [story, epic, existing.id]
+        assert get_task_stats(db_session, member.id)["open"] == 1
+
+        closure = db_session.execute(text("SELECT * FROM task_closure ORDER BY 1, 2, 3")).all()
+        rebuild_task_closure(db_session)
+        assert db_session.execute(text("SELECT * FROM task_closure ORDER BY 1, 2, 3")).all() == closure
+
+
+class TestBulkStatusUpdate:
+    """Массовая смена статуса"""
+
+    def test_bulk_status_results_and_propagation(self, db_session: Session):
+        """Права, expected_status и несуществующие id — по каждому id; предки закрываются один раз"""
+        from crud.user import create_user
+        from crud.task import bulk_update_task_status, create_task_hierarchy, get_task_stats
+        from models.task import TaskDB, TaskAssignmentDB, TaskStatus
+        from models.user import UserRole
+        from schemas.user import UserCreate
+
+        owner = create_user(db_session, UserCreate(username="bulk_status_owner", role=UserRole.MANAGER))
+        worker = create_user(db_session, UserCreate(username="bulk_status_worker", role=UserRole.USER))
+        names = ("parent", "first", "second", "foreign", "review")
+        tasks = {name: TaskDB(title=name, creator_id=owner.id, status=TaskStatus.OPEN) for name in names}
+        tasks["review"].status = TaskStatus.REVIEW
+        db_session.add_all(tasks.values())
+        db_session.commit()
+        ids = {name: task.id for name, task in tasks.items()}
+        for child in ("first", "second"):
+            create_task_hierarchy(db_session, ids["parent"], ids[child])
+            db_session.add(TaskAssignmentDB(task_id=ids[child], user_id=worker.id))
+        db_session.add(TaskAssignmentDB(task_id=ids["review"], user_id=worker.id))
+        db_session.commit()
+
+        result = bulk_update_task_status(
+            db_session,
+            [ids["first"], ids["second"], ids["foreign"], ids["review"], 999999, ids["first"]],
+            TaskStatus.COMPLETED,
+            worker.id,
+            expected_status=TaskStatus.OPEN
+        )
+        assert result["results"] == [
+            {"id": ids["first"], "result": "updated"},
+            {"id": ids["second"], "result": "updated"},
+            {"id": ids["foreign"], "result": "forbidden"},
+            {"id": ids["review"], "result": "status_mismatch"},
+            {"id": 999999, "result": "not_found"},
+        ]
+        assert result["updated"] == 2
+        assert result["propagated"] == 1
+        db_session.expire_all()
+        assert db_session.get(TaskDB, ids["parent"]).status == TaskStatus.COMPLETED
+        assert get_task_stats(db_session)["completed"] == 3
+
+        result = bulk_update_task_status(db_session, [ids["second"]], TaskStatus.IN_PROGRESS, owner.id)
+        assert result["propagated"] == 1
+        db_session.expire_all()
+        parent = db_session.get(TaskDB, ids["parent"])
+        assert parent.status == TaskStatus.IN_PROGRESS
+        # Массовые UPDATE в обход ORM тоже увеличивают version: закрытие и переоткрытие
+        # (у second ещё и назначение исполнителя)
+        assert parent.version == 3
+        assert db_session.get(TaskDB, ids["second"]).version == 4
+
+
+class TestTaskWritePath:
+    """Запись задачи одной транзакцией с одним перечитыванием"""
+
+    def test_create_and_update_reload_once(self, db_session: Session, assert_max_queries):
+        """create_task/update_task: один SELECT задачи после commit, с return_minimal — ни одного"""
+        from crud.user import create_user
+        from crud.task import create_task, update_task
+        from models.user import UserRole
+        from schemas.task import TaskCreate, TaskUpdate
+        from schemas.user import UserCreate
+
+        owner = create_user(db_session, UserCreate(username="write_path_owner", role=UserRole.MANAGER))
+        with assert_max_queries(20) as statements:
+            created = create_task(db_session, TaskCreate(
+                title="Write path", creator_id=owner.id, assigned_user_ids=[owner.id, 999999]
+            ))
+        assert created["assigned_user_ids"] == [owner.id]
+        assert created["version"] == 1
+        assert sum(statement.lstrip().startswith("SELECT anon_1.tasks_id") for statement in statements) == 1
+
+        with assert_max_queries(20) as statements:
+            updated = update_task(
+                db_session, created["id"], TaskUpdate(title="Renamed"), owner.id, return_minimal=True
+            )
+        assert updated == {"id": created["id"], "version": 2}
+        # Единственный SELECT задачи — загрузка для проверки прав, перечитывания после commit нет
+        assert sum(statement.lstrip().startswith("SELECT anon_1.tasks_id") for statement in statements) == 1
+
+    def test_concurrent_writes_do_not_conflict(self, db_session: Session):
+        """Правка задачи с устаревшим version в сессии не падает: увеличения version складываются"""
+        from crud.user import create_user
+        from crud.task import create_task, get_task, update_task, update_task_status
+        from models.task import TaskDB, TaskStatus
+        from models.task_versions import touch_tasks
+        from models.user import UserRole
+        from schemas.task import TaskCreate, TaskUpdate
+        from schemas.user import UserCreate
+
+        owner = create_user(db_session, UserCreate(username="concurrent_owner", role=UserRole.MANAGER))
+        task_id = create_task(db_session, TaskCreate(title="Concurrent", creator_id=owner.id))["id"]
+        stale = get_task(db_session, task_id)
+        assert stale.version == 1
+
+        # Другая сессия (другой запрос или обработчик Kafka) меняет ту же задачу через ORM и в обход него
+        other = Session(bind=db_session.connection(), join_transaction_mode="create_savepoint")
+        update_task_status(other, task_id, TaskStatus.IN_PROGRESS, owner.id)
+        touch_tasks(other, [task_id])
+        other.commit()
+        other.close()
+
+        updated = update_task(db_session, task_id, TaskUpdate(title="Concurrent, renamed"), owner.id)
+        assert updated["title"] == "Concurrent, renamed"
+        assert updated["version"] == 4
+        db_session.expire_all()
+        assert db_session.get(TaskDB, task_id).version == 4
+
+
+class TestTaskAssignments:
+    """Назначения по разнице с текущими"""
+
+    def test_modes_keep_existing_rows(self, db_session: Session):
+        """add/remove/replace меняют только нужные строки, assigned_at оставшихся не меняется"""
+        import datetime
+        from crud.user import create_user
+        from crud.task import apply_task_assignments, get_task_stats
+        from models.task import TaskDB, TaskAssignmentDB, TaskStatus
+        from models.user import UserRole
+        from schemas.user import UserCreate
+        from schemas.task import AssignmentMode
+
+        users = [create_user(db_session, UserCreate(username=f"diff_user_{i}", role=UserRole.USER)) for i in range(3)]
+        first, second, third = (user.id for user in users)
+        task = TaskDB(title="Diff", creator_id=first, status=TaskStatus.OPEN)
+        db_session.add(task)
+        db_session.flush()
+        assigned_at = datetime.datetime(2020, 1, 1)
+        db_session.add(TaskAssignmentDB(task_id=task.id, user_id=second, assigned_at=assigned_at))
+        db_session.commit()
+
+        def assignees():
+            db_session.expire_all()
+            return {a.user_id: a.assigned_at for a in db_session.query(TaskAssignmentDB).filter_by(task_id=task.id)}
+
+        result = apply_task_assignments(db_session, task.id, [second, third], AssignmentMode.ADD)
+        assert result == {"added": [third], "removed": [], "missing": []}
+        assert assignees()[second] == assigned_at
+
+        result = apply_task_assignments(db_session, task.id, [third, 999999], AssignmentMode.REPLACE)
+        assert result["missing"] == [999999]
+        assert set(assignees()) == {second, third}
+
+        result = apply_task_assignments(db_session, task.id, [second], AssignmentMode.REPLACE)
+        assert result == {"added": [], "removed": [third], "missing": []}
+        assert assignees() == {second: assigned_at}
+        assert get_task_stats(db_session, third)["total"] == 0
+
+        result = apply_task_assignments(db_session, task.id, [second, third], AssignmentMode.REMOVE)
+        assert result == {"added": [], "removed": [second], "missing": []}
+        assert assignees() == {}
+        assert apply_task_assignments(db_session, 999999, [second]) is None
+
+
+class TestTaskVersions:
+    """version задачи растёт при любом изменении её ответа (валидатор ETag)"""
+
+    def test_assignments_bump_version_and_user_profiles_change_validators(self, db_session: Session):
+        """Назначения увеличивают version и updated_at; правка пользователя меняет валидаторы, не трогая задачи"""
+        from crud.user import create_user, update_user
+        from crud.task import apply_task_assignments, create_task, update_task, get_task_version
+        from models.task import TaskDB
+        from models.user import UserRole
+        from schemas.task import TaskCreate, TaskUpdate, AssignmentMode
+        from schemas.user import UserCreate, UserUpdate
+
+        owner = create_user(db_session, UserCreate(username="version_owner", role=UserRole.MANAGER))
+        worker = create_user(db_session, UserCreate(username="version_worker", role=UserRole.USER))
+        outsider = create_user(db_session, UserCreate(username="version_outsider", role=UserRole.USER))
+        task_id = create_task(db_session, TaskCreate(title="Versioned", creator_id=owner.id))["id"]
+        other_id = create_task(db_session, TaskCreate(title="Other", creator_id=outsider.id))["id"]
+
+        def version(task_id):
+            db_session.expire_all()
+            return db_session.get(TaskDB, task_id).version
+
+        created = get_task_version(db_session, task_id)
+        apply_task_assignments(db_session, task_id, [worker.id], AssignmentMode.ADD)
+        assert version(task_id) == 2
+        # Last-Modified не отстаёт от ETag
+        assert get_task_version(db_session, task_id).updated_at > created.updated_at
+        # Без изменений — без нового version
+        apply_task_assignments(db_session, task_id, [worker.id], AssignmentMode.ADD)
+        assert version(task_id) == 2
+
+        # Правка задачи вместе с назначениями — одно увеличение
+        updated = update_task(
+            db_session, task_id, TaskUpdate(title="Renamed", assigned_user_ids=[owner.id]), owner.id,
+            return_minimal=True
+        )
+        assert updated["version"] == version(task_id) == 3
+
+        before = get_task_version(db_session, task_id)
+        update_user(db_session, owner.id, UserUpdate(full_name="Owner Renamed"))
+        after = get_task_version(db_session, task_id)
+        # Задачи пользователя не переписываются: меняется только его updated_at
+        assert after.version == version(task_id) == 3
+        assert after.users_updated_at > before.users_updated_at
+        assert after.last_modified > before.last_modified
+        assert version(other_id) == 1
+        assert get_task_version(db_session, other_id).users_updated_at < after.users_updated_at
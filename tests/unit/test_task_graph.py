@@ -0,0 +1,139 @@
+import pytest
+from sqlalchemy.orm import Session
+
+
+@pytest.fixture
+def task_graph_enabled(monkeypatch):
+    import crud.task_graph as task_graph
+
+    monkeypatch.setattr(task_graph, "TASK_GRAPH_ENABLED", True)
+    task_graph.reset_task_graph()
+    yield task_graph
+    task_graph.reset_task_graph()
+
+
+class TestTaskGraph:
+    """Тесты CSR-снимка иерархии"""
+
+    def test_queries(self):
+        """Соседи, предки, потомки, размер поддерева, глубина и циклы в ромбе"""
+        from crud.task_graph import TaskGraph
+
+        graph = TaskGraph([(1, 2), (1, 3), (2, 4), (3, 4), (4, 5), (6, 5)])
+        assert graph.children(1) == [2, 3]
+        assert graph.parents(5) == [4, 6]
+        assert graph.descendants(1) == [2, 3, 4, 5]
+        assert graph.ancestors(5) == [4, 6, 2, 3, 1]
+        assert graph.subtree_size(2) == 3
+        assert graph.depth(5) == 3
+        assert graph.depth(1) == 0
+        assert graph.creates_cycle(5, 1)
+        assert graph.creates_cycle(3, 3)
+        assert not graph.creates_cycle(1, 5)
+        assert not graph.creates_cycle(6, 1)
+
+    def test_overlay_and_compaction(self):
+        """Изменения видны сразу и после сжатия в CSR"""
+        from crud.task_graph import TaskGraph
+
+        graph = TaskGraph([(1, 2), (2, 3)], compact_threshold=3)
+        graph.add_edge(3, 4)
+        graph.remove_edge(1, 2)
+        assert graph.descendants(2) == [3, 4]
+        assert graph.ancestors(3) == [2]
+        assert graph.memory_usage()["overlay_edges"] == 2
+
+        graph.add_edge(7, 8)
+        usage = graph.memory_usage()
+        assert usage["overlay_edges"] == 0
+        assert sorted(graph.edges()) == [(2, 3), (3, 4), (7, 8)]
+
+        graph.remove_task(3)
+        assert graph.memory_usage()["edges"] == 1
+        assert graph.children(2) == []
+
+        graph.add_edge(5, 6)
+        graph.remove_edge(5, 6)
+        assert graph.children(5) == []
+
+    def test_memory_accounting(self):
+        """Память CSR — 4 байта на элемент массивов, без объектов на ребро"""
+        from crud.task_graph import TaskGraph
+
+        edges = [(parent, parent * 10 + i) for parent in range(1, 101) for i in range(5)]
+        usage = TaskGraph(edges).memory_usage()
+        # ids + offsets + targets для детей и для родителей
+        assert usage["csr_bytes"] == 4 * ((100 + 101 + 500) + (500 + 501 + 500))
+        assert usage["edges"] == 500
+        assert usage["total_bytes"] >= usage["csr_bytes"]
+
+    def test_follows_committed_hierarchy_writes(self, db_session: Session, task_graph_enabled):
+        """Снимок перечитывается из БД и получает закоммиченные связи; откат не попадает в него"""
+        from crud.user import create_user
+        from crud.task import create_task_hierarchy, delete_task, would_create_cycle
+        from schemas.user import UserCreate
+        from models.user import UserRole
+        from models.task import TaskDB, TaskHierarchyDB, TaskStatus
+
+        user = create_user(db_session, UserCreate(username="graph_user", role=UserRole.MANAGER))
+        tasks = [TaskDB(title=f"Graph {i}", creator_id=user.id, status=TaskStatus.OPEN) for i in range(4)]
+        db_session.add_all(tasks)
+        db_session.commit()
+        first, second, third, fourth = (task.id for task in tasks)
+        create_task_hierarchy(db_session, first, second)
+
+        graph = task_graph_enabled.get_task_graph(db_session)
+        assert graph.children(first) == [second]
+
+        create_task_hierarchy(db_session, second, third)
+        assert would_create_cycle(db_session, third, first)
+        assert graph.memory_usage()["overlay_edges"] == 1
+
+        savepoint = db_session.begin_nested()
+        db_session.add(TaskHierarchyDB(parent_id=third, child_id=fourth))
+        db_session.flush()
+        savepoint.rollback()
+        db_session.commit()
+        assert graph.children(third) == []
+
+        delete_task(db_session, second)
+        assert graph.descendants(first) == []
+        assert not would_create_cycle(db_session, third, first)
+
+    def test_stale_snapshot_does_not_allow_cycle(self, db_session: Session, task_graph_enabled):
+        """Связь, которой снимок ещё не видит (другой процесс), всё равно мешает циклу"""
+        from crud.user import create_user
+        from crud.task import create_task_hierarchy, would_create_cycle
+        from schemas.user import UserCreate
+        from models.user import UserRole
+        from models.task import TaskDB, TaskStatus
+
+        user = create_user(db_session, UserCreate(username="stale_graph_user", role=UserRole.MANAGER))
+        tasks = [TaskDB(title=f"Stale {i}", creator_id=user.id, status=TaskStatus.OPEN) for i in range(2)]
+        db_session.add_all(tasks)
+        db_session.commit()
+        first, second = (task.id for task in tasks)
+
+        graph = task_graph_enabled.get_task_graph(db_session)
+        create_task_hierarchy(db_session, first, second)
+        # Снимок другого процесса: связь first→second в нём ещё не появилась
+        graph.remove_edge(first, second)
+
+        assert would_create_cycle(db_session, second, first)
+        assert create_task_hierarchy(db_session, second, first) is None
+
+    def test_rebuild_runs_outside_lock(self, db_session: Session, task_graph_enabled, monkeypatch):
+        """Запрос к БД при пересборке идёт без глобальной блокировки снимка"""
+        from crud.task_graph import TaskGraph
+
+        from_session = TaskGraph.from_session.__func__
+        held = []
+
+        def tracking_from_session(cls, db):
+            held.append(task_graph_enabled._graph_lock.locked())
+            return from_session(cls, db)
+
+        monkeypatch.setattr(TaskGraph, "from_session", classmethod(tracking_from_session))
+        graph = task_graph_enabled.get_task_graph(db_session)
+        assert held == [False]
+        assert task_graph_enabled.get_task_graph(db_session) is graph
@@ -0,0 +1,116 @@
+import pytest
+from sqlalchemy.orm import Session
+
+
+@pytest.fixture
+def user_cache(monkeypatch):
+    import crud.user_cache as user_cache
+
+    monkeypatch.setattr(user_cache, "USER_CACHE_ENABLED", True)
+    user_cache.reset_user_cache()
+    yield user_cache.get_user_cache()
+    user_cache.reset_user_cache()
+
+
+class TestUserCache:
+    """Тесты LRU-кэша пользователей в памяти процесса"""
+
+    def test_lru_ttl_and_metrics(self):
+        """Вытеснение давно не спрошенных, истечение по TTL, поиск по username, счётчики"""
+        from crud.user_cache import UserCache, USER_CACHE_REQUESTS, USER_CACHE_EVICTIONS
+
+        now = [0.0]
+        cache = UserCache(max_size=2, ttl=10, clock=lambda: now[0])
+        hits, misses = USER_CACHE_REQUESTS.value(result="hit"), USER_CACHE_REQUESTS.value(result="miss")
+        lru, expired = USER_CACHE_EVICTIONS.value(reason="lru"), USER_CACHE_EVICTIONS.value(reason="expired")
+
+        cache.put({"id": 1, "username": "first"})
+        cache.put({"id": 2, "username": "second"})
+        assert cache.get(1)["username"] == "first"
+        cache.put({"id": 3, "username": "third"})
+        assert cache.get(2) is None
+        assert cache.get_by_username("second") is None
+        assert cache.get_by_username("first")["id"] == 1
+
+        # Переименование: старый username больше не находит запись
+        cache.put({"id": 1, "username": "renamed"})
+        assert cache.get_by_username("first") is None
+        assert cache.get_by_username("renamed")["id"] == 1
+
+        now[0] = 10
+        assert cache.get(3) is None
+        assert len(cache) == 1
+        cache.invalidate(username="renamed")
+        assert len(cache) == 0
+
+        assert USER_CACHE_REQUESTS.value(result="hit") - hits == 3
+        assert USER_CACHE_REQUESTS.value(result="miss") - misses == 4
+        assert USER_CACHE_EVICTIONS.value(reason="lru") - lru == 1
+        assert USER_CACHE_EVICTIONS.value(reason="expired") - expired == 1
+
+    def test_get_user_served_from_cache(self, db_session: Session, user_cache, assert_max_queries):
+        """Повторный get_user/get_user_by_username — без запроса; объект принадлежит сессии"""
+        from crud.user import create_user, get_user, get_user_by_username
+        from crud.user_loader import user_loader
+        from schemas.user import UserCreate
+        from models.user import UserRole
+
+        manager = create_user(db_session, UserCreate(username="cached_manager", role=UserRole.MANAGER))
+        other = create_user(db_session, UserCreate(username="cached_other", role=UserRole.USER))
+        manager_id, other_id = manager.id, other.id
+        get_user(db_session, manager_id)
+        get_user_by_username(db_session, "cached_other")
+        db_session.expunge_all()
+
+        with assert_max_queries(0):
+            user = get_user(db_session, manager_id)
+            assert user.can_manage_tasks()
+            assert user in db_session
+            assert get_user_by_username(db_session, "cached_other").id == other_id
+            assert user_loader(db_session).get_many(db_session, [manager_id, other_id])[other_id] is not None
+
+        # Связи пользователя из кэша загружаются обычным образом
+        assert user.created_tasks == []
+
+    def test_writes_invalidate(self, db_session: Session, user_cache):
+        """update_user, change_user_role и delete_user сбрасывают запись"""
+        from crud.user import create_user, get_user, get_user_by_username, update_user, change_user_role, delete_user
+        from schemas.user import UserCreate, UserUpdate
+        from models.user import UserRole
+
+        user_id = create_user(db_session, UserCreate(username="cached_writer", role=UserRole.USER)).id
+        get_user(db_session, user_id)
+
+        update_user(db_session, user_id, UserUpdate(username="cached_writer_renamed"))
+        assert user_cache.get(user_id) is None
+        db_session.expunge_all()
+        assert get_user_by_username(db_session, "cached_writer") is None
+        assert get_user(db_session, user_id).username == "cached_writer_renamed"
+
+        change_user_role(db_session, user_id, UserRole.ADMIN)
+        db_session.expunge_all()
+        assert get_user(db_session, user_id).role == UserRole.ADMIN
+
+        delete_user(db_session, user_id)
+        assert get_user(db_session, user_id) is None
+
+    def test_kafka_events_invalidate(self, db_session: Session, user_cache):
+        """Обработанное событие Kafka сбрасывает запись пользователя"""
+        from kafka_consumer import KafkaConsumer
+        from crud.user import create_user, get_user
+        from schemas.user import UserCreate
+        from models.user import UserRole
+
+        user_id = create_user(db_session, UserCreate(username="kafka_cached", role=UserRole.USER)).id
+        get_user(db_session, user_id)
+
+        consumer = KafkaConsumer.__new__(KafkaConsumer)
+        consumer.db_session_getter = lambda: Session(
+            bind=db_session.connection(), join_transaction_mode="create_savepoint"
+        )
+        consumer._process_message(
+            b'{"event_type": "account_updated", "data": {"user_id": %d, "full_name": "From Kafka"}}' % user_id
+        )
+        assert user_cache.get(user_id) is None
+        db_session.expunge_all()
+        assert get_user(db_session, user_id).full_name == "From Kafka"